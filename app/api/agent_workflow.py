@@ -1,2 +1,175 @@
-from app.schemas.state import State
-from app.core.graph_runner import stream_graph_responses
\ No newline at end of file
+import json
+import asyncio
+from uuid import uuid4
+from collections.abc import AsyncGenerator
+from typing_extensions import Any
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from langchain_core.messages import HumanMessage
+from langchain_core.runnables.config import RunnableConfig
+from langgraph.types import Command
+from langgraph.graph.state import CompiledStateGraph
+
+from app.logger import global_logger, thread_id_var
+from app.schemas.agent_workflow import ChatRequest, ResumeRequest, CancelRequest
+from app.core.graph_runner import stream_graph_responses
+from app.core.llm_scheduler import Priority, SchedulerOverloadedError, SessionCancelledError, llm_scheduler
+from app.dependencies.graph import get_graph
+
+
+agent_workflow_router = APIRouter(prefix="/agent", tags=["AGENT WORKFLOW"])
+
+# One run at a time per thread, so concurrent requests cannot interleave checkpoints.
+# Each run holds a token, so a late release cannot free a thread claimed by a newer run
+_active_threads: dict[str, object] = {}
+
+
+
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+
+def _claim_thread(thread_id: str) -> object:
+    """Mark the thread as running, in a single step; raise a 409 if a run already holds it."""
+    token = object()
+    if _active_threads.setdefault(thread_id, token) is not token:
+        raise HTTPException(status_code=409, detail=f"Thread {thread_id} is already running")
+    return token
+
+
+
+def _release_thread(thread_id: str, token: object):
+    if _active_threads.get(thread_id) is token:
+        del _active_threads[thread_id]
+
+
+
+class _ThreadRunResponse(StreamingResponse):
+    """Streams a graph run and releases its thread when the response ends.
+
+    The body's own `finally` does not run if the client leaves before the
+    body is iterated, so the release happens here as well.
+    """
+    def __init__(self, content: AsyncGenerator[str, None], thread_id: str, token: object, **kwargs):
+        super().__init__(content, **kwargs)
+        self.thread_id = thread_id
+        self.token = token
+
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.body_iterator.aclose()
+            _release_thread(self.thread_id, self.token)
+
+
+
+async def _stream_events(
+    input: dict[str, Any] | Command,
+    graph: CompiledStateGraph,
+    thread_id: str,
+    priority: Priority,
+    bypass_llm_cache: bool,
+    token: object,
+) -> AsyncGenerator[str, None]:
+    config = RunnableConfig(
+        recursion_limit=25,
+        configurable={"thread_id": thread_id, "priority": priority, "bypass_llm_cache": bypass_llm_cache},
+    )
+    # The response body runs in its own task, so the id does not leak into other requests
+    thread_id_var.set(thread_id)
+    try:
+        yield _sse("thread", {"thread_id": thread_id})
+        chunks = llm_scheduler.stream(thread_id, stream_graph_responses(input, graph, config=config))
+        async for chunk in chunks:
+            if chunk:
+                yield _sse("token", chunk)
+        thread_state = await graph.aget_state(config=config)
+        for interrupt in thread_state.interrupts:
+            yield _sse("interrupt", {"thread_id": thread_id, "value": interrupt.value})
+        yield _sse("end", {"thread_id": thread_id})
+    except asyncio.CancelledError:
+        global_logger.info("Client disconnected from thread %s", thread_id)
+        raise
+    except SessionCancelledError:
+        yield _sse("cancelled", {"thread_id": thread_id})
+    except SchedulerOverloadedError as e:
+        global_logger.warning("Shed graph run on thread %s: %s", thread_id, e)
+        yield _sse("error", {"thread_id": thread_id, "detail": str(e), "retryable": True})
+    except Exception as e:
+        global_logger.error("Graph run failed on thread %s: %s", thread_id, e)
+        yield _sse("error", {"thread_id": thread_id, "detail": str(e)})
+    finally:
+        _release_thread(thread_id, token)
+
+
+
+def _start_stream(
+    input: dict[str, Any] | Command,
+    graph: CompiledStateGraph,
+    thread_id: str,
+    priority: Priority = "interactive",
+    bypass_llm_cache: bool = False,
+) -> _ThreadRunResponse:
+    token = _claim_thread(thread_id)
+    if not llm_scheduler.admits(priority):
+        _release_thread(thread_id, token)
+        raise HTTPException(
+            status_code=503,
+            detail="The model server is busy. Please retry later.",
+            headers={"Retry-After": "5"},
+        )
+    return _ThreadRunResponse(
+        _stream_events(input, graph, thread_id, priority, bypass_llm_cache, token),
+        thread_id,
+        token,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+
+@agent_workflow_router.post("/chat")
+async def chat_api(request: ChatRequest, graph: CompiledStateGraph = Depends(get_graph)):
+    thread_id = request.thread_id or str(uuid4())
+    return _start_stream(
+        {"messages": [HumanMessage(content=request.message)]},
+        graph,
+        thread_id,
+        request.priority,
+        request.bypass_llm_cache,
+    )
+
+
+
+@agent_workflow_router.post("/resume")
+async def resume_api(request: ResumeRequest, graph: CompiledStateGraph = Depends(get_graph)):
+    config = RunnableConfig(configurable={"thread_id": request.thread_id})
+    thread_state = await graph.aget_state(config=config)
+    if not thread_state.interrupts:
+        raise HTTPException(status_code=404, detail=f"Thread {request.thread_id} is not waiting for a decision")
+    return _start_stream(
+        Command(resume=request.decision),
+        graph,
+        request.thread_id,
+        request.priority,
+        request.bypass_llm_cache,
+    )
+
+
+
+@agent_workflow_router.post("/cancel")
+async def cancel_api(request: CancelRequest):
+    if not llm_scheduler.cancel_session(request.thread_id):
+        raise HTTPException(status_code=404, detail=f"Thread {request.thread_id} is not running")
+    return {"thread_id": request.thread_id, "cancelled": True}
+
+
+
+@agent_workflow_router.get("/scheduler")
+async def scheduler_stats_api():
+    return llm_scheduler.stats()
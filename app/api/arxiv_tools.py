@@ -1,4 +1,11 @@
+import json
+from dataclasses import asdict
+from collections.abc import AsyncGenerator
+
 from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+
+from app.logger import global_logger
 
 from app.core.arxiv_tools import *
 from app.schemas.arxiv_tools import *
@@ -8,12 +15,47 @@ arxiv_tools_router = APIRouter(prefix="/arxiv", tags=["ARXIV DOCUMENTS"])
 
 
 
+
+async def _ndjson_papers(request: SearchPapersRequest) -> AsyncGenerator[str, None]:
+    try:
+        async for paper in iter_papers(request):
+            yield json.dumps(asdict(paper), ensure_ascii=False) + "\n"
+    except Exception as e:
+        global_logger.error("Streaming search failed: %s", e)
+        yield json.dumps({"error": str(e)}) + "\n"
+
+
+
 @arxiv_tools_router.get("/search")
 async def search_papers_api(request: SearchPapersRequest):
     return await search_papers(request)
 
 
 
+@arxiv_tools_router.get("/search/stream")
+async def search_papers_stream_api(request: SearchPapersRequest):
+    return StreamingResponse(_ndjson_papers(request), media_type="application/x-ndjson")
+
+
+
+@arxiv_tools_router.post("/search/batch")
+async def search_papers_batch_api(request: SearchPapersBatchRequest):
+    return await search_papers_batch(request)
+
+
+
+@arxiv_tools_router.get("/fulltext")
+async def search_fulltext_api(request: SearchFullTextRequest):
+    return await search_fulltext(request)
+
+
+
+@arxiv_tools_router.get("/semantic")
+async def search_semantic_api(request: SearchSemanticRequest):
+    return await search_semantic(request)
+
+
+
 @arxiv_tools_router.post("/download")
 async def download_papers_api(request: DownloadPapersRequest):
     return await download_papers(request)
\ No newline at end of file
@@ -1,3 +1,4 @@
+from typing import Literal
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -17,6 +18,120 @@ class Settings(BaseSettings):
     PAPERS_DIR: str
     BOOKS_DIR: str
     SQLITE_CHECKPOINTS_URI: str
+    CLI_THREAD_ID: str = "cli"
+    CHECKPOINT_KEEP_LAST: int = 20
+    CHECKPOINT_THREAD_TTL_SECONDS: float = 30 * 24 * 60 * 60
+    CHECKPOINT_MAINTENANCE_INTERVAL_SECONDS: float = 60 * 60
+    CHECKPOINT_VACUUM_FREE_RATIO: float = 0.2
+    CHECKPOINT_OFFLOAD_BYTES: int = 64 * 1024
+    CHECKPOINT_BLOB_DIR: str = "data/checkpoint_blobs"
+
+    ARXIV_API_URL: str = "https://export.arxiv.org/api/query"
+    ARXIV_DELAY_SECONDS: float = 3.0
+    ARXIV_MAX_PAGES: int = 10
+    ARXIV_STREAM_PAGE_SIZE: int = 100
+    ARXIV_RATE_PER_SECOND: float = 1.0
+    ARXIV_BURST: int = 3
+    SEARCH_BATCH_MAX_CONCURRENCY: int = 4
+    ARXIV_MIRROR_ENABLED: bool = False
+    ARXIV_MIRROR_PATH: str = "data/arxiv_mirror.sqlite"
+    ARXIV_MIRROR_CATEGORIES: list[str] = ["cs", "math", "stat"]
+    ARXIV_MIRROR_START_DATE: str = "2020-01-01"
+    ARXIV_MIRROR_WINDOW_DAYS: int = 7
+    ARXIV_MIRROR_PAGE_SIZE: int = 1000
+    ARXIV_MIRROR_HARVEST_OVERLAP_DAYS: int = 7
+    # How far behind now the complete part of the mirror (its watermark minus the harvest
+    # overlap) may be for searches without `date_to`; must be at least the overlap
+    ARXIV_MIRROR_MAX_LAG_SECONDS: float = 9 * 24 * 60 * 60
+    ARXIV_MIRROR_SYNC_INTERVAL_SECONDS: float = 6 * 60 * 60
+    SEARCH_RRF_K: int = 60
+
+    DOWNLOAD_MAX_CONCURRENCY: int = 8
+    DOWNLOAD_MAX_PER_HOST: int = 4
+    DOWNLOAD_RATE_PER_SECOND: float = 4.0
+    DOWNLOAD_BURST: int = 4
+    DOWNLOAD_MAX_RETRIES: int = 4
+    DOWNLOAD_BACKOFF_BASE_SECONDS: float = 1.0
+    DOWNLOAD_BACKOFF_MAX_SECONDS: float = 30.0
+    DOWNLOAD_TIMEOUT_SECONDS: float = 60.0
+
+    PAPER_MATCH_TOP_K: int = 10
+    PAPER_MATCH_THRESHOLD: float = 0.6
+    PAPER_DELETE_MATCH_THRESHOLD: float = 0.9
+
+    INGEST_MAX_WORKERS: int | None = None
+    INGEST_PAGES_PER_TASK: int = 16
+    INGEST_FILE_TIMEOUT_SECONDS: float | None = 300.0
+
+    DOCUMENT_CACHE_DIR: str = "data/document_cache"
+    DOCUMENT_CACHE_MAX_BYTES: int = 2 * 1024 ** 3
+
+    CHUNK_SIZE: int = 1500
+    CHUNK_OVERLAP: int = 150
+    BM25_K1: float = 1.2
+    BM25_B: float = 0.75
+    # Delta segments of the full-text index merged into one past this count
+    FULLTEXT_MAX_SEGMENTS: int = 8
+
+    EMBEDDING_MODEL_NAME: str | None = None
+    VECTOR_QUANTIZE: bool = False
+    VECTOR_SEGMENT_ROWS: int = 50_000
+    VECTOR_SEARCH_BLOCK_ROWS: int = 65_536
+    VECTOR_MAX_SEGMENTS: int = 8
+    # Tombstoned rows, as a fraction of all stored rows, that trigger a compaction
+    VECTOR_COMPACT_DELETED_FRACTION: float = 0.2
+
+    CONTEXT_TOKEN_BUDGET: int = 6000
+    CONTEXT_KEEP_RECENT_MESSAGES: int = 6
+    CONTEXT_TOOL_PAYLOAD_CHARS: int = 2000
+
+    TOOLS_MODE: Literal["local", "mcp"] = "local"
+    MCP_SCHEMA_CACHE_PATH: str = "data/mcp_tools.json"
+    MCP_HEALTH_CHECK_INTERVAL_SECONDS: float = 60.0
+    MCP_HEALTH_CHECK_TIMEOUT_SECONDS: float = 5.0
+    TOOL_MAX_CONCURRENCY: int = 4
+    TOOL_DEFAULT_TIMEOUT_SECONDS: float = 120.0
+    TOOL_TIMEOUT_SECONDS: dict[str, float] = {
+        "search_papers": 60.0,
+        "search_papers_batch": 180.0,
+        "download_papers": 900.0,
+    }
+
+    TOOL_CACHE_MAX_ENTRIES: int = 512
+    TOOL_CACHE_TTL_SECONDS: dict[str, float] = {
+        "search_papers": 60 * 60,
+        "search_papers_batch": 60 * 60,
+        "list_papers": 10 * 60,
+        "list_papers_from_query": 10 * 60,
+        "search_fulltext": 10 * 60,
+        "search_semantic": 10 * 60,
+    }
+    TOOL_CACHE_INVALIDATES: dict[str, list[str]] = {
+        "download_papers": ["list_papers", "list_papers_from_query", "search_fulltext", "search_semantic"],
+        "delete_papers": ["list_papers", "list_papers_from_query", "search_fulltext", "search_semantic"],
+    }
+
+    LLM_MAX_CONCURRENCY: int = 2
+    LLM_MAX_QUEUED: dict[str, int] = {"interactive": 64, "batch": 256}
+    LLM_QUEUE_TIMEOUT_SECONDS: float = 120.0
+    LLM_CACHE_ENABLED: bool = False
+    LLM_CACHE_PATH: str = "data/llm_cache.sqlite"
+    LLM_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+
+    LOG_LEVEL: str = "INFO"
+    LOG_JSON: bool = False
+    LOG_DEBUG_MAX_PER_SECOND: float = 20.0
+
+    TELEMETRY_ENABLED: bool = False
+    TRACE_FILE_PATH: str | None = None
+
+    SEARCH_CACHE_PATH: str = "data/search_cache.sqlite"
+    SEARCH_CACHE_MAX_ENTRIES: int = 256
+    SEARCH_STREAM_CACHE_MAX_RESULTS: int = 1000
+    SEARCH_CACHE_TTL_SECONDS: dict[str, int] = {
+        "relevance": 24 * 60 * 60,
+        "lastUpdatedDate": 60 * 60,
+    }
 
 
 
@@ -0,0 +1,322 @@
+"""Local mirror of the arXiv metadata of the heavy categories.
+
+Usage:
+    python -m app.core.arxiv_mirror [--categories cs,math,stat] [--until YYYY-MM-DD]
+
+Each run harvests the papers updated since the category's watermark, in
+date windows, and moves the watermark after every window, so an
+interrupted run resumes where it stopped.
+"""
+from __future__ import annotations
+import os
+import re
+import time
+import sqlite3
+import asyncio
+import argparse
+import threading
+from datetime import datetime, timedelta, timezone
+from collections.abc import Iterable
+
+from app.configs import settings
+from app.logger import global_logger
+from app.schemas.paper import Paper
+from app.core.query_planner import ARXIV_DATE_FORMAT, ARXIV_EARLIEST_DATE, QueryPlan, category_query
+from app.utils.arxiv_helpers import ARCHIVES_WITHOUT_SUBCATEGORIES
+from app.utils.lazy_import import lazy_import
+
+
+arxiv = lazy_import("arxiv")
+
+# Field-specific and boolean queries use arXiv's syntax, so they always go to the API
+ARXIV_QUERY_SYNTAX = re.compile(r"\b(ti|au|abs|cat|co|jr|rn|id|all):|\b(AND|OR|ANDNOT)\b")
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS papers ("
+    "rowid INTEGER PRIMARY KEY, arxiv_id TEXT NOT NULL UNIQUE, paper_id TEXT NOT NULL, "
+    "title TEXT NOT NULL, authors TEXT NOT NULL, summary TEXT NOT NULL, published TEXT NOT NULL, "
+    "updated TEXT NOT NULL, pdf_url TEXT NOT NULL, primary_category TEXT NOT NULL, categories TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS papers_published ON papers (published)",
+    "CREATE INDEX IF NOT EXISTS papers_updated ON papers (updated)",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS papers_fts USING fts5("
+    "title, summary, authors, content='papers', content_rowid='rowid', tokenize='porter unicode61')",
+    # Keep the external-content index in step with the rows
+    "CREATE TRIGGER IF NOT EXISTS papers_ai AFTER INSERT ON papers BEGIN "
+    "INSERT INTO papers_fts (rowid, title, summary, authors) VALUES (new.rowid, new.title, new.summary, new.authors); END",
+    "CREATE TRIGGER IF NOT EXISTS papers_ad AFTER DELETE ON papers BEGIN "
+    "INSERT INTO papers_fts (papers_fts, rowid, title, summary, authors) "
+    "VALUES ('delete', old.rowid, old.title, old.summary, old.authors); END",
+    "CREATE TRIGGER IF NOT EXISTS papers_au AFTER UPDATE ON papers BEGIN "
+    "INSERT INTO papers_fts (papers_fts, rowid, title, summary, authors) "
+    "VALUES ('delete', old.rowid, old.title, old.summary, old.authors); "
+    "INSERT INTO papers_fts (rowid, title, summary, authors) VALUES (new.rowid, new.title, new.summary, new.authors); END",
+    "CREATE TABLE IF NOT EXISTS watermarks ("
+    "category TEXT PRIMARY KEY, covered_from TEXT NOT NULL, covered_to TEXT NOT NULL, synced_at REAL NOT NULL)",
+]
+UPSERT = (
+    "INSERT INTO papers (arxiv_id, paper_id, title, authors, summary, published, updated, pdf_url, primary_category, categories) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (arxiv_id) DO UPDATE SET paper_id = excluded.paper_id, title = excluded.title, "
+    "authors = excluded.authors, summary = excluded.summary, published = excluded.published, "
+    "updated = excluded.updated, pdf_url = excluded.pdf_url, primary_category = excluded.primary_category, "
+    "categories = excluded.categories WHERE excluded.updated >= papers.updated"
+)
+# Entries only show up in the API once announced, up to a few days (over a weekend) after
+# their submission or update date. Each sync re-reads this much behind its watermark, and
+# the mirror is only complete this far behind it.
+HARVEST_OVERLAP = timedelta(days=settings.ARXIV_MIRROR_HARVEST_OVERLAP_DAYS)
+# bm25 weights of the title, summary and authors columns
+BM25_WEIGHTS = (10.0, 1.0, 3.0)
+
+
+
+
+def _parse_datetime(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value)
+    return parsed.replace(tzinfo=timezone.utc) if parsed.tzinfo is None else parsed.astimezone(timezone.utc)
+
+
+
+def _to_row(result: arxiv.Result) -> tuple:
+    paper_id = result.entry_id.split('/')[-1]
+    return (
+        re.sub(r"v\d+$", "", paper_id),
+        paper_id,
+        result.title,
+        "\n".join(author.name for author in result.authors),
+        result.summary,
+        result.published.astimezone(timezone.utc).isoformat(),
+        result.updated.astimezone(timezone.utc).isoformat(),
+        result.pdf_url or "",
+        result.primary_category or "",
+        # Padded so a category or prefix can be matched with LIKE
+        " " + " ".join(result.categories) + " ",
+    )
+
+
+
+def _fts_query(query: str) -> str | None:
+    """Translate a plain arXiv query into an FTS5 query whose terms must all match."""
+    tokens = TOKEN_PATTERN.findall(query)
+    if not tokens:
+        return None
+    if query.startswith('"') and query.endswith('"'):
+        return '"' + " ".join(tokens) + '"'
+    return " ".join(f'"{token}"' for token in tokens)
+
+
+
+class ArxivMirror:
+    """SQLite copy of the arXiv metadata of some categories, with an FTS5 index.
+
+    Every mirrored category has a watermark: the mirror holds every paper of
+    the category published between `covered_from` and `HARVEST_OVERLAP`
+    before `covered_to`, so a search inside that window can be answered
+    without calling arXiv.
+    """
+    def __init__(
+        self,
+        db_path: str = settings.ARXIV_MIRROR_PATH,
+        max_lag_seconds: float = settings.ARXIV_MIRROR_MAX_LAG_SECONDS,
+    ):
+        self.db_path = os.path.expanduser(db_path)
+        self.max_lag_seconds = max_lag_seconds
+        self.hits = 0
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._sync_task: asyncio.Task | None = None
+        # Stops a harvest running in a worker thread between two windows
+        self._stopping = threading.Event()
+
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            self._conn.execute("PRAGMA synchronous = NORMAL")
+            for statement in SCHEMA:
+                self._conn.execute(statement)
+            self._conn.commit()
+        return self._conn
+
+
+    def watermarks(self) -> dict[str, tuple[datetime, datetime]]:
+        with self._lock:
+            rows = self._connect().execute("SELECT category, covered_from, covered_to FROM watermarks").fetchall()
+        return {category: (_parse_datetime(start), _parse_datetime(end)) for category, start, end in rows}
+
+
+    def covers(self, plan: QueryPlan) -> bool:
+        """Whether every paper matching `plan` is in the mirror."""
+        if ARXIV_QUERY_SYNTAX.search(plan.optimized_query) or _fts_query(plan.optimized_query) is None:
+            return False
+        watermarks = self.watermarks()
+        lower = plan.date_from or ARXIV_EARLIEST_DATE
+        now = datetime.now(timezone.utc)
+        for category in plan.categories:
+            window = watermarks.get(category.split(".")[0])
+            if window is None or lower < window[0]:
+                return False
+            # Papers updated in the overlap may not be announced yet, so the mirror is complete up to here
+            complete_to = window[1] - HARVEST_OVERLAP
+            if plan.date_to is not None and plan.date_to > complete_to:
+                return False
+            # Without `date_to`, accept missing the newest papers up to the allowed lag
+            if plan.date_to is None and now - complete_to > timedelta(seconds=self.max_lag_seconds):
+                return False
+        return True
+
+
+    def search(self, plan: QueryPlan) -> list[Paper]:
+        """Run `plan` against the mirror: by bm25 rank for relevance, newest first otherwise."""
+        category_clauses, params = [], [_fts_query(plan.optimized_query)]
+        for category in plan.categories:
+            category_clauses.append("p.categories LIKE ?")
+            params.append(f"% {category} %")
+            if "." not in category and category not in ARCHIVES_WITHOUT_SUBCATEGORIES:
+                category_clauses.append("p.categories LIKE ?")
+                params.append(f"% {category}.%")
+        sql = (
+            "SELECT p.paper_id, p.title, p.authors, p.summary, p.published, p.pdf_url, p.primary_category "
+            "FROM papers_fts JOIN papers AS p ON p.rowid = papers_fts.rowid "
+            f"WHERE papers_fts MATCH ? AND ({' OR '.join(category_clauses)})"
+        )
+        if plan.date_from:
+            sql += " AND p.published >= ?"
+            params.append(plan.date_from.isoformat())
+        if plan.date_to:
+            sql += " AND p.published <= ?"
+            params.append(plan.date_to.isoformat())
+        if plan.sort_by == "lastUpdatedDate":
+            sql += " ORDER BY p.updated DESC"
+        else:
+            sql += f" ORDER BY bm25(papers_fts, {', '.join(map(str, BM25_WEIGHTS))})"
+        sql += " LIMIT ?"
+        params.append(plan.batch_size)
+        with self._lock:
+            rows = self._connect().execute(sql, params).fetchall()
+            self.hits += 1
+        return [
+            Paper(
+                id=paper_id,
+                title=title,
+                authors=authors.split("\n") if authors else [],
+                summary=summary,
+                published=published,
+                pdf_url=pdf_url,
+                primary_category=primary_category,
+            )
+            for paper_id, title, authors, summary, published, pdf_url, primary_category in rows
+        ]
+
+
+    def lookup(self, plan: QueryPlan) -> list[Paper] | None:
+        """The results of `plan` when the mirror covers it, otherwise None."""
+        return self.search(plan) if self.covers(plan) else None
+
+
+    async def alookup(self, plan: QueryPlan) -> list[Paper] | None:
+        return await asyncio.to_thread(self.lookup, plan)
+
+
+    def _store(self, category: str, rows: Iterable[tuple], covered_from: datetime, covered_to: datetime) -> int:
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                stored = conn.executemany(UPSERT, rows).rowcount
+                conn.execute(
+                    "INSERT INTO watermarks (category, covered_from, covered_to, synced_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (category) DO UPDATE SET covered_to = excluded.covered_to, synced_at = excluded.synced_at",
+                    (category, covered_from.isoformat(), covered_to.isoformat(), time.time()),
+                )
+        return stored
+
+
+    def harvest(self, category: str, until: datetime | None = None) -> int:
+        """Fetch the papers of `category` updated since its watermark, one date window at a time.
+
+        A paper is updated no earlier than it is published, so harvesting the
+        updates up to the watermark covers every paper published before it.
+        """
+        from app.core.arxiv_tools import _get_arxiv_client
+
+        until = until or datetime.now(timezone.utc)
+        watermark = self.watermarks().get(category)
+        covered_from = watermark[0] if watermark else _parse_datetime(settings.ARXIV_MIRROR_START_DATE)
+        start = max(covered_from, watermark[1] - HARVEST_OVERLAP) if watermark else covered_from
+        window = timedelta(days=settings.ARXIV_MIRROR_WINDOW_DAYS)
+        client = _get_arxiv_client(settings.ARXIV_MIRROR_PAGE_SIZE)
+        total = 0
+        while start < until and not self._stopping.is_set():
+            end = min(start + window, until)
+            search = arxiv.Search(
+                query=f"({category_query(category)}) AND lastUpdatedDate:[{start.strftime(ARXIV_DATE_FORMAT)} TO {end.strftime(ARXIV_DATE_FORMAT)}]",
+                max_results=None,
+                sort_by=arxiv.SortCriterion.LastUpdatedDate,
+                sort_order=arxiv.SortOrder.Ascending,
+            )
+            rows = [_to_row(result) for result in client.results(search)]
+            total += self._store(category, rows, covered_from, end)
+            global_logger.info("Mirrored %d %s papers updated until %s", len(rows), category, end.date())
+            start = end
+        return total
+
+
+    def sync(self, categories: Iterable[str] = settings.ARXIV_MIRROR_CATEGORIES) -> dict[str, int]:
+        return {category: self.harvest(category) for category in categories}
+
+
+    async def _sync_loop(self, interval: float):
+        while True:
+            try:
+                await asyncio.to_thread(self.sync)
+            except Exception as e:
+                global_logger.error("ArXiv mirror sync failed: %s", e)
+            await asyncio.sleep(interval)
+
+
+    def start_sync(self, interval: float = settings.ARXIV_MIRROR_SYNC_INTERVAL_SECONDS):
+        if self._sync_task is None and interval > 0:
+            self._stopping.clear()
+            self._sync_task = asyncio.create_task(self._sync_loop(interval))
+
+
+    async def stop_sync(self):
+        if self._sync_task is not None:
+            self._stopping.set()
+            self._sync_task.cancel()
+            try:
+                await self._sync_task
+            except asyncio.CancelledError:
+                pass
+            self._sync_task = None
+
+
+    def stats(self) -> dict[str, float]:
+        with self._lock:
+            papers = self._connect().execute("SELECT COUNT(*) FROM papers").fetchone()[0]
+        return {"papers": papers, "hits": self.hits}
+
+
+
+arxiv_mirror = ArxivMirror()
+
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--categories", default=",".join(settings.ARXIV_MIRROR_CATEGORIES), help="Comma-separated top-level categories")
+    parser.add_argument("--until", help="Harvest up to this date instead of now, formatted in `YYYY-MM-DD`")
+    args = parser.parse_args()
+    until = _parse_datetime(args.until) if args.until else None
+    for category in args.categories.split(","):
+        stored = arxiv_mirror.harvest(category, until)
+        global_logger.info("Harvested %d %s papers", stored, category)
+    global_logger.info("ArXiv mirror: %s", arxiv_mirror.stats())
+
+
+
+if __name__ == "__main__":
+    main()
@@ -1,176 +1,303 @@
 from __future__ import annotations
 import os
-import arxiv
-import httpx
 import asyncio
+import logging
 from urllib.parse import urlparse
-from dateutil import parser
-from datetime import timezone
+from functools import lru_cache
+from collections.abc import AsyncGenerator, Iterator
 
 from app.configs import settings
 from app.logger import global_logger
-from app.schemas.paper import Paper
+from app.schemas.paper import Paper, PaperRecord, ChunkHit
 from app.schemas.arxiv_tools import *
-from app.utils.arxiv_helpers import _optimize_query, _validate_categories, _fuzzy_find_filenames
+from app.core.search_cache import search_cache, make_search_key
+from app.core.arxiv_mirror import arxiv_mirror
+from app.core.query_planner import QueryPlan, plan_search
+from app.core.download_scheduler import DownloadJob, download_scheduler
+from app.core.paper_store import get_paper_store
+from app.core.indexing import get_fulltext_index, get_vector_store, sync_fulltext_index, sync_vector_store
+from app.utils.rate_limit import TokenBucket
+from app.utils.singleflight import SingleFlight
+from app.utils.lazy_import import lazy_import
+from app.core.telemetry import telemetry
 
 
+arxiv = lazy_import("arxiv")
+
+# Every arXiv API page request shares one rate limit, and identical searches in flight run once
+_arxiv_rate_limiter = TokenBucket(settings.ARXIV_RATE_PER_SECOND, settings.ARXIV_BURST)
+_search_flights = SingleFlight()
+
+
+
+
+@lru_cache(maxsize=8)
+def _get_arxiv_client(page_size: int) -> arxiv.Client:
+    client = arxiv.Client(page_size=page_size, delay_seconds=settings.ARXIV_DELAY_SECONDS)
+    # Overridable so the API can be replaced by a mirror or a local stand-in
+    client.query_url_format = settings.ARXIV_API_URL + "?{}"
+    # Every page request, retries included, takes a token of the shared arXiv rate limit
+    parse_feed = client._parse_feed
+
+    def _rate_limited_parse_feed(url: str, first_page: bool = True, _try_index: int = 0):
+        _arxiv_rate_limiter.acquire_blocking()
+        return parse_feed(url, first_page=first_page, _try_index=_try_index)
+
+    client._parse_feed = _rate_limited_parse_feed
+    return client
+
+
+
+def _to_paper(paper: arxiv.Result) -> Paper:
+    authors = [author.name for author in paper.authors]
+    published_iso = paper.published.isoformat() if paper.published else ""
+    primary_category = paper.primary_category if hasattr(paper, 'primary_category') else ""
+    return Paper(
+        id=paper.entry_id.split('/')[-1],
+        title=paper.title,
+        authors=authors,
+        summary=paper.summary,
+        published=published_iso,
+        pdf_url=paper.pdf_url,
+        primary_category=primary_category,
+    )
+
+
+
+def _iter_papers(plan: QueryPlan) -> Iterator[Paper]:
+    """Iterate the arXiv result pages lazily until the batch is filled."""
+    sort_map = {
+        "relevance": arxiv.SortCriterion.Relevance,
+        "lastUpdatedDate": arxiv.SortCriterion.LastUpdatedDate,
+    }
+    sort_criterion = sort_map.get(plan.sort_by, arxiv.SortCriterion.Relevance)
+    global_logger.debug("Sort by %s", plan.sort_by)
+    search = arxiv.Search(
+        query=plan.query,
+        max_results=plan.max_results,
+        sort_by=sort_criterion
+    )
+    count = 0
+    for paper in _get_arxiv_client(plan.page_size).results(search):
+        if count >= plan.batch_size:
+            break
+        if paper.published and not plan.accepts(paper.published):
+            continue
+        count += 1
+        yield _to_paper(paper)
+
+
+
+def _fetch_papers(plan: QueryPlan) -> list[Paper]:
+    return list(_iter_papers(plan))
+
+
+
+async def _iterate_in_thread(iterator: Iterator[Paper]) -> AsyncGenerator[Paper, None]:
+    """Pull one item at a time from a blocking iterator without blocking the event loop."""
+    done = object()
+    while (item := await asyncio.to_thread(next, iterator, done)) is not done:
+        yield item
+
 
 
 async def search_papers(request: SearchPapersRequest) -> list[Paper]:
-    if isinstance(categories, str):
-        categories = [categories]
-    global_logger.info("Calling the `search_papers` tool")
     """Search arXiv using the official arxiv Python library."""
+    global_logger.info("Calling the `search_papers` tool")
+    try:
+        plan = plan_search(request)
+        # Look up the cache before going to the network
+        cache_key = make_search_key(plan.cache_key_fields())
+        with telemetry.span("arxiv_phase", tool="search_papers", phase="cache_lookup"):
+            cached_results = await search_cache.aget(cache_key)
+        if cached_results is not None:
+            # Only build the stats when they will be logged, as this runs on every cache hit
+            if global_logger.isEnabledFor(logging.INFO):
+                global_logger.info("`search_papers` served from cache (%s)", search_cache.stats())
+            return cached_results
+        # Searches inside the range of the local mirror never reach the API
+        if settings.ARXIV_MIRROR_ENABLED:
+            with telemetry.span("arxiv_phase", tool="search_papers", phase="mirror"):
+                mirrored_results = await arxiv_mirror.alookup(plan)
+            if mirrored_results is not None:
+                global_logger.info("`search_papers` served from the local mirror (%s papers)", len(mirrored_results))
+                return mirrored_results
+
+        async def _fetch() -> list[Paper]:
+            with telemetry.span("arxiv_phase", tool="search_papers", phase="fetch"):
+                results = await asyncio.to_thread(_fetch_papers, plan)
+            with telemetry.span("arxiv_phase", tool="search_papers", phase="cache_store"):
+                await search_cache.aset(cache_key, plan.sort_by, results)
+            return results
+
+        results = await _search_flights.do(cache_key, _fetch)
+        global_logger.info("`search_papers` completed!")
+        return list(results)
+    except arxiv.ArxivError as e:
+        global_logger.error("ArXiv API Error: %s", e)
+    except Exception as e:
+        global_logger.error(e)
+
+
+
+def _merge_results(result_lists: list[list[Paper]], fusion: str, rrf_k: int = settings.SEARCH_RRF_K) -> list[Paper]:
+    """Deduplicate papers by arXiv id, ranked by reciprocal rank fusion or in order of discovery."""
+    papers: dict[str, Paper] = {}
+    scores: dict[str, float] = {}
+    for results in result_lists:
+        for rank, paper in enumerate(results, start=1):
+            papers.setdefault(paper.id, paper)
+            scores[paper.id] = scores.get(paper.id, 0.0) + 1.0 / (rrf_k + rank)
+    if fusion == "rrf":
+        # Ties keep the order of discovery, as `sorted` is stable
+        return [papers[paper_id] for paper_id in sorted(papers, key=lambda paper_id: -scores[paper_id])]
+    return list(papers.values())
+
+
+
+async def search_papers_batch(request: SearchPapersBatchRequest) -> list[Paper]:
+    """Run several arXiv searches concurrently and merge their results.
+
+    Searches share the arXiv rate limit and identical ones are coalesced
+    into a single API call. Papers found by several searches appear once.
+    """
+    global_logger.info("Calling the `search_papers_batch` tool with %s searches", len(request.requests))
+    limit = asyncio.Semaphore(settings.SEARCH_BATCH_MAX_CONCURRENCY)
+
+    async def _search(search_request: SearchPapersRequest) -> list[Paper]:
+        async with limit:
+            return await search_papers(search_request) or []
+
+    result_lists = await asyncio.gather(*[_search(search_request) for search_request in request.requests])
+    results = _merge_results(result_lists, request.fusion)
+    if request.max_results is not None:
+        results = results[:request.max_results]
+    global_logger.info("`search_papers_batch` completed with %s unique papers!", len(results))
+    return results
+
+
+
+async def iter_papers(request: SearchPapersRequest) -> AsyncGenerator[Paper, None]:
+    """Search arXiv like `search_papers`, yielding each paper as soon as it is parsed.
+
+    Results are fetched in small pages, so the first paper does not wait for
+    a page sized after `batch_size`, and only the current page is held in
+    memory. Harvests small enough are still stored in the search cache.
+    """
+    global_logger.info("Calling `iter_papers`")
+    plan = plan_search(request)
+    cache_key = make_search_key(plan.cache_key_fields())
+    cached_results = await search_cache.aget(cache_key)
+    if cached_results is not None:
+        if global_logger.isEnabledFor(logging.INFO):
+            global_logger.info("`iter_papers` served from cache (%s)", search_cache.stats())
+        for paper in cached_results:
+            yield paper
+        return
+    collected: list[Paper] | None = []
+    async for paper in _iterate_in_thread(_iter_papers(plan.with_page_size(settings.ARXIV_STREAM_PAGE_SIZE))):
+        if collected is not None:
+            collected.append(paper)
+            if len(collected) > settings.SEARCH_STREAM_CACHE_MAX_RESULTS:
+                collected = None
+        yield paper
+    if collected is not None:
+        await search_cache.aset(cache_key, plan.sort_by, collected)
+    global_logger.info("`iter_papers` completed!")
+
+
+
+async def search_fulltext(request: SearchFullTextRequest) -> list[ChunkHit]:
+    """Search inside the downloaded papers with the local BM25 index.
+
+    Papers added to or removed from the paper store since the last call are
+    indexed or dropped first.
+    """
+    global_logger.info("Calling the `search_fulltext` tool")
     try:
-        query_parts = []
-        global_logger.debug(f"Original query: {request.query}")
-        # Process the query
         if not request.query.strip():
             raise Exception(f"[ERROR] Invalid query: {request.query}")
-        optimized_query = _optimize_query(request.query)
-        query_parts.append(f"({optimized_query})")
-        if optimized_query != request.query:
-            global_logger.debug(f"Optimized query: '{request.query}' -> '{optimized_query}'")
-        # Process the categories
-        if not _validate_categories(categories):
-            raise Exception(f"[ERROR] Invalid categories")
-        category_filter = " OR ".join(f"cat:{cat}" for cat in categories)
-        query_parts.append(f"({category_filter})")
-        global_logger.debug(f"Added category filter: {category_filter}")
-        # Combine the queries
-        if not query_parts:
-            raise Exception("[ERROR] No search criteria provided")
-        final_query = " ".join(query_parts)
-        global_logger.debug(f"Final arXiv query: {final_query}")
-        # Sort criteria
-        sort_map = {
-            "relevance": arxiv.SortCriterion.Relevance,
-            "lastUpdatedDate": arxiv.SortCriterion.LastUpdatedDate,
-        }
-        sort_criterion = sort_map.get(request.sort_by, arxiv.SortCriterion.Relevance)
-        global_logger.debug(f"Sort by {request.sort_by}")
-        client = arxiv.Client()
-        search = arxiv.Search(
-            query=optimized_query,
-            max_results=request.batch_size,
-            sort_by=sort_criterion
-        )
-        # Parse date filters if provided
-        date_from_parsed = None
-        date_to_parsed = None
-        if request.date_from:
-            try:
-                date_from_parsed = parser.parse(request.date_from).replace(
-                    tzinfo=timezone.utc
-                )
-            except (ValueError, TypeError) as e:
-                global_logger.error(f"Error: Invalid date_from format - {str(e)}")
-        if request.date_to:
-            try:
-                date_to_parsed = parser.parse(request.date_to).replace(
-                    tzinfo=timezone.utc
-                )
-            except (ValueError, TypeError) as e:
-                global_logger.error(f"Error: Invalid date_to format - {str(e)}")
-        # Process the result
-        results: list[Paper] = []
-        result_count = 0
-        results_iter = client.results(search)
-        async for paper in results_iter:
-            if result_count >= request.batch_size:
-                break
-            paper_date = paper.published
-            if not paper_date.tzinfo:
-                paper_date = paper_date.replace(tzinfo=timezone.utc)
-            if date_from_parsed and paper_date < date_from_parsed:
-                continue
-            if date_to_parsed and paper_date > date_to_parsed:
-                continue
-            authors = [author.name for author in paper.authors]
-            published_iso = paper.published.isoformat() if paper.published else ""
-            primary_category = paper.primary_category if hasattr(paper, 'primary_category') else ""
-            results.append(Paper(
-                id=paper.entry_id.split('/')[-1],
-                title=paper.title,
-                authors=authors,
-                summary=paper.summary,
-                published=published_iso,
-                pdf_url=paper.pdf_url,
-                primary_category=primary_category,
-            ))
-        global_logger.info("`search_papers_from_arxiv` completed!")
+        await asyncio.to_thread(sync_fulltext_index, request.papers_dir)
+        index = get_fulltext_index(request.papers_dir)
+        results = await asyncio.to_thread(index.search, request.query, request.top_k)
+        global_logger.info("`search_fulltext` completed!")
+        return results
+    except Exception as e:
+        global_logger.error(e)
+
+
+
+async def search_semantic(request: SearchSemanticRequest) -> list[ChunkHit]:
+    """Search inside the downloaded papers by meaning, with the local vector store."""
+    global_logger.info("Calling the `search_semantic` tool")
+    try:
+        if not request.query.strip():
+            raise Exception(f"[ERROR] Invalid query: {request.query}")
+        await asyncio.to_thread(sync_vector_store, request.papers_dir)
+        vector_store = get_vector_store(request.papers_dir)
+        results = await asyncio.to_thread(vector_store.search, request.query, request.top_k)
+        global_logger.info("`search_semantic` completed!")
         return results
-    except arxiv.ArxivError as e:
-        global_logger.error(f"ArXiv API Error: {e}")
     except Exception as e:
         global_logger.error(e)
 
 
 
 async def download_papers(request: DownloadPapersRequest) -> list[str]:
-    """Download multiple PDFs concurrently and return their saved paths.
+    """Download the papers matching the request and return their saved paths.
+
+    Papers already in the local paper store are not fetched again. Downloads
+    go through the shared `download_scheduler`, which bounds the concurrency,
+    rate-limits requests and retries transient failures.
 
     Args:
-        papers: List of Paper objects (with at least 'pdf_url').
-        output_dir: Directory to save PDFs.
+        request: The search request, plus the directory to save the PDFs in.
     Returns:
         List of absolute file paths of the downloaded PDFs.
     """
-    async def _download_one(session: httpx.AsyncClient, paper: Paper, output_dir: str):
-        pdf_url = paper.pdf_url
-        parsed_url = urlparse(pdf_url)
-        if not (parsed_url and parsed_url.scheme and parsed_url.netloc):
-            global_logger.error(f"Invalid URL: {pdf_url}")
-            return None
-        try:
-            response = await session.get(pdf_url)
-            response.raise_for_status()
-            category = paper.primary_category.replace(".", "_")
-            os.makedirs(os.path.join(output_dir, category), exist_ok=True)
-            raw_title = paper.title.strip()
-            safe_title = "".join(c if c.isalnum() or c in " -_." else "_" for c in raw_title)
-            filename = f"{safe_title}.pdf"
-            base_path = os.path.join(output_dir, category)
-            output_path = os.path.join(base_path, filename)
-            if os.path.exists(output_path):
-                global_logger.info(f"File {output_path} already existed!. Skipping it.")
-            else:
-                with open(output_path, "wb") as f:
-                    async for chunk in response.aiter_bytes():
-                        if chunk:
-                            f.write(chunk)
-                global_logger.info(f"Download file {pdf_url} to {output_path} successfully!")
-            return os.path.abspath(output_path)
-        except Exception as e:
-            global_logger.error(f"Failed to download {pdf_url}: {e}")
-            return None
     global_logger.info("Calling the `download_papers` tool")
-    if output_dir is None:
-        output_dir = os.path.expanduser(settings.PAPERS_DIR)
-    papers = await search_papers(
-        request.query,
-        request.batch_size,
-        request.sort_by,
-        request.categories,
-        request.date_from,
-        request.date_to,
-        being_called_from_download=True
-    )
-    async with httpx.AsyncClient(timeout=20) as session:
-        tasks = [ _download_one(session, paper, output_dir) for paper in papers ]
-        results = [ r for r in await asyncio.gather(*tasks) if r ]
+    store = get_paper_store(request.output_dir or settings.PAPERS_DIR)
+    with telemetry.span("arxiv_phase", tool="download_papers", phase="search"):
+        papers = await search_papers(request) or []
+    results: list[str] = []
+    pending: list[Paper] = []
+    for paper in papers:
+        record = store.get(paper.id)
+        if record is not None and os.path.exists(record.path):
+            global_logger.info("Paper %s already stored at %s. Skipping it.", paper.id, record.path)
+            results.append(record.path)
+            continue
+        parsed_url = urlparse(paper.pdf_url)
+        if not (parsed_url and parsed_url.scheme and parsed_url.netloc):
+            global_logger.error("Invalid URL: %s", paper.pdf_url)
+            continue
+        pending.append(paper)
+    jobs = [DownloadJob(url=paper.pdf_url, output_path=store.path_for(paper)) for paper in pending]
+    with telemetry.span("arxiv_phase", tool="download_papers", phase="download"):
+        downloads = await download_scheduler.run(jobs)
+    with telemetry.span("arxiv_phase", tool="download_papers", phase="store"):
+        for paper, result in zip(pending, downloads):
+            if result is None:
+                continue
+            store.add(paper, result.path, result.size, result.sha256)
+            results.append(result.path)
+            telemetry.inc("downloaded_bytes_total", result.size)
     global_logger.info("`download_papers` completed!")
     return results
 
 
-def list_papers(papers_dir: str = settings.PAPERS_DIR):
-    papers = [
-        os.path.join(root, file)
-        for root, _, files in os.walk(papers_dir, topdown=True)
-        for file in files
-        if file.endswith('.pdf')
-    ]
-    return papers
+
+def list_papers(papers_dir: str = settings.PAPERS_DIR) -> list[str]:
+    return [record.path for record in get_paper_store(papers_dir).list()]
+
+
+
+def _find_paper_records(query: str, papers_dir: str) -> list[PaperRecord]:
+    store = get_paper_store(papers_dir)
+    record = store.get(query)
+    if record is not None:
+        return [record]
+    return store.search(query)
 
 
 
@@ -178,8 +305,7 @@ def list_papers_from_query(
     query: str,
     papers_dir: str = settings.PAPERS_DIR
 ) -> list[str]:
-    list_file_paths = _fuzzy_find_filenames(query, papers_dir)
-    return list_file_paths
+    return [record.path for record in _find_paper_records(query, papers_dir)]
 
 
 
@@ -187,11 +313,18 @@ def delete_papers(
     query: str,
     papers_dir: str = settings.PAPERS_DIR
 ) -> list[str]:
-    delete_file_paths = list_papers_from_query(query, papers_dir)
-    for path in delete_file_paths:
-        try:
-            os.remove(path)
-            global_logger.info(f"Deleted file: {path}")
-        except Exception as e:
-            global_logger.error(f"Failed to delete {path}: {e}")
-    return delete_file_paths
\ No newline at end of file
+    """Delete the one paper identified by an arXiv id or (nearly) its full title.
+
+    Fuzzy matches are not enough to delete: a query matching no paper or
+    several papers is refused, so a vague query can never remove a library.
+    """
+    store = get_paper_store(papers_dir)
+    record = store.get(query)
+    records = [record] if record is not None else store.match_one(query)
+    if not records:
+        raise ValueError(f"No downloaded paper has the id or title '{query}'")
+    if len(records) > 1:
+        candidates = ", ".join(f"{record.paper.id} ({record.paper.title})" for record in records)
+        raise ValueError(f"'{query}' matches several papers: {candidates}. Use the exact arXiv id of one of them")
+    removed = store.remove(records)
+    return [record.path for record in removed]
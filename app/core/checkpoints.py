@@ -0,0 +1,401 @@
+from __future__ import annotations
+import os
+import re
+import time
+import asyncio
+import hashlib
+import tempfile
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Sequence
+from contextlib import asynccontextmanager
+from typing import Any
+
+import aiosqlite
+from langchain_core.messages import ToolMessage
+from langchain_core.runnables.config import RunnableConfig
+from langgraph.checkpoint.base import ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+from app.configs import settings
+from app.logger import global_logger
+from app.core.telemetry import telemetry
+
+
+# Applied on every connection; `auto_vacuum` only takes effect on a new database
+SQLITE_PRAGMAS = [
+    "PRAGMA auto_vacuum=INCREMENTAL",
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA wal_autocheckpoint=1000",
+]
+REF_KEY = "__checkpoint_ref__"
+REF_CACHE_SIZE = 4096
+# Anything shaped like a blob digest keeps that blob alive
+DIGEST_PATTERN = re.compile(rb"[0-9a-f]{64}")
+COLLECT_BATCH_ROWS = 500
+
+
+
+
+def _find_digests(payloads: list[bytes | None]) -> set[str]:
+    return {match.decode("ascii") for data in payloads if data for match in DIGEST_PATTERN.findall(data)}
+
+
+
+class BlobStore:
+    """Content-addressed files holding payloads offloaded from checkpoints."""
+    def __init__(self, blob_dir: str):
+        self.blob_dir = os.path.expanduser(blob_dir)
+
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.blob_dir, digest[:2], digest)
+
+
+    def put(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return digest
+
+
+    def get(self, digest: str) -> bytes | None:
+        try:
+            with open(self._path(digest), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+
+    def older_than(self, cutoff: float) -> list[str]:
+        digests = []
+        if not os.path.isdir(self.blob_dir):
+            return digests
+        for entry in os.scandir(self.blob_dir):
+            if not entry.is_dir():
+                continue
+            for blob in os.scandir(entry.path):
+                if not blob.name.endswith(".tmp") and blob.stat().st_mtime < cutoff:
+                    digests.append(blob.name)
+        return digests
+
+
+    def remove(self, digest: str):
+        try:
+            os.remove(self._path(digest))
+        except FileNotFoundError:
+            pass
+
+
+
+class ReferenceSerializer(SerializerProtocol):
+    """Checkpoint serializer that stores large tool results by reference.
+
+    A `ToolMessage` whose serialized form reaches `threshold` bytes is written
+    once to the blob store and replaced by a small marker, so the ever-growing
+    message list written at every step does not copy it again.
+    """
+    def __init__(
+        self,
+        blobs: BlobStore,
+        threshold: int = settings.CHECKPOINT_OFFLOAD_BYTES,
+        serde: SerializerProtocol | None = None,
+    ):
+        self.blobs = blobs
+        self.threshold = threshold
+        self.serde = serde or JsonPlusSerializer()
+        self._refs: OrderedDict[str, dict[str, Any]] = OrderedDict()
+
+
+    def _offload(self, value: Any) -> Any:
+        if isinstance(value, ToolMessage):
+            if value.id and value.id in self._refs:
+                self._refs.move_to_end(value.id)
+                return self._refs[value.id]
+            type_, data = self.serde.dumps_typed(value)
+            if len(data) < self.threshold:
+                return value
+            marker = {
+                REF_KEY: self.blobs.put(data),
+                "type": type_,
+                "name": value.name,
+                "tool_call_id": value.tool_call_id,
+            }
+            if value.id:
+                self._refs[value.id] = marker
+                while len(self._refs) > REF_CACHE_SIZE:
+                    self._refs.popitem(last=False)
+            return marker
+        if isinstance(value, dict):
+            return {key: self._offload(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self._offload(item) for item in value]
+        return value
+
+
+    def _restore(self, value: Any) -> Any:
+        if isinstance(value, dict):
+            if REF_KEY in value:
+                data = self.blobs.get(value[REF_KEY])
+                if data is None:
+                    global_logger.warning("Checkpoint payload %s is missing", value[REF_KEY])
+                    return ToolMessage(
+                        content="[The result of this tool call is no longer available]",
+                        name=value.get("name"),
+                        tool_call_id=value.get("tool_call_id", ""),
+                    )
+                return self.serde.loads_typed((value["type"], data))
+            return {key: self._restore(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self._restore(item) for item in value]
+        return value
+
+
+    def dumps_typed(self, obj: Any) -> tuple[str, bytes]:
+        if self.threshold <= 0:
+            return self.serde.dumps_typed(obj)
+        return self.serde.dumps_typed(self._offload(obj))
+
+
+    def loads_typed(self, data: tuple[str, bytes]) -> Any:
+        return self._restore(self.serde.loads_typed(data))
+
+
+
+class ManagedSqliteSaver(AsyncSqliteSaver):
+    """`AsyncSqliteSaver` with tuned pragmas, retention and background compaction.
+
+    Only the last `keep_last` checkpoints of each thread are kept, threads
+    idle for longer than `thread_ttl` are deleted, and free pages are
+    reclaimed once they make up `vacuum_free_ratio` of the file. Retention
+    drops the checkpoint history, so it must not be used with graphs relying
+    on delta channels or time travel past `keep_last` steps.
+    """
+    def __init__(
+        self,
+        conn: aiosqlite.Connection,
+        *,
+        serde: SerializerProtocol | None = None,
+        blobs: BlobStore | None = None,
+        keep_last: int = settings.CHECKPOINT_KEEP_LAST,
+        thread_ttl: float = settings.CHECKPOINT_THREAD_TTL_SECONDS,
+        vacuum_free_ratio: float = settings.CHECKPOINT_VACUUM_FREE_RATIO,
+    ):
+        super().__init__(conn, serde=serde)
+        self.blobs = blobs
+        self.keep_last = keep_last
+        self.thread_ttl = thread_ttl
+        self.vacuum_free_ratio = vacuum_free_ratio
+        self._maintenance_task: asyncio.Task | None = None
+        self._activity_ready = False
+
+
+    async def setup(self) -> None:
+        await super().setup()
+        if self._activity_ready:
+            return
+        async with self.lock:
+            if self._activity_ready:
+                return
+            await self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS thread_activity (thread_id TEXT PRIMARY KEY, last_seen REAL NOT NULL)"
+            )
+            # Threads written before the table existed start their TTL now
+            await self.conn.execute(
+                "INSERT OR IGNORE INTO thread_activity (thread_id, last_seen) "
+                "SELECT DISTINCT thread_id, ? FROM checkpoints",
+                (time.time(),),
+            )
+            await self.conn.commit()
+            self._activity_ready = True
+
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        await self.setup()
+        with telemetry.span("checkpoint", op="put"):
+            async with self.lock:
+                # Committed together with the checkpoint by the parent class
+                await self.conn.execute(
+                    "INSERT INTO thread_activity (thread_id, last_seen) VALUES (?, ?) "
+                    "ON CONFLICT (thread_id) DO UPDATE SET last_seen = excluded.last_seen",
+                    (str(config["configurable"]["thread_id"]), time.time()),
+                )
+            return await super().aput(config, checkpoint, metadata, new_versions)
+
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        with telemetry.span("checkpoint", op="get"):
+            return await super().aget_tuple(config)
+
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        with telemetry.span("checkpoint", op="put_writes"):
+            await super().aput_writes(config, writes, task_id, task_path)
+
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await super().adelete_thread(thread_id)
+        async with self.lock:
+            await self.conn.execute("DELETE FROM thread_activity WHERE thread_id = ?", (str(thread_id),))
+            await self.conn.commit()
+
+
+    async def prune(self) -> dict[str, int]:
+        """Delete idle threads and all but the last `keep_last` checkpoints of the others."""
+        await self.setup()
+        async with self.lock:
+            cursor = await self.conn.execute(
+                "SELECT thread_id FROM thread_activity WHERE last_seen < ?", (time.time() - self.thread_ttl,)
+            )
+            idle_threads = [row[0] for row in await cursor.fetchall()]
+        for thread_id in idle_threads:
+            await self.adelete_thread(thread_id)
+        async with self.lock:
+            cursor = await self.conn.execute(
+                "DELETE FROM checkpoints WHERE rowid IN ("
+                "SELECT rowid FROM (SELECT rowid, ROW_NUMBER() OVER ("
+                "PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC) AS position FROM checkpoints) "
+                "WHERE position > ?)",
+                (self.keep_last,),
+            )
+            pruned_checkpoints = cursor.rowcount
+            cursor = await self.conn.execute(
+                "DELETE FROM writes WHERE NOT EXISTS (SELECT 1 FROM checkpoints WHERE "
+                "checkpoints.thread_id = writes.thread_id AND checkpoints.checkpoint_ns = writes.checkpoint_ns "
+                "AND checkpoints.checkpoint_id = writes.checkpoint_id)"
+            )
+            pruned_writes = cursor.rowcount
+            await self.conn.commit()
+        return {
+            "idle_threads": len(idle_threads),
+            "checkpoints": pruned_checkpoints,
+            "writes": pruned_writes,
+        }
+
+
+    async def _referenced_digests(self, table: str, column: str) -> set[str]:
+        """Digests mentioned by any row of `table`, read in batches so writers are not held up."""
+        referenced: set[str] = set()
+        last_rowid = -1
+        while True:
+            async with self.lock:
+                cursor = await self.conn.execute(
+                    f"SELECT rowid, {column} FROM {table} WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                    (last_rowid, COLLECT_BATCH_ROWS),
+                )
+                rows = await cursor.fetchall()
+            if not rows:
+                return referenced
+            last_rowid = rows[-1][0]
+            referenced |= await asyncio.to_thread(_find_digests, [data for _, data in rows])
+
+
+    async def collect_blobs(self) -> int:
+        """Remove offloaded payloads no checkpoint refers to any more."""
+        if self.blobs is None:
+            return 0
+        # Recent blobs may belong to a checkpoint being written right now
+        candidates = await asyncio.to_thread(self.blobs.older_than, time.time() - 60 * 60)
+        if not candidates:
+            return 0
+        referenced = await self._referenced_digests("checkpoints", "checkpoint")
+        referenced |= await self._referenced_digests("writes", "value")
+        unreferenced = set(candidates) - referenced
+        for digest in unreferenced:
+            await asyncio.to_thread(self.blobs.remove, digest)
+        return len(unreferenced)
+
+
+    async def vacuum(self) -> bool:
+        """Checkpoint the WAL and reclaim free pages once enough of the file is unused."""
+        async with self.lock:
+            await self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            page_count = (await (await self.conn.execute("PRAGMA page_count")).fetchone())[0]
+            free_pages = (await (await self.conn.execute("PRAGMA freelist_count")).fetchone())[0]
+            if not page_count or free_pages / page_count < self.vacuum_free_ratio:
+                return False
+            auto_vacuum = (await (await self.conn.execute("PRAGMA auto_vacuum")).fetchone())[0]
+            if auto_vacuum == 2:
+                await self.conn.execute("PRAGMA incremental_vacuum")
+            else:
+                # Databases created before `auto_vacuum` was set need one full rewrite
+                await self.conn.commit()
+                await self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                await self.conn.execute("VACUUM")
+            await self.conn.commit()
+        global_logger.info("Vacuumed the checkpoint database (%s/%s free pages)", free_pages, page_count)
+        return True
+
+
+    async def maintain(self) -> dict[str, Any]:
+        pruned = await self.prune()
+        blobs_removed = await self.collect_blobs()
+        vacuumed = await self.vacuum()
+        stats = {**pruned, "blobs": blobs_removed, "vacuumed": vacuumed}
+        global_logger.info("Checkpoint maintenance done: %s", stats)
+        return stats
+
+
+    async def _maintenance_loop(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.maintain()
+            except Exception as e:
+                global_logger.error("Checkpoint maintenance failed: %s", e)
+
+
+    def start_maintenance(self, interval: float = settings.CHECKPOINT_MAINTENANCE_INTERVAL_SECONDS):
+        if self._maintenance_task is None and interval > 0:
+            self._maintenance_task = asyncio.create_task(self._maintenance_loop(interval))
+
+
+    async def stop_maintenance(self):
+        if self._maintenance_task is not None:
+            self._maintenance_task.cancel()
+            try:
+                await self._maintenance_task
+            except asyncio.CancelledError:
+                pass
+            self._maintenance_task = None
+
+
+
+@asynccontextmanager
+async def open_checkpointer(
+    conn_string: str = settings.SQLITE_CHECKPOINTS_URI,
+    maintenance: bool = True,
+) -> AsyncIterator[ManagedSqliteSaver]:
+    """Open the checkpoint database with tuned pragmas, payload offloading and background maintenance."""
+    blobs = BlobStore(settings.CHECKPOINT_BLOB_DIR)
+    async with aiosqlite.connect(conn_string) as conn:
+        for pragma in SQLITE_PRAGMAS:
+            await conn.execute(pragma)
+        checkpointer = ManagedSqliteSaver(conn, serde=ReferenceSerializer(blobs), blobs=blobs)
+        if maintenance:
+            checkpointer.start_maintenance()
+        try:
+            yield checkpointer
+        finally:
+            await checkpointer.stop_maintenance()
@@ -0,0 +1,182 @@
+from __future__ import annotations
+import os
+import mmap
+import json
+import zlib
+import struct
+import hashlib
+import tempfile
+import threading
+from collections.abc import Iterator
+
+from app.configs import settings
+from app.logger import global_logger
+from app.utils.arxiv_helpers import PARSER_VERSION
+
+
+CACHE_MAGIC = b"SADC"
+CACHE_FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHI")
+PAGE_ENTRY = struct.Struct("<QI")
+HASH_CHUNK_SIZE = 1 << 20
+
+
+
+
+def _hash_file(path: str) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+
+class CachedDocument:
+    """A parsed PDF loaded lazily from a memory-mapped cache entry.
+
+    The file holds a header, a table of (offset, length) entries, and one
+    zlib-compressed JSON record per page. Pages are only decoded on access.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, page_count = HEADER.unpack_from(self._mmap, 0)
+        if magic != CACHE_MAGIC or version != CACHE_FORMAT_VERSION:
+            self._mmap.close()
+            raise ValueError(f"Unsupported document cache entry: {path}")
+        self._page_count = page_count
+
+
+    def __len__(self) -> int:
+        return self._page_count
+
+
+    def page(self, index: int) -> dict:
+        if not 0 <= index < self._page_count:
+            raise IndexError(index)
+        offset, length = PAGE_ENTRY.unpack_from(self._mmap, HEADER.size + index * PAGE_ENTRY.size)
+        return json.loads(zlib.decompress(self._mmap[offset:offset + length]))
+
+
+    def pages(self) -> Iterator[dict]:
+        for index in range(self._page_count):
+            yield self.page(index)
+
+
+    def close(self):
+        self._mmap.close()
+
+
+    def __enter__(self) -> CachedDocument:
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+
+class DocumentCache:
+    """On-disk cache of parsed PDFs, keyed by file content hash and parser version.
+
+    Entries are evicted least-recently-used first once the cache grows past
+    `max_bytes`.
+    """
+    def __init__(
+        self,
+        cache_dir: str = settings.DOCUMENT_CACHE_DIR,
+        max_bytes: int = settings.DOCUMENT_CACHE_MAX_BYTES,
+    ):
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # (path, size, mtime) -> sha256, so unchanged files are not re-hashed
+        self._hashes: dict[tuple[str, int, int], str] = {}
+        self._total_bytes = sum(
+            entry.stat().st_size for entry in os.scandir(self.cache_dir) if entry.is_file()
+        ) if os.path.isdir(self.cache_dir) else 0
+
+
+    def file_hash(self, pdf_path: str) -> str:
+        stat = os.stat(pdf_path)
+        key = (os.path.abspath(pdf_path), stat.st_size, stat.st_mtime_ns)
+        if key not in self._hashes:
+            self._hashes[key] = _hash_file(pdf_path)
+        return self._hashes[key]
+
+
+    def _entry_path(self, sha256: str) -> str:
+        return os.path.join(self.cache_dir, f"{sha256}-{PARSER_VERSION}.bin")
+
+
+    def get(self, pdf_path: str, sha256: str | None = None) -> CachedDocument | None:
+        entry_path = self._entry_path(sha256 or self.file_hash(pdf_path))
+        try:
+            document = CachedDocument(entry_path)
+        except FileNotFoundError:
+            return None
+        except (ValueError, struct.error, OSError) as e:
+            global_logger.warning("Dropping unreadable document cache entry %s: %s", entry_path, e)
+            self._remove(entry_path)
+            return None
+        # Touch the entry so eviction sees it as recently used
+        os.utime(entry_path)
+        return document
+
+
+    def put(self, pdf_path: str, parsed_pages: list[dict], sha256: str | None = None):
+        entry_path = self._entry_path(sha256 or self.file_hash(pdf_path))
+        records = [zlib.compress(json.dumps(page).encode("utf-8")) for page in parsed_pages]
+        offset = HEADER.size + PAGE_ENTRY.size * len(records)
+        table = bytearray()
+        for record in records:
+            table += PAGE_ENTRY.pack(offset, len(record))
+            offset += len(record)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(HEADER.pack(CACHE_MAGIC, CACHE_FORMAT_VERSION, len(records)))
+                f.write(table)
+                for record in records:
+                    f.write(record)
+            previous_size = os.path.getsize(entry_path) if os.path.exists(entry_path) else 0
+            os.replace(tmp_path, entry_path)
+        except OSError as e:
+            global_logger.error("Failed to write document cache entry %s: %s", entry_path, e)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        with self._lock:
+            self._total_bytes += offset - previous_size
+        self._evict()
+
+
+    def _remove(self, entry_path: str):
+        try:
+            size = os.path.getsize(entry_path)
+            os.remove(entry_path)
+        except OSError:
+            return
+        with self._lock:
+            self._total_bytes -= size
+
+
+    def _evict(self):
+        if self._total_bytes <= self.max_bytes:
+            return
+        entries = sorted(
+            (entry for entry in os.scandir(self.cache_dir) if entry.name.endswith(".bin")),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        for entry in entries:
+            if self._total_bytes <= self.max_bytes:
+                break
+            global_logger.debug("Evicting document cache entry %s", entry.name)
+            self._remove(entry.path)
+
+
+
+document_cache = DocumentCache()
@@ -0,0 +1,290 @@
+from __future__ import annotations
+import os
+import re
+import random
+import asyncio
+import hashlib
+import weakref
+from dataclasses import dataclass, field
+from collections.abc import Awaitable, Callable
+from urllib.parse import urlparse
+
+import httpx
+
+from app.configs import settings
+from app.logger import global_logger
+from app.dependencies.http_client import get_http_client
+from app.utils.rate_limit import TokenBucket
+
+
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+PARTIAL_SUFFIX = ".part"
+HASH_CHUNK_SIZE = 1 << 20
+CONTENT_RANGE_PATTERN = re.compile(r"bytes (?:(\d+)-\d+|\*)/(\d+|\*)")
+
+
+
+
+class IncompleteDownloadError(RuntimeError):
+    """A downloaded or partly downloaded file does not match what the server reports."""
+
+
+
+@dataclass
+class DownloadJob:
+    url: str
+    output_path: str
+
+
+
+@dataclass
+class DownloadResult:
+    path: str
+    size: int
+    sha256: str | None
+    skipped: bool = False
+
+
+
+@dataclass
+class DownloadProgress:
+    completed: int
+    total: int
+    succeeded: int
+    failed: int
+    job: DownloadJob
+    result: DownloadResult | None
+
+
+
+@dataclass
+class _LoopLimits:
+    """The concurrency caps of one event loop, as asyncio semaphores bind to the loop that first waits on them."""
+    global_limit: asyncio.Semaphore
+    host_limits: dict[str, asyncio.Semaphore] = field(default_factory=dict)
+
+
+
+def _hash_file(path: str) -> "hashlib._Hash":
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            hasher.update(chunk)
+    return hasher
+
+
+
+def _parse_content_range(value: str | None) -> tuple[int | None, int | None]:
+    """Return the first byte and the total size from a `Content-Range` header, each None if unknown."""
+    match = CONTENT_RANGE_PATTERN.fullmatch((value or "").strip())
+    if match is None:
+        return None, None
+    start, total = match.group(1), match.group(2)
+    return (int(start) if start else None), (int(total) if total != "*" else None)
+
+
+
+def _expected_size(response: httpx.Response) -> int | None:
+    if response.status_code == 206:
+        return _parse_content_range(response.headers.get("Content-Range"))[1]
+    # The decoded body of a compressed response is longer than its Content-Length
+    if response.headers.get("Content-Encoding", "identity") != "identity":
+        return None
+    length = response.headers.get("Content-Length")
+    return int(length) if length and length.isdigit() else None
+
+
+
+async def _fetch_partial(client: httpx.AsyncClient, url: str, partial_path: str) -> "hashlib._Hash":
+    """Complete `partial_path` from `url`, raising `IncompleteDownloadError` if it cannot be trusted."""
+    offset = os.path.getsize(partial_path) if os.path.exists(partial_path) else 0
+    hasher = await asyncio.to_thread(_hash_file, partial_path) if offset else hashlib.sha256()
+    headers = {"Range": f"bytes={offset}-"} if offset else {}
+    async with client.stream("GET", url, headers=headers) as response:
+        if offset and response.status_code == 416:
+            total = _parse_content_range(response.headers.get("Content-Range"))[1]
+            if total != offset:
+                raise IncompleteDownloadError(f"{partial_path} has {offset} bytes but the file has {total}")
+            global_logger.debug("Partial file %s is already complete", partial_path)
+            return hasher
+        response.raise_for_status()
+        if offset and response.status_code != 206:
+            # The server ignored the Range header, so start over
+            offset = 0
+            hasher = hashlib.sha256()
+        if response.status_code == 206:
+            start = _parse_content_range(response.headers.get("Content-Range"))[0]
+            if start != offset:
+                raise IncompleteDownloadError(f"Asked for {url} from byte {offset} but got a range from {start}")
+        expected_size = _expected_size(response)
+        with open(partial_path, "ab" if offset else "wb") as f:
+            async for chunk in response.aiter_bytes():
+                if chunk:
+                    f.write(chunk)
+                    hasher.update(chunk)
+    size = os.path.getsize(partial_path)
+    if expected_size is not None and size != expected_size:
+        raise IncompleteDownloadError(f"{partial_path} has {size} bytes but the file has {expected_size}")
+    return hasher
+
+
+
+async def download_file(client: httpx.AsyncClient, job: DownloadJob) -> DownloadResult:
+    """Stream `job.url` to `job.output_path` without buffering it in memory.
+
+    Existing files are returned without touching the network. Bytes go to a
+    `.part` file that is resumed with an HTTP Range request after a failure,
+    and the finished file is renamed into place atomically once its size
+    matches the one the server reports. A `.part` file that does not line up
+    with the server's is discarded and downloaded again once.
+    """
+    output_path = os.path.abspath(job.output_path)
+    if os.path.exists(output_path):
+        global_logger.info("File %s already existed!. Skipping it.", output_path)
+        return DownloadResult(output_path, os.path.getsize(output_path), None, skipped=True)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    partial_path = output_path + PARTIAL_SUFFIX
+    try:
+        hasher = await _fetch_partial(client, job.url, partial_path)
+    except IncompleteDownloadError as e:
+        global_logger.warning("Restarting the download of %s: %s", job.url, e)
+        os.remove(partial_path)
+        hasher = await _fetch_partial(client, job.url, partial_path)
+    os.replace(partial_path, output_path)
+    global_logger.info("Download file %s to %s successfully!", job.url, output_path)
+    return DownloadResult(output_path, os.path.getsize(output_path), hasher.hexdigest())
+
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRYABLE_STATUS_CODES
+    return isinstance(error, (httpx.TransportError, asyncio.TimeoutError, IncompleteDownloadError))
+
+
+
+def _retry_after(error: Exception) -> float | None:
+    if not isinstance(error, httpx.HTTPStatusError):
+        return None
+    value = error.response.headers.get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+
+class DownloadScheduler:
+    """Run download jobs under global and per-host concurrency caps.
+
+    Every attempt waits for a token from a shared token bucket, so the request
+    rate stays steady regardless of the batch size. Transient failures are
+    retried with full-jitter exponential backoff. The semaphores are created
+    lazily for each running event loop, so a module-level scheduler also
+    works from `asyncio.run` calls and worker threads with their own loops.
+    """
+    def __init__(
+        self,
+        max_concurrency: int = settings.DOWNLOAD_MAX_CONCURRENCY,
+        max_per_host: int = settings.DOWNLOAD_MAX_PER_HOST,
+        rate_per_second: float = settings.DOWNLOAD_RATE_PER_SECOND,
+        burst: int = settings.DOWNLOAD_BURST,
+        max_retries: int = settings.DOWNLOAD_MAX_RETRIES,
+        backoff_base: float = settings.DOWNLOAD_BACKOFF_BASE_SECONDS,
+        backoff_max: float = settings.DOWNLOAD_BACKOFF_MAX_SECONDS,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_per_host = max_per_host
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        # Event loop -> its limits, dropped along with the loop
+        self._loop_limits: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        # Thread-safe and loop-agnostic, so the rate is shared by every loop
+        self._rate_limiter = TokenBucket(rate_per_second, burst)
+
+
+    def _limits(self) -> _LoopLimits:
+        loop = asyncio.get_running_loop()
+        limits = self._loop_limits.get(loop)
+        if limits is None:
+            limits = self._loop_limits[loop] = _LoopLimits(asyncio.Semaphore(self.max_concurrency))
+        return limits
+
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        host = urlparse(url).netloc
+        host_limits = self._limits().host_limits
+        if host not in host_limits:
+            host_limits[host] = asyncio.Semaphore(self.max_per_host)
+        return host_limits[host]
+
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+
+    async def _run_job(
+        self,
+        client: httpx.AsyncClient,
+        job: DownloadJob,
+        fetch: Callable[[httpx.AsyncClient, DownloadJob], Awaitable[DownloadResult]],
+    ) -> DownloadResult | None:
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self._limits().global_limit, self._host_limit(job.url):
+                    await self._rate_limiter.acquire()
+                    return await fetch(client, job)
+            except Exception as e:
+                if attempt >= self.max_retries or not _is_retryable(e):
+                    global_logger.error("Failed to download %s: %s", job.url, e)
+                    return None
+                delay = self._backoff(attempt, e)
+                global_logger.warning(
+                    "Retrying %s in %.1fs (attempt %s/%s): %s", job.url, delay, attempt + 1, self.max_retries, e,
+                )
+                await asyncio.sleep(delay)
+        return None
+
+
+    async def run(
+        self,
+        jobs: list[DownloadJob],
+        fetch: Callable[[httpx.AsyncClient, DownloadJob], Awaitable[DownloadResult]] = download_file,
+        on_progress: Callable[[DownloadProgress], None] | None = None,
+    ) -> list[DownloadResult | None]:
+        """Run `fetch` for every job and return the results in job order.
+
+        `on_progress` is called as each job finishes, in completion order.
+        """
+        client = get_http_client()
+        results: list[DownloadResult | None] = [None] * len(jobs)
+        succeeded = failed = 0
+
+        async def _indexed(index: int, job: DownloadJob):
+            return index, await self._run_job(client, job, fetch)
+
+        tasks = [asyncio.create_task(_indexed(index, job)) for index, job in enumerate(jobs)]
+        try:
+            for completed, task in enumerate(asyncio.as_completed(tasks), start=1):
+                index, result = await task
+                results[index] = result
+                if result:
+                    succeeded += 1
+                else:
+                    failed += 1
+                progress = DownloadProgress(completed, len(jobs), succeeded, failed, jobs[index], result)
+                global_logger.info("Downloaded %d/%d (%d failed): %s", completed, len(jobs), failed, jobs[index].url)
+                if on_progress is not None:
+                    on_progress(progress)
+        finally:
+            for task in tasks:
+                task.cancel()
+        return results
+
+
+
+download_scheduler = DownloadScheduler()
@@ -0,0 +1,342 @@
+from __future__ import annotations
+import os
+import re
+import json
+import math
+import uuid
+import shutil
+import sqlite3
+import threading
+from collections import Counter
+
+import numpy as np
+from langchain_core.documents import Document
+
+from app.configs import settings
+from app.logger import global_logger
+from app.schemas.paper import ChunkHit
+
+
+TOKEN_PATTERN = re.compile(r"[0-9a-z]+")
+MANIFEST_FILE_NAME = "manifest.json"
+# Pointer to the single segment of indexes written before delta segments
+LEGACY_CURRENT_FILE_NAME = "CURRENT"
+CHUNKS_FILE_NAME = "chunks.sqlite"
+MAX_TERM_FREQUENCY = np.iinfo(np.uint16).max
+
+
+
+
+def _tokenize(text: str) -> list[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+
+class _Segment:
+    """An immutable, memory-mapped block of postings and the token counts of its chunks."""
+    def __init__(self, segment_dir: str):
+        self.name = os.path.basename(segment_dir)
+        with open(os.path.join(segment_dir, "vocab.json"), "r", encoding="utf-8") as f:
+            self.vocab: dict[str, int] = json.load(f)
+        self.offsets = np.load(os.path.join(segment_dir, "offsets.npy"), mmap_mode="r")
+        self.chunk_ids = np.load(os.path.join(segment_dir, "chunk_ids.npy"), mmap_mode="r")
+        self.frequencies = np.load(os.path.join(segment_dir, "frequencies.npy"), mmap_mode="r")
+        if os.path.exists(os.path.join(segment_dir, "doc_ids.npy")):
+            self.doc_ids = np.load(os.path.join(segment_dir, "doc_ids.npy"))
+            self.doc_lengths = np.load(os.path.join(segment_dir, "doc_lengths.npy"))
+        else:
+            # Legacy segments hold the lengths of every chunk, indexed by chunk id
+            lengths = np.load(os.path.join(segment_dir, "lengths.npy"))
+            self.doc_ids = np.flatnonzero(lengths)
+            self.doc_lengths = lengths[self.doc_ids]
+
+
+    def postings(self, term: str) -> tuple[np.ndarray, np.ndarray] | None:
+        term_id = self.vocab.get(term)
+        if term_id is None:
+            return None
+        start, end = self.offsets[term_id], self.offsets[term_id + 1]
+        return np.asarray(self.chunk_ids[start:end]), np.asarray(self.frequencies[start:end], dtype=np.float32)
+
+
+    @staticmethod
+    def write(
+        segment_dir: str,
+        vocab: dict[str, int],
+        term_ids: np.ndarray,
+        chunk_ids: np.ndarray,
+        frequencies: np.ndarray,
+        doc_ids: np.ndarray,
+        doc_lengths: np.ndarray,
+    ):
+        order = np.argsort(term_ids, kind="stable")
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(vocab)), out=offsets[1:])
+        os.makedirs(segment_dir, exist_ok=True)
+        np.save(os.path.join(segment_dir, "offsets.npy"), offsets)
+        np.save(os.path.join(segment_dir, "chunk_ids.npy"), chunk_ids[order].astype(np.int32))
+        np.save(os.path.join(segment_dir, "frequencies.npy"), frequencies[order].astype(np.uint16))
+        np.save(os.path.join(segment_dir, "doc_ids.npy"), doc_ids.astype(np.int32))
+        np.save(os.path.join(segment_dir, "doc_lengths.npy"), doc_lengths.astype(np.float32))
+        with open(os.path.join(segment_dir, "vocab.json"), "w", encoding="utf-8") as f:
+            json.dump(vocab, f)
+
+
+
+class FullTextIndex:
+    """BM25 inverted index over paper chunks.
+
+    Postings live in segments of NumPy arrays (term offsets, chunk ids and
+    term frequencies) that are memory-mapped from disk. Added chunks go to an
+    in-memory delta and removed chunks to a tombstone set; `save()` writes
+    the delta as a new segment and persists the tombstones, and merges every
+    segment into one once there are more than `max_segments`. Chunk texts and
+    their paper ids are kept in a SQLite table next to the segments.
+    """
+    def __init__(
+        self,
+        index_dir: str,
+        k1: float = settings.BM25_K1,
+        b: float = settings.BM25_B,
+        max_segments: int = settings.FULLTEXT_MAX_SEGMENTS,
+    ):
+        self.index_dir = os.path.expanduser(index_dir)
+        self.k1 = k1
+        self.b = b
+        self.max_segments = max_segments
+        os.makedirs(self.index_dir, exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(
+            os.path.join(self.index_dir, CHUNKS_FILE_NAME),
+            check_same_thread=False,
+            isolation_level="DEFERRED",
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "chunk_id INTEGER PRIMARY KEY AUTOINCREMENT, paper_id TEXT NOT NULL, path TEXT NOT NULL, "
+            "title TEXT NOT NULL, page INTEGER, text TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS chunks_paper_id ON chunks (paper_id)")
+        self._conn.commit()
+        self._load()
+
+
+    def _read_manifest(self) -> dict:
+        manifest_path = os.path.join(self.index_dir, MANIFEST_FILE_NAME)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        current_path = os.path.join(self.index_dir, LEGACY_CURRENT_FILE_NAME)
+        if os.path.exists(current_path):
+            with open(current_path, "r", encoding="utf-8") as f:
+                return {"segments": [f.read().strip()]}
+        return {}
+
+
+    def _write_manifest(self):
+        manifest_path = os.path.join(self.index_dir, MANIFEST_FILE_NAME)
+        with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({
+                "segments": [segment.name for segment in self._segments],
+                "deleted": sorted(self._deleted),
+            }, f)
+        os.replace(manifest_path + ".tmp", manifest_path)
+        legacy_path = os.path.join(self.index_dir, LEGACY_CURRENT_FILE_NAME)
+        if os.path.exists(legacy_path):
+            os.remove(legacy_path)
+
+
+    def _load(self):
+        manifest = self._read_manifest()
+        self._segments = [
+            _Segment(os.path.join(self.index_dir, name)) for name in manifest.get("segments", [])
+        ]
+        self._deleted: set[int] = set(manifest.get("deleted", []))
+        self._lengths = np.zeros(0, dtype=np.float32)
+        for segment in self._segments:
+            if len(segment.doc_ids):
+                self._set_length(int(segment.doc_ids.max()), 0)
+                self._lengths[segment.doc_ids] = segment.doc_lengths
+        deleted_ids = np.fromiter(self._deleted, dtype=np.int64)
+        self._lengths[deleted_ids[deleted_ids < len(self._lengths)]] = 0
+        self._delta: dict[str, tuple[list[int], list[int]]] = {}
+        self._delta_lengths: dict[int, int] = {}
+        self._live_chunks = int(np.count_nonzero(self._lengths))
+        self._total_length = float(self._lengths.sum())
+        self._dirty = False
+
+
+    def _set_length(self, chunk_id: int, length: int):
+        if chunk_id >= len(self._lengths):
+            grown = np.zeros(max(chunk_id + 1, 2 * len(self._lengths)), dtype=np.float32)
+            grown[:len(self._lengths)] = self._lengths
+            self._lengths = grown
+        self._lengths[chunk_id] = length
+
+
+    def paper_ids(self) -> set[str]:
+        with self._lock:
+            return {row[0] for row in self._conn.execute("SELECT DISTINCT paper_id FROM chunks")}
+
+
+    def add(self, paper_id: str, path: str, title: str, chunks: list[Document]):
+        """Index chunks of one paper. Changes are persisted by `save()`."""
+        with self._lock:
+            for chunk in chunks:
+                cursor = self._conn.execute(
+                    "INSERT INTO chunks (paper_id, path, title, page, text) VALUES (?, ?, ?, ?, ?)",
+                    (paper_id, path, title, chunk.metadata.get("page"), chunk.page_content),
+                )
+                chunk_id = cursor.lastrowid
+                tokens = _tokenize(chunk.page_content)
+                if not tokens:
+                    continue
+                for term, frequency in Counter(tokens).items():
+                    chunk_ids, frequencies = self._delta.setdefault(term, ([], []))
+                    chunk_ids.append(chunk_id)
+                    frequencies.append(min(frequency, MAX_TERM_FREQUENCY))
+                self._set_length(chunk_id, len(tokens))
+                self._delta_lengths[chunk_id] = len(tokens)
+                self._live_chunks += 1
+                self._total_length += len(tokens)
+            self._dirty = True
+
+
+    def remove(self, paper_id: str):
+        with self._lock:
+            rows = self._conn.execute("SELECT chunk_id FROM chunks WHERE paper_id = ?", (paper_id,)).fetchall()
+            if not rows:
+                return
+            for (chunk_id,) in rows:
+                if chunk_id < len(self._lengths) and self._lengths[chunk_id] > 0:
+                    self._live_chunks -= 1
+                    self._total_length -= float(self._lengths[chunk_id])
+                    self._lengths[chunk_id] = 0
+                self._deleted.add(chunk_id)
+            self._conn.execute("DELETE FROM chunks WHERE paper_id = ?", (paper_id,))
+            self._dirty = True
+
+
+    def _postings(self, term: str) -> tuple[np.ndarray, np.ndarray]:
+        parts_ids, parts_frequencies = [], []
+        for segment in self._segments:
+            postings = segment.postings(term)
+            if postings is not None:
+                parts_ids.append(postings[0])
+                parts_frequencies.append(postings[1])
+        if term in self._delta:
+            chunk_ids, frequencies = self._delta[term]
+            parts_ids.append(np.asarray(chunk_ids, dtype=np.int32))
+            parts_frequencies.append(np.asarray(frequencies, dtype=np.float32))
+        if not parts_ids:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+        return np.concatenate(parts_ids), np.concatenate(parts_frequencies)
+
+
+    def search(self, query: str, top_k: int = 10) -> list[ChunkHit]:
+        with self._lock:
+            if self._live_chunks == 0:
+                return []
+            average_length = self._total_length / self._live_chunks
+            all_ids, all_scores = [], []
+            for term in set(_tokenize(query)):
+                chunk_ids, frequencies = self._postings(term)
+                if len(chunk_ids) == 0:
+                    continue
+                lengths = self._lengths[chunk_ids]
+                live = lengths > 0
+                chunk_ids, frequencies, lengths = chunk_ids[live], frequencies[live], lengths[live]
+                document_frequency = len(chunk_ids)
+                if document_frequency == 0:
+                    continue
+                idf = math.log(1 + (self._live_chunks - document_frequency + 0.5) / (document_frequency + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * lengths / average_length)
+                all_ids.append(chunk_ids)
+                all_scores.append(idf * frequencies * (self.k1 + 1) / (frequencies + norm))
+            if not all_ids:
+                return []
+            unique_ids, inverse = np.unique(np.concatenate(all_ids), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(all_scores))
+            k = min(top_k, len(unique_ids))
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best])]
+            hits: list[ChunkHit] = []
+            for position in best:
+                row = self._conn.execute(
+                    "SELECT paper_id, path, title, page, text FROM chunks WHERE chunk_id = ?",
+                    (int(unique_ids[position]),),
+                ).fetchone()
+                if row is not None:
+                    hits.append(ChunkHit(*row, score=float(scores[position])))
+            return hits
+
+
+    def _write_segment(self, postings, doc_ids: np.ndarray, doc_lengths: np.ndarray) -> _Segment:
+        """Write the (term, chunk ids, frequencies) `postings` of live chunks as a new segment."""
+        vocab: dict[str, int] = {}
+        term_ids = [np.zeros(0, dtype=np.int64)]
+        chunk_ids = [np.zeros(0, dtype=np.int32)]
+        frequencies = [np.zeros(0, dtype=np.uint16)]
+        deleted_ids = np.fromiter(self._deleted, dtype=np.int32)
+        for term, term_chunk_ids, term_frequencies in postings:
+            keep = ~np.isin(term_chunk_ids, deleted_ids)
+            if not keep.any():
+                continue
+            term_id = vocab.setdefault(term, len(vocab))
+            term_ids.append(np.full(int(keep.sum()), term_id, dtype=np.int64))
+            chunk_ids.append(np.asarray(term_chunk_ids)[keep])
+            frequencies.append(np.asarray(term_frequencies)[keep])
+        keep = ~np.isin(doc_ids, deleted_ids)
+        segment_dir = os.path.join(self.index_dir, f"segment-{uuid.uuid4().hex}")
+        _Segment.write(
+            segment_dir, vocab, np.concatenate(term_ids), np.concatenate(chunk_ids), np.concatenate(frequencies),
+            doc_ids[keep], doc_lengths[keep],
+        )
+        return _Segment(segment_dir)
+
+
+    def _merge_segments(self) -> _Segment:
+        """Merge every segment into one, dropping the postings of removed chunks."""
+        terms = sorted({term for segment in self._segments for term in segment.vocab})
+
+        def _postings():
+            for term in terms:
+                parts = [postings for segment in self._segments if (postings := segment.postings(term)) is not None]
+                yield term, np.concatenate([ids for ids, _ in parts]), np.concatenate([frequencies for _, frequencies in parts])
+
+        doc_ids = np.concatenate([segment.doc_ids for segment in self._segments])
+        doc_lengths = np.concatenate([segment.doc_lengths for segment in self._segments])
+        return self._write_segment(_postings(), doc_ids, doc_lengths)
+
+
+    def save(self):
+        """Write the delta as a new segment, persist the tombstones and commit the chunk table.
+
+        Only the postings added since the last save are written, so the cost
+        of a save does not grow with the index; segments are merged once
+        there are more than `max_segments`.
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            if self._delta_lengths:
+                self._segments.append(self._write_segment(
+                    ((term, delta_ids, delta_frequencies) for term, (delta_ids, delta_frequencies) in self._delta.items()),
+                    np.fromiter(self._delta_lengths.keys(), dtype=np.int64),
+                    np.fromiter(self._delta_lengths.values(), dtype=np.float32),
+                ))
+            merged_segments = list(self._segments) if len(self._segments) > self.max_segments else []
+            if merged_segments:
+                self._segments = [self._merge_segments()]
+                self._deleted = set()
+            self._write_manifest()
+            self._conn.commit()
+            self._delta, self._delta_lengths = {}, {}
+            self._dirty = False
+            for segment in merged_segments:
+                shutil.rmtree(os.path.join(self.index_dir, segment.name), ignore_errors=True)
+            global_logger.info(
+                "Saved full-text index (%s segments%s)",
+                len(self._segments),
+                ", merged" if merged_segments else "",
+            )
@@ -1,21 +1,29 @@
 from langgraph.types import Command, interrupt
 from langgraph.graph import StateGraph, START, END
-from langgraph.prebuilt import ToolNode
+from langgraph.config import get_stream_writer
 
 from langchain_core.messages import (
     SystemMessage, 
+    HumanMessage,
     AIMessage, 
     ToolMessage, 
+    RemoveMessage,
+    BaseMessage,
 )
 from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.runnables.config import RunnableConfig
 
 from typing_extensions import Literal
-from uuid import uuid4
 
 
 from app.schemas.state import State
-from app.utils.get_prompt import read_from_txt_path
+from app.utils.get_prompt import render_from_txt_path
 from app.configs import settings
+from app.core.tool_executor import ToolExecutor, pending_tool_calls
+from app.core.tool_cache import ToolResultCache
+from app.core.llm_scheduler import LLMScheduler, Priority, llm_scheduler
+from app.core.llm_cache import LLMResponseCache, make_llm_key
+from app.core.telemetry import telemetry
 
 
 RISKY_TOOLS = [
@@ -23,76 +31,208 @@ RISKY_TOOLS = [
     "delete_papers",
 ]
 CONTINUE_COMMANDS = ['continue', 'y', 'yes']
+SUMMARY_PROMPT = (
+    "You maintain the running summary of a conversation between a user and an academic research assistant. "
+    "Merge the current summary with the new messages into one concise summary. Keep the user's goals, "
+    "the papers found or downloaded (titles, arXiv ids, local paths) and any decisions made. "
+    "Drop raw tool output that is no longer needed. Answer with the summary only."
+)
 
 
-def assistant_node(llm_with_tools: BaseChatModel):
-    def _assistant_node(state: State) -> State:
-        response = llm_with_tools.invoke(
-            [SystemMessage(content=read_from_txt_path(settings.ARXIV_PROMPT_PATH).format(default_output_dir=settings.PAPERS_DIR))] + state.messages
-        )
+def _estimate_tokens(messages: list[BaseMessage]) -> int:
+    """Cheap token estimate (~4 characters per token) that needs no tokenizer."""
+    return sum(len(str(message.content)) // 4 + 4 for message in messages)
+
+
+
+def _compaction_boundary(messages: list[BaseMessage]) -> int:
+    """Index of the first message kept verbatim, at a point where no tool call is pending.
+
+    A cut is allowed before a `HumanMessage`, or before an `AIMessage` once
+    every earlier tool call has its `ToolMessage` result, so a tool call is
+    never separated from its result and a single long agentic turn can still
+    be folded. Returns 0 when nothing can be folded.
+    """
+    boundaries, pending = [], set()
+    for index, message in enumerate(messages):
+        if index > 0 and not pending and isinstance(message, (HumanMessage, AIMessage)):
+            boundaries.append(index)
+        if isinstance(message, AIMessage):
+            pending.update(tool_call["id"] for tool_call in message.tool_calls)
+        elif isinstance(message, ToolMessage):
+            pending.discard(message.tool_call_id)
+    if not boundaries:
+        return 0
+    keep_from = len(messages) - settings.CONTEXT_KEEP_RECENT_MESSAGES
+    candidates = [index for index in boundaries if index <= keep_from]
+    return candidates[-1] if candidates else boundaries[-1]
+
+
+
+def _render_for_summary(message: BaseMessage) -> str:
+    content = str(message.content)
+    if isinstance(message, ToolMessage) and len(content) > settings.CONTEXT_TOOL_PAYLOAD_CHARS:
+        content = content[:settings.CONTEXT_TOOL_PAYLOAD_CHARS] + " ...[truncated]"
+    if isinstance(message, AIMessage) and message.tool_calls:
+        content += " " + ", ".join(f"{tool_call['name']}({tool_call['args']})" for tool_call in message.tool_calls)
+    return f"[{message.type}] {content}"
+
+
+
+def _session_of(config: RunnableConfig) -> tuple[str, Priority]:
+    configurable = config.get("configurable", {})
+    return str(configurable.get("thread_id", "default")), configurable.get("priority", "interactive")
+
+
+
+def assistant_node(
+    llm_with_tools: BaseChatModel,
+    scheduler: LLMScheduler = llm_scheduler,
+    llm_cache: LLMResponseCache | None = None,
+):
+    async def _assistant_node(state: State, config: RunnableConfig) -> State:
+        system_prompt = render_from_txt_path(settings.ARXIV_PROMPT_PATH, default_output_dir=settings.PAPERS_DIR)
+        if state.conversation_summary:
+            system_prompt += f"\n\n<conversation_summary>\n{state.conversation_summary}\n</conversation_summary>"
+        messages = [SystemMessage(content=system_prompt)] + state.messages
+        # `bypass_llm_cache` in the run config forces a fresh answer
+        use_cache = llm_cache is not None and not config.get("configurable", {}).get("bypass_llm_cache", False)
+        key = make_llm_key(llm_with_tools, messages) if use_cache else None
+        response = await llm_cache.aget(key) if use_cache else None
+        if response is not None:
+            # Nothing is streamed for a cached answer, so hand it to the custom stream instead
+            get_stream_writer()({
+                "cached_response": response.content,
+                "tool_calls": [[tool_call["name"], tool_call["args"]] for tool_call in response.tool_calls],
+            })
+        else:
+            async with scheduler.slot(*_session_of(config)):
+                with telemetry.span("llm_call", node="assistant_node"):
+                    response = await llm_with_tools.ainvoke(messages, config)
+            if use_cache:
+                await llm_cache.aset(key, response)
         state.messages = state.messages + [response]
         return state
     return _assistant_node
 
 
 
-def assistant_router(state: State) -> Literal["tools_node", "human_node", "summarize_node", END]: # type: ignore
+def context_router(state: State) -> Literal["summarize_node", "assistant_node"]:
+    if _estimate_tokens(state.messages) > settings.CONTEXT_TOKEN_BUDGET and _compaction_boundary(state.messages) > 0:
+        return "summarize_node"
+    return "assistant_node"
+
+
+
+def assistant_router(state: State) -> Literal["tools_node", END]: # type: ignore
     response: AIMessage = state.messages[-1]
     if response.tool_calls:
-        if any(tool_call["name"] in RISKY_TOOLS for tool_call in response.tool_calls):
-            return "human_node"
+        # Safe calls run first; risky ones are sent for approval afterwards
         return "tools_node"
     else:
         return END
 
 
 
-def summarize_node(state: State) -> State:
-    pass
+def tools_router(state: State) -> Literal["human_node", "summarize_node", "assistant_node"]:
+    if any(tool_call["name"] in RISKY_TOOLS for tool_call in pending_tool_calls(state)):
+        return "human_node"
+    return context_router(state)
+
+
+
+def summarize_node(llm: BaseChatModel, scheduler: LLMScheduler = llm_scheduler):
+    """Fold the turns before the recent ones into `conversation_summary`.
+
+    Keeps the tokens sent per LLM call bounded, however long the thread gets.
+    """
+    async def _summarize_node(state: State, config: RunnableConfig) -> dict:
+        boundary = _compaction_boundary(state.messages)
+        if boundary == 0:
+            return {}
+        folded = state.messages[:boundary]
+        transcript = "\n".join(_render_for_summary(message) for message in folded)
+        # The `nostream` tag keeps the summary out of the streamed response
+        async with scheduler.slot(*_session_of(config)):
+            response = await llm.ainvoke([
+                SystemMessage(content=SUMMARY_PROMPT),
+                HumanMessage(content=f"Current summary:\n{state.conversation_summary or 'None'}\n\nNew messages:\n{transcript}"),
+            ], config={**config, "tags": [*config.get("tags", []), "nostream"]})
+        return {
+            "conversation_summary": str(response.content),
+            "messages": [RemoveMessage(id=message.id) for message in folded],
+        }
+    return _summarize_node
 
 
 
 def tools_node(tools: list):
-    return ToolNode(tools)
+    return ToolExecutor(tools, RISKY_TOOLS)
 
 
 
 def human_node(state: State) -> Command[Literal["tools_node", END]]: # type: ignore
-    response: AIMessage = state.messages[-1]
-    tool_call_name = response.tool_calls[0]["name"]
-    prompt  = f"Do you want me to process this tool: {tool_call_name}?" 
+    risky_tool_calls = [
+        tool_call for tool_call in pending_tool_calls(state)
+        if tool_call["name"] in RISKY_TOOLS
+    ]
+    tool_call_names = ", ".join(tool_call["name"] for tool_call in risky_tool_calls)
+    prompt  = f"Do you want me to process this tool: {tool_call_names}?" 
     while True:
         user_input = interrupt(prompt)
         try:
             if user_input.lower() in CONTINUE_COMMANDS:
                 return Command(
-                    goto="tools_node"
+                    goto="tools_node",
+                    update={'approved_tool_calls': [tool_call["id"] for tool_call in risky_tool_calls]}
                 )
             else:
-                tool_message = ToolMessage(
-                    content="Skip the tool calling!",
-                    tool_call_id=str(uuid4())
-                )
+                tool_messages = [
+                    ToolMessage(
+                        content="Skip the tool calling!",
+                        name=tool_call["name"],
+                        tool_call_id=tool_call["id"]
+                    )
+                    for tool_call in risky_tool_calls
+                ]
                 return Command(
                     goto=END,
-                    update={'messsages': tool_message}
+                    update={'messages': tool_messages}
                 )
-        except TypeError:
+        except (TypeError, AttributeError):
             prompt = f"{user_input} is not valid. Only accepts 'continue' or 'reject'"
 
 
 
-def build_graph(llm_with_tools: BaseChatModel, tools: list, checkpointer, image_path: str | None = "images/graph.png"):
+def build_graph(
+    llm_with_tools: BaseChatModel,
+    tools: list,
+    checkpointer,
+    image_path: str | None = "images/graph.png",
+    summarizer: BaseChatModel | None = None,
+    tool_cache: ToolResultCache | None = None,
+    scheduler: LLMScheduler = llm_scheduler,
+    llm_cache: LLMResponseCache | None = None,
+):
+    if tool_cache is not None:
+        tools = tool_cache.wrap_all(tools)
     builder = StateGraph(State)
-    builder.add_node("assistant_node", assistant_node(llm_with_tools))
-    builder.add_node("human_node", human_node)
-    builder.add_node("tools_node", tools_node(tools))
-    builder.add_edge(START, "assistant_node")
+    nodes = {
+        "assistant_node": assistant_node(llm_with_tools, scheduler, llm_cache),
+        "summarize_node": summarize_node(summarizer or llm_with_tools, scheduler),
+        "human_node": human_node,
+        "tools_node": tools_node(tools),
+    }
+    for name, node in nodes.items():
+        # Only pay for the span wrapper when telemetry is on
+        builder.add_node(name, telemetry.wrap_node(name, node) if telemetry.enabled else node)
+    builder.add_conditional_edges(START, context_router)
     builder.add_conditional_edges(
         "assistant_node",
         assistant_router
     )
-    builder.add_edge("tools_node", "assistant_node")
+    builder.add_edge("summarize_node", "assistant_node")
+    builder.add_conditional_edges("tools_node", tools_router)
     graph = builder.compile(checkpointer=checkpointer)
     if image_path is not None:
         with open(image_path, "wb") as f:
@@ -1,5 +1,7 @@
+import json
+import time
 import asyncio
-import datetime
+from uuid import UUID
 from typing_extensions import Any
 from collections.abc import AsyncGenerator
 from rich.console import Console
@@ -7,14 +9,20 @@ from rich.console import Console
 from langchain_ollama import ChatOllama
 from langchain_core.messages import HumanMessage, AIMessageChunk, ToolCallChunk
 from langchain_core.runnables.config import RunnableConfig
-from langchain_mcp_adapters.client import MultiServerMCPClient
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
 
 from langgraph.types import Command
 from langgraph.graph.state import CompiledStateGraph
-from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 
 from app.configs import settings
 from app.core.graph_builder import build_graph
+from app.core.tool_cache import ToolResultCache
+from app.core.llm_cache import LLMResponseCache
+from app.core.checkpoints import open_checkpointer
+from app.core.local_tools import load_tools
+from app.core.telemetry import telemetry
+from app.dependencies.mcp_client import close_mcp_pool
 
 
 
@@ -34,6 +42,55 @@ async def process_tool_call_chunk(chunk: ToolCallChunk):
     return tool_call_str
 
 
+class _GenerationTimer(BaseCallbackHandler):
+    """Observe time to first token and tokens per second of every streamed model call.
+
+    Both are timed from the chat model run itself, so the time spent waiting
+    for an LLM slot or running tools earlier in the stream is not counted.
+    """
+    run_inline = True
+
+
+    def __init__(self):
+        # run id -> [call start, first token time, chunks with content]
+        self._generations: dict[UUID, list] = {}
+
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, tags: list[str] | None = None, **kwargs):
+        # Summaries are kept out of the response stream, and out of these metrics
+        if "nostream" not in (tags or []):
+            self._generations[run_id] = [time.perf_counter(), None, 0]
+
+
+    def on_llm_new_token(self, token: str, *, chunk=None, run_id: UUID, **kwargs):
+        generation = self._generations.get(run_id)
+        message = getattr(chunk, "message", None)
+        if generation is None or not (token or getattr(message, "tool_call_chunks", None)):
+            return
+        if generation[1] is None:
+            generation[1] = time.perf_counter()
+            telemetry.observe("llm_time_to_first_token_seconds", generation[1] - generation[0])
+        generation[2] += 1
+
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs):
+        generation = self._generations.pop(run_id, None)
+        if generation is None or generation[1] is None:
+            return
+        message = getattr(response.generations[0][0], "message", None) if response.generations and response.generations[0] else None
+        usage = getattr(message, "usage_metadata", None)
+        tokens = usage["output_tokens"] if usage else generation[2]
+        elapsed = time.perf_counter() - generation[1]
+        if tokens and elapsed > 0:
+            telemetry.observe("llm_tokens_per_second", tokens / elapsed)
+            telemetry.inc("llm_output_tokens_total", tokens)
+
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs):
+        self._generations.pop(run_id, None)
+
+
+
 async def stream_graph_responses(
     input: dict[str, Any] | Command,
     graph: CompiledStateGraph,
@@ -49,11 +106,24 @@ async def stream_graph_responses(
     Returns:
         str: The final LLM or tool call response
     """
-    async for message_chunk, _ in graph.astream(
+    if telemetry.enabled:
+        config = kwargs.pop("config", None) or {}
+        kwargs["config"] = {**config, "callbacks": [*(config.get("callbacks") or []), _GenerationTimer()]}
+    async for stream_mode, chunk in graph.astream(
         input=input,
-        stream_mode="messages",
+        stream_mode=["messages", "custom"],
         **kwargs
         ):
+        if stream_mode == "custom":
+            # Tool results are reported as soon as each call finishes
+            if "tool" in chunk:
+                yield f"\n< TOOL DONE: {chunk['tool']} ({chunk['status']}, {chunk['elapsed']:.1f}s) >\n"
+            elif "cached_response" in chunk:
+                yield str(chunk["cached_response"])
+                for name, args in chunk["tool_calls"]:
+                    yield await process_tool_call_chunk({"name": name, "args": json.dumps(args)})
+            continue
+        message_chunk, _ = chunk
         if isinstance(message_chunk, AIMessageChunk):
             if message_chunk.response_metadata:
                 finish_reason = message_chunk.response_metadata.get("finish_reason", "")
@@ -77,48 +147,53 @@ async def stream_graph_responses(
 
 
 
+async def create_graph(checkpointer) -> CompiledStateGraph:
+    """Load the tools and the chat model, and compile the agent graph."""
+    tools = await load_tools()
+    llm = ChatOllama(model=settings.CHAT_MODEL_NAME, temperature=0.1)
+    llm_with_tools = llm.bind_tools(tools)
+    return build_graph(
+        llm_with_tools,
+        tools,
+        checkpointer,
+        None,
+        summarizer=llm,
+        tool_cache=ToolResultCache(),
+        llm_cache=LLMResponseCache() if settings.LLM_CACHE_ENABLED else None,
+    )
+
+
+
 async def main():
-    async with AsyncSqliteSaver.from_conn_string(settings.SQLITE_CHECKPOINTS_URI) as checkpointer:
+    async with open_checkpointer() as checkpointer:
+        # A stable thread id lets the conversation continue across launches
         config = RunnableConfig(
             recursion_limit=10,
             configurable={
-                "thread_id": hash(datetime.datetime.today().isoformat())
+                "thread_id": settings.CLI_THREAD_ID
             }
         )
         console = Console()
-        mcp_client = MultiServerMCPClient(
-            {
-                "arxiv": {
-                    "command": "python",
-                    "args": ["-m", "backend.mcp_servers.arxiv.server"],
-                    "transport": "stdio"
-                },
-                "books": {
-                    "command": "python",
-                    "args": ["-m", "backend.mcp_servers.books.server"],
-                    "transport": "stdio"
+        graph = await create_graph(checkpointer)
+        try:
+            while True:
+                user_input = console.input("[green]>You:[/green] ")
+                if user_input in ["/bye", "/exit"]:
+                    break
+                input_message = HumanMessage(content=user_input)
+                initial_input = {
+                    "messages": [input_message]
                 }
-            }
-        )
-        tools = await mcp_client.get_tools()
-        llm_with_tools = ChatOllama(model=settings.CHAT_MODEL_NAME, temperature=0.1).bind_tools(tools)
-        graph = build_graph(llm_with_tools, tools, checkpointer, None)
-        while True:
-            user_input = console.input("[green]>You:[/green] ")
-            if user_input in ["/bye", "/exit"]:
-                break
-            input_message = HumanMessage(content=user_input)
-            initial_input = {
-                "messages": [input_message]
-            }
-            console.print(f"[cyan]>Assistant:[/cyan] ")
-            async for response in stream_graph_responses(initial_input, graph, config=config):
-                console.print(response, end="")
-            thread_state = await graph.aget_state(config=config)
-            if thread_state.interrupts:
-                for interrupt in thread_state.interrupts:
-                    console.print(f"\n[red]>System:[/red] {interrupt.value}")
-                    user_decision = console.input("[green]>You:[/green] ")
-                    async for response in stream_graph_responses(Command(resume=user_decision), graph, config=config):
-                        console.print(response, end="")
-            console.print("\n")
\ No newline at end of file
+                console.print(f"[cyan]>Assistant:[/cyan] ")
+                async for response in stream_graph_responses(initial_input, graph, config=config):
+                    console.print(response, end="")
+                thread_state = await graph.aget_state(config=config)
+                if thread_state.interrupts:
+                    for interrupt in thread_state.interrupts:
+                        console.print(f"\n[red]>System:[/red] {interrupt.value}")
+                        user_decision = console.input("[green]>You:[/green] ")
+                        async for response in stream_graph_responses(Command(resume=user_decision), graph, config=config):
+                            console.print(response, end="")
+                console.print("\n")
+        finally:
+            await close_mcp_pool()
\ No newline at end of file
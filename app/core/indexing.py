@@ -0,0 +1,128 @@
+from __future__ import annotations
+import os
+import threading
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+from app.configs import settings
+from app.logger import global_logger
+from app.core.paper_store import PaperStore, get_paper_store
+from app.utils.arxiv_helpers import _split_documents
+
+# The indexes pull in numpy, so they are imported when first built
+if TYPE_CHECKING:
+    from app.core.fulltext_index import FullTextIndex
+    from app.core.vector_store import VectorStore
+
+
+INDEX_DIR_NAME = ".index"
+
+
+
+
+@lru_cache(maxsize=None)
+def _get_fulltext_index(papers_dir: str) -> FullTextIndex:
+    from app.core.fulltext_index import FullTextIndex
+    return FullTextIndex(os.path.join(papers_dir, INDEX_DIR_NAME, "fulltext"))
+
+
+
+def get_fulltext_index(papers_dir: str = settings.PAPERS_DIR) -> FullTextIndex:
+    return _get_fulltext_index(get_paper_store(papers_dir).papers_dir)
+
+
+
+@lru_cache(maxsize=None)
+def _get_vector_store(papers_dir: str) -> VectorStore:
+    from app.core.vector_store import VectorStore, get_default_embedder
+    return VectorStore(os.path.join(papers_dir, INDEX_DIR_NAME, "vectors"), get_default_embedder())
+
+
+
+def get_vector_store(papers_dir: str = settings.PAPERS_DIR) -> VectorStore:
+    return _get_vector_store(get_paper_store(papers_dir).papers_dir)
+
+
+
+class LocalIndexSynchronizer:
+    """Keep one local retrieval index in step with a paper store.
+
+    Papers that entered the store since the last sync are ingested once,
+    chunked and added to the index; papers that left it are removed.
+    Nothing is done when the store has not changed. A paper is only kept in
+    the index once all of its pages were indexed, so a failed one is retried
+    by the next sync. Every index has its own synchronizer, so a full-text
+    search never waits on embedding.
+    """
+    def __init__(self, store: PaperStore, index: FullTextIndex | VectorStore):
+        self.store = store
+        self.index = index
+        self._lock = threading.Lock()
+        self._synced_revision: tuple[int, int] | None = None
+
+
+    def sync(self):
+        with self._lock:
+            revision = self.store.revision()
+            if revision == self._synced_revision:
+                return
+            records = {record.paper.id: record for record in self.store.list()}
+            indexed_ids = self.index.paper_ids()
+            for paper_id in indexed_ids - records.keys():
+                self.index.remove(paper_id)
+            missing = {
+                records[paper_id].path: records[paper_id]
+                for paper_id in records.keys() - indexed_ids
+                if os.path.exists(records[paper_id].path)
+            }
+            failed: set[str] = set()
+            if missing:
+                global_logger.info("Indexing %s new papers into %s", len(missing), type(self.index).__name__)
+                from app.core.ingestion import IngestionEngine
+                engine = IngestionEngine()
+                for document in engine.ingest(list(missing)):
+                    path = document.metadata['file_path']
+                    if path in failed:
+                        continue
+                    record = missing[path]
+                    try:
+                        self.index.add(record.paper.id, record.path, record.paper.title, _split_documents([document]))
+                    except Exception as e:
+                        global_logger.error("Failed to index %s: %s", path, e)
+                        failed.add(path)
+                failed |= engine.failed
+                # A paper counts as indexed once it has chunks, so drop partly indexed ones
+                for path in failed:
+                    self.index.remove(missing[path].paper.id)
+            self.index.save()
+            # Leave the revision unsynced, so the failed papers are retried on the next sync
+            if not failed:
+                self._synced_revision = revision
+
+
+
+@lru_cache(maxsize=None)
+def _get_fulltext_synchronizer(papers_dir: str) -> LocalIndexSynchronizer:
+    return LocalIndexSynchronizer(get_paper_store(papers_dir), _get_fulltext_index(papers_dir))
+
+
+
+@lru_cache(maxsize=None)
+def _get_vector_synchronizer(papers_dir: str) -> LocalIndexSynchronizer:
+    return LocalIndexSynchronizer(get_paper_store(papers_dir), _get_vector_store(papers_dir))
+
+
+
+def sync_fulltext_index(papers_dir: str = settings.PAPERS_DIR):
+    _get_fulltext_synchronizer(get_paper_store(papers_dir).papers_dir).sync()
+
+
+
+def sync_vector_store(papers_dir: str = settings.PAPERS_DIR):
+    _get_vector_synchronizer(get_paper_store(papers_dir).papers_dir).sync()
+
+
+
+def sync_local_indexes(papers_dir: str = settings.PAPERS_DIR):
+    sync_fulltext_index(papers_dir)
+    sync_vector_store(papers_dir)
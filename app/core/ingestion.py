@@ -0,0 +1,192 @@
+from __future__ import annotations
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from langchain_core.documents import Document
+
+from app.configs import settings
+from app.logger import global_logger
+from app.core.document_cache import CachedDocument, DocumentCache, document_cache
+from app.utils.arxiv_helpers import _parse_pdf_pages, _documents_from_parsed_pages
+from app.utils.lazy_import import lazy_import
+
+
+pymupdf = lazy_import("pymupdf")
+
+
+
+
+def _terminate(executor: ProcessPoolExecutor):
+    """Shut the pool down without waiting, killing workers stuck on a file."""
+    processes = list((executor._processes or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+
+
+
+@dataclass
+class _FileTask:
+    pdf_path: str
+    page_ranges: list[list[int]]
+    sha256: str | None = None
+    deadline: float | None = None
+    remaining: int = 0
+    parsed_pages: list[dict] = field(default_factory=list)
+    futures: set[Future] = field(default_factory=set)
+    failed: bool = False
+
+
+
+class IngestionEngine:
+    """Parse batches of PDFs into `Document`s on a process pool.
+
+    Each file is split into page ranges that are parsed in parallel, each in a
+    single pass over the document. Documents are yielded as soon as their page
+    range is done, and only a bounded number of ranges are in flight, so memory
+    stays flat regardless of the batch size. Files already in the parsed
+    document cache are read back from it instead of being parsed again. Files
+    that could not be fully ingested are collected in `failed`.
+    """
+    def __init__(
+        self,
+        max_workers: int | None = settings.INGEST_MAX_WORKERS,
+        pages_per_task: int = settings.INGEST_PAGES_PER_TASK,
+        file_timeout: float | None = settings.INGEST_FILE_TIMEOUT_SECONDS,
+        cache: DocumentCache | None = document_cache,
+    ):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.pages_per_task = max(1, pages_per_task)
+        self.file_timeout = file_timeout
+        self.cache = cache
+        self.failed: set[str] = set()
+
+
+    @staticmethod
+    def _cached_documents(pdf_path: str, cached_document: CachedDocument) -> Iterator[Document]:
+        """Decode the cached pages one at a time, as they are consumed."""
+        with cached_document:
+            yield from _documents_from_parsed_pages(pdf_path, cached_document.pages())
+
+
+    def _plan(self, pdf_path: str, ready: deque[Iterator[Document]]) -> _FileTask | None:
+        try:
+            sha256 = self.cache.file_hash(pdf_path) if self.cache is not None else None
+            cached_document = self.cache.get(pdf_path, sha256) if self.cache is not None else None
+            if cached_document is not None:
+                ready.append(self._cached_documents(pdf_path, cached_document))
+                return None
+            with pymupdf.open(pdf_path) as pdf:
+                page_count = pdf.page_count
+        except Exception as e:
+            global_logger.error("Failed to open %s: %s", pdf_path, e)
+            self.failed.add(pdf_path)
+            return None
+        page_ranges = [
+            list(range(start, min(start + self.pages_per_task, page_count)))
+            for start in range(0, page_count, self.pages_per_task)
+        ]
+        return _FileTask(pdf_path, page_ranges, sha256, remaining=len(page_ranges))
+
+
+    def ingest(self, pdf_paths: Iterable[str]) -> Iterator[Document]:
+        """Yield the `Document`s of every page of `pdf_paths`.
+
+        Files that fail to parse, or take longer than `file_timeout`, are
+        logged and skipped.
+        """
+        # No more ranges than workers, so a range runs as soon as it is submitted and its deadline is fair
+        max_in_flight = self.max_workers
+        pending_files = iter(pdf_paths)
+        queued: deque[tuple[_FileTask, list[int]]] = deque()
+        ready: deque[Iterator[Document]] = deque()
+        in_flight: dict[Future, tuple[_FileTask, list[int]]] = {}
+
+        def _fill(executor: ProcessPoolExecutor):
+            while len(in_flight) < max_in_flight and not ready:
+                if not queued:
+                    pdf_path = next(pending_files, None)
+                    if pdf_path is None:
+                        return
+                    file_task = self._plan(pdf_path, ready)
+                    if file_task is not None:
+                        queued.extend((file_task, pages) for pages in file_task.page_ranges)
+                    continue
+                file_task, pages = queued.popleft()
+                if file_task.failed:
+                    continue
+                if file_task.deadline is None and self.file_timeout is not None:
+                    file_task.deadline = time.monotonic() + self.file_timeout
+                future = executor.submit(_parse_pdf_pages, file_task.pdf_path, pages)
+                file_task.futures.add(future)
+                in_flight[future] = (file_task, pages)
+
+        def _fail(file_task: _FileTask, reason: str):
+            if file_task.failed:
+                return
+            file_task.failed = True
+            self.failed.add(file_task.pdf_path)
+            global_logger.error("Failed to ingest %s: %s", file_task.pdf_path, reason)
+            for future in file_task.futures:
+                future.cancel()
+                in_flight.pop(future, None)
+
+        executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        try:
+            _fill(executor)
+            while in_flight or ready:
+                while ready:
+                    yield from ready.popleft()
+                _fill(executor)
+                if not in_flight:
+                    continue
+                deadlines = [
+                    file_task.deadline for file_task, _ in in_flight.values()
+                    if file_task.deadline is not None
+                ]
+                timeout = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+                done, _ = wait(list(in_flight), timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future not in in_flight:
+                        continue
+                    file_task, _ = in_flight.pop(future)
+                    file_task.futures.discard(future)
+                    try:
+                        parsed_pages = future.result()
+                    except Exception as e:
+                        _fail(file_task, str(e))
+                        continue
+                    file_task.remaining -= 1
+                    if self.cache is not None:
+                        file_task.parsed_pages.extend(parsed_pages)
+                        if file_task.remaining == 0:
+                            file_task.parsed_pages.sort(key=lambda parsed_page: parsed_page['page'])
+                            self.cache.put(file_task.pdf_path, file_task.parsed_pages, file_task.sha256)
+                            file_task.parsed_pages = []
+                    yield from _documents_from_parsed_pages(file_task.pdf_path, parsed_pages)
+                now = time.monotonic()
+                timed_out = [
+                    file_task for file_task, _ in in_flight.values()
+                    if file_task.deadline is not None and file_task.deadline <= now
+                ]
+                if timed_out:
+                    for file_task in timed_out:
+                        _fail(file_task, f"timed out after {self.file_timeout}s")
+                    # A running range cannot be cancelled, and would hold its worker forever,
+                    # so replace the pool and resubmit the ranges of the other files
+                    requeued = list(in_flight.values())
+                    in_flight.clear()
+                    for file_task, _ in requeued:
+                        file_task.futures.clear()
+                        file_task.deadline = None
+                    queued.extendleft(reversed(requeued))
+                    _terminate(executor)
+                    executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                _fill(executor)
+        finally:
+            # Do not wait for workers stuck on a timed-out file
+            _terminate(executor)
@@ -0,0 +1,169 @@
+from __future__ import annotations
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import hashlib
+import threading
+from uuid import uuid4
+from typing import Any
+
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage, message_to_dict, messages_from_dict
+from langchain_core.language_models.chat_models import BaseChatModel
+
+from app.configs import settings
+from app.logger import global_logger
+
+
+
+
+def _model_fingerprint(llm: BaseChatModel) -> dict[str, Any]:
+    """Model name, sampling settings and bound tool schemas of a (tool-bound) chat model."""
+    model = getattr(llm, "bound", llm)
+    return {
+        "model": getattr(model, "model", None) or getattr(model, "model_name", None) or type(model).__name__,
+        "temperature": getattr(model, "temperature", None),
+        "tools": getattr(llm, "kwargs", {}).get("tools", []),
+    }
+
+
+
+def _message_fingerprint(message: BaseMessage) -> dict[str, Any]:
+    # Message and tool call ids are random per run, so they stay out of the key
+    fingerprint = {"type": message.type, "content": message.content}
+    if isinstance(message, AIMessage) and message.tool_calls:
+        fingerprint["tool_calls"] = [[tool_call["name"], tool_call["args"]] for tool_call in message.tool_calls]
+    if isinstance(message, ToolMessage):
+        fingerprint["name"] = message.name
+    return fingerprint
+
+
+
+def make_llm_key(llm: BaseChatModel, messages: list[BaseMessage]) -> str:
+    payload = json.dumps(
+        {**_model_fingerprint(llm), "messages": [_message_fingerprint(message) for message in messages]},
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+
+def _fresh_copy(message: AIMessage) -> AIMessage:
+    """A cached response with new message and tool call ids, so it never replaces or approves an earlier one."""
+    tool_calls = [{**tool_call, "id": f"call_{uuid4().hex}"} for tool_call in message.tool_calls]
+    return message.model_copy(update={"id": None, "tool_calls": tool_calls})
+
+
+
+class LLMResponseCache:
+    """Exact-match cache of chat model responses, stored in SQLite.
+
+    Responses are keyed by the model, its bound tools, the system prompt and
+    the message history. The least recently used entries are evicted once
+    the stored responses exceed `max_bytes`.
+    """
+    def __init__(
+        self,
+        db_path: str = settings.LLM_CACHE_PATH,
+        max_bytes: int = settings.LLM_CACHE_MAX_BYTES,
+    ):
+        self.db_path = os.path.expanduser(db_path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_responses ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS llm_responses_last_used ON llm_responses (last_used)")
+            self._conn.commit()
+        return self._conn
+
+
+    def get(self, key: str) -> AIMessage | None:
+        with self._lock:
+            try:
+                conn = self._connect()
+                row = conn.execute("SELECT response FROM llm_responses WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    conn.execute("UPDATE llm_responses SET last_used = ? WHERE key = ?", (time.time(), key))
+                    conn.commit()
+            except sqlite3.Error as e:
+                global_logger.error("LLM cache read failed: %s", e)
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            global_logger.debug("LLM cache hit (%.0f%%)", 100 * self.hits / (self.hits + self.misses))
+            return _fresh_copy(messages_from_dict([json.loads(row[0])])[0])
+
+
+    def set(self, key: str, response: AIMessage):
+        payload = json.dumps(message_to_dict(response))
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_responses (key, response, size, last_used) VALUES (?, ?, ?, ?)",
+                    (key, payload, len(payload), time.time()),
+                )
+                self._evict(conn)
+                conn.commit()
+            except sqlite3.Error as e:
+                global_logger.error("LLM cache write failed: %s", e)
+
+
+    def _evict(self, conn: sqlite3.Connection):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        victims = []
+        for key, size in conn.execute("SELECT key, size FROM llm_responses ORDER BY last_used"):
+            if total <= self.max_bytes:
+                break
+            victims.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM llm_responses WHERE key = ?", victims)
+        self.evictions += len(victims)
+
+
+    async def aget(self, key: str) -> AIMessage | None:
+        return await asyncio.to_thread(self.get, key)
+
+
+    async def aset(self, key: str, response: AIMessage):
+        await asyncio.to_thread(self.set, key, response)
+
+
+    def clear(self):
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.execute("DELETE FROM llm_responses")
+                conn.commit()
+            except sqlite3.Error as e:
+                global_logger.error("LLM cache clear failed: %s", e)
+
+
+    def stats(self) -> dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
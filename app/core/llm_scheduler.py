@@ -0,0 +1,209 @@
+from __future__ import annotations
+import asyncio
+from collections import OrderedDict, deque
+from collections.abc import AsyncGenerator, AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Any, Literal
+
+from app.configs import settings
+from app.logger import global_logger
+from app.core.telemetry import telemetry
+
+
+Priority = Literal["interactive", "batch"]
+PRIORITIES: tuple[Priority, ...] = ("interactive", "batch")
+
+
+
+
+class SchedulerOverloadedError(RuntimeError):
+    """Raised when an LLM call is shed because its queue is full or it waited too long."""
+
+
+
+class SessionCancelledError(RuntimeError):
+    """Raised to the consumer of a session stream cancelled with `cancel_session`."""
+
+
+
+class LLMScheduler:
+    """Bound the number of in-flight LLM calls across all graph sessions.
+
+    Calls over `max_concurrency` wait in a queue per priority class.
+    Interactive calls always go before batch ones. Inside a class, sessions
+    take turns round-robin, so one busy thread cannot starve the others. A
+    call is rejected with `SchedulerOverloadedError` when its class already
+    has `max_queued` waiters or it waited longer than `queue_timeout`.
+    """
+    def __init__(
+        self,
+        max_concurrency: int = settings.LLM_MAX_CONCURRENCY,
+        max_queued: dict[str, int] = settings.LLM_MAX_QUEUED,
+        queue_timeout: float = settings.LLM_QUEUE_TIMEOUT_SECONDS,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.shed = 0
+        self._in_flight = 0
+        self._queues: dict[str, OrderedDict[str, deque[asyncio.Future]]] = {
+            priority: OrderedDict() for priority in PRIORITIES
+        }
+        self._queued: dict[str, int] = {priority: 0 for priority in PRIORITIES}
+        self._sessions: dict[str, set[asyncio.Task]] = {}
+
+
+    def _next_waiter(self) -> asyncio.Future | None:
+        for priority in PRIORITIES:
+            sessions = self._queues[priority]
+            while sessions:
+                session_id, waiters = next(iter(sessions.items()))
+                waiter = waiters.popleft()
+                self._queued[priority] -= 1
+                if waiters:
+                    sessions.move_to_end(session_id)
+                else:
+                    del sessions[session_id]
+                if not waiter.done():
+                    return waiter
+        return None
+
+
+    def _dispatch(self):
+        while self._in_flight < self.max_concurrency:
+            waiter = self._next_waiter()
+            if waiter is None:
+                return
+            self._in_flight += 1
+            waiter.set_result(None)
+
+
+    def _discard(self, session_id: str, priority: str, waiter: asyncio.Future):
+        waiters = self._queues[priority].get(session_id)
+        if waiters is not None and waiter in waiters:
+            waiters.remove(waiter)
+            self._queued[priority] -= 1
+            if not waiters:
+                del self._queues[priority][session_id]
+
+
+    async def acquire(self, session_id: str, priority: Priority = "interactive"):
+        if priority not in self._queues:
+            raise ValueError(f"Unknown priority {priority!r}, expected one of {PRIORITIES}")
+        if self._in_flight < self.max_concurrency and not any(self._queued.values()):
+            self._in_flight += 1
+            return
+        if self._queued[priority] >= self.max_queued.get(priority, 0):
+            self.shed += 1
+            raise SchedulerOverloadedError(
+                f"The model server is busy: {self._queued[priority]} {priority} requests are already queued. "
+                "Please retry later."
+            )
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues[priority].setdefault(session_id, deque()).append(waiter)
+        self._queued[priority] += 1
+        try:
+            with telemetry.span("llm_queue_wait", priority=priority):
+                await asyncio.wait_for(asyncio.shield(waiter), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._discard(session_id, priority, waiter)
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            waiter.cancel()
+            self.shed += 1
+            raise SchedulerOverloadedError(
+                f"The model server is busy: waited {self.queue_timeout}s for a free slot. Please retry later."
+            )
+        except asyncio.CancelledError:
+            self._discard(session_id, priority, waiter)
+            # The slot may have been granted just before the cancellation
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            waiter.cancel()
+            raise
+
+
+    def admits(self, priority: Priority = "interactive") -> bool:
+        """Whether a new call of this class would be queued rather than shed."""
+        return self._queued.get(priority, 0) < self.max_queued.get(priority, 0)
+
+
+    def release(self):
+        self._in_flight -= 1
+        self._dispatch()
+
+
+    @asynccontextmanager
+    async def slot(self, session_id: str, priority: Priority = "interactive") -> AsyncIterator[None]:
+        """Hold one LLM slot for the duration of the block."""
+        await self.acquire(session_id, priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+    async def stream(self, session_id: str, events: AsyncGenerator[Any, None]) -> AsyncGenerator[Any, None]:
+        """Drive `events` in a task tracked under `session_id` and re-yield its items.
+
+        `cancel_session` cancels the task, which ends this stream with
+        `SessionCancelledError`. The consumer going away cancels the task too.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+
+        async def _pump():
+            try:
+                async for item in events:
+                    await queue.put(item)
+            finally:
+                await events.aclose()
+
+        task = asyncio.create_task(_pump())
+        self._sessions.setdefault(session_id, set()).add(task)
+        getter: asyncio.Future | None = None
+        try:
+            while True:
+                getter = asyncio.ensure_future(queue.get())
+                done, _ = await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+                if getter in done:
+                    yield getter.result()
+                    continue
+                getter.cancel()
+                while not queue.empty():
+                    yield queue.get_nowait()
+                if task.cancelled():
+                    raise SessionCancelledError(f"Session {session_id} was cancelled")
+                task.result()
+                return
+        finally:
+            if getter is not None:
+                getter.cancel()
+            task.cancel()
+            tasks = self._sessions.get(session_id)
+            if tasks is not None:
+                tasks.discard(task)
+                if not tasks:
+                    del self._sessions[session_id]
+
+
+    def cancel_session(self, session_id: str) -> bool:
+        """Cancel the running graph tasks of a session. Their queued LLM calls are dropped on the way out."""
+        tasks = self._sessions.get(session_id, set())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            global_logger.info("Cancelled %s running task(s) of session %s", len(tasks), session_id)
+        return bool(tasks)
+
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "in_flight": self._in_flight,
+            "queued": dict(self._queued),
+            "sessions": len(self._sessions),
+            "shed": self.shed,
+        }
+
+
+
+llm_scheduler = LLMScheduler()
@@ -0,0 +1,108 @@
+from __future__ import annotations
+import json
+import asyncio
+from dataclasses import asdict, is_dataclass
+from typing import Any
+
+from pydantic import BaseModel, Field
+from langchain_core.tools import BaseTool, StructuredTool
+
+from app.configs import settings
+from app.logger import global_logger
+from app.schemas.arxiv_tools import *
+from app.dependencies.mcp_client import get_mcp_tools
+
+
+
+
+class ListPapersRequest(BaseModel):
+    papers_dir: str = Field(description="The path in the local machines that store the downloaded papers", default=settings.PAPERS_DIR)
+
+
+
+class QueryPapersRequest(ListPapersRequest):
+    query: str = Field(description="The arXiv id, title or authors of the downloaded papers")
+
+
+
+def _to_content(result: Any) -> str:
+    """Render a tool result as the JSON text the model reads."""
+    def _default(value: Any):
+        if is_dataclass(value):
+            return asdict(value)
+        return str(value)
+    return json.dumps(result, default=_default, ensure_ascii=False)
+
+
+
+def _as_tool(coroutine, name: str, args_schema: type[BaseModel], description: str) -> BaseTool:
+    async def _call(**kwargs) -> tuple[str, Any]:
+        result = await coroutine(args_schema(**kwargs))
+        return _to_content(result), result
+    return StructuredTool.from_function(
+        coroutine=_call,
+        name=name,
+        description=description,
+        args_schema=args_schema,
+        response_format="content_and_artifact",
+    )
+
+
+
+def get_local_tools() -> list[BaseTool]:
+    """Bind the bundled arXiv tools in-process, without an MCP server.
+
+    Each tool returns its JSON rendering as content for the model and the
+    original Python objects as the artifact.
+    """
+    from app.core import arxiv_tools
+
+    async def _list_papers(request: ListPapersRequest) -> list[str]:
+        return await asyncio.to_thread(arxiv_tools.list_papers, request.papers_dir)
+
+    async def _list_papers_from_query(request: QueryPapersRequest) -> list[str]:
+        return await asyncio.to_thread(arxiv_tools.list_papers_from_query, request.query, request.papers_dir)
+
+    async def _delete_papers(request: QueryPapersRequest) -> list[str]:
+        return await asyncio.to_thread(arxiv_tools.delete_papers, request.query, request.papers_dir)
+
+    return [
+        _as_tool(arxiv_tools.search_papers, "search_papers", SearchPapersRequest,
+                 "Search arXiv for relevant academic papers."),
+        _as_tool(arxiv_tools.search_papers_batch, "search_papers_batch", SearchPapersBatchRequest,
+                 "Run several arXiv searches at once and merge their results without duplicates."),
+        _as_tool(arxiv_tools.download_papers, "download_papers", DownloadPapersRequest,
+                 "Search arXiv and download the matching papers as PDF files."),
+        _as_tool(arxiv_tools.search_fulltext, "search_fulltext", SearchFullTextRequest,
+                 "Search inside the downloaded papers by keywords."),
+        _as_tool(arxiv_tools.search_semantic, "search_semantic", SearchSemanticRequest,
+                 "Search inside the downloaded papers by meaning."),
+        _as_tool(_list_papers, "list_papers", ListPapersRequest,
+                 "List the paths of all downloaded papers."),
+        _as_tool(_list_papers_from_query, "list_papers_from_query", QueryPapersRequest,
+                 "Find downloaded papers by arXiv id, title or authors."),
+        _as_tool(_delete_papers, "delete_papers", QueryPapersRequest,
+                 "Delete downloaded papers matching an arXiv id, title or authors."),
+    ]
+
+
+
+async def load_tools(mode: str = settings.TOOLS_MODE) -> list[BaseTool]:
+    """Load the agent tools.
+
+    In `local` mode the bundled arXiv tools are bound in-process and only the
+    other MCP servers are started. In `mcp` mode, or when the local tools
+    cannot be loaded, every tool goes through its MCP server.
+    """
+    if mode == "local":
+        try:
+            local_tools = get_local_tools()
+        except ImportError as e:
+            global_logger.warning("In-process tools unavailable, falling back to MCP: %s", e)
+        else:
+            try:
+                return local_tools + await get_mcp_tools(exclude=["arxiv"])
+            except Exception as e:
+                global_logger.warning("Failed to load the other MCP tools, using the local ones only: %s", e)
+                return local_tools
+    return await get_mcp_tools()
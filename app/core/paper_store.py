@@ -0,0 +1,275 @@
+from __future__ import annotations
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from functools import lru_cache
+
+from app.configs import settings
+from app.logger import global_logger
+from app.schemas.paper import Paper, PaperRecord
+from app.utils.trigram_index import TrigramIndex, trigram_similarity
+
+
+MANIFEST_FILE_NAME = "manifest.sqlite"
+# `PRAGMA user_version` of a manifest whose directory was scanned for PDFs saved before the store
+MANIFEST_VERSION = 1
+LEGACY_ID_PREFIX = "legacy-"
+ARXIV_ID_PATTERN = re.compile(r"^(?P<arxiv_id>.+?)(?:v(?P<version>\d+))?$")
+MANIFEST_COLUMNS = (
+    "arxiv_id, version, title, authors, summary, published, pdf_url, "
+    "primary_category, path, size, sha256, downloaded_at"
+)
+
+
+
+
+def split_arxiv_id(paper_id: str) -> tuple[str, int]:
+    """Split an arXiv id such as `2401.01234v2` into (`2401.01234`, 2)."""
+    match = ARXIV_ID_PATTERN.match(paper_id.strip())
+    version = match.group("version")
+    return match.group("arxiv_id"), int(version) if version else 1
+
+
+
+def _index_text(arxiv_id: str, title: str, authors: list[str]) -> str:
+    return " ".join([arxiv_id, title, *authors])
+
+
+
+def _row_to_record(row: tuple) -> PaperRecord:
+    (arxiv_id, version, title, authors, summary, published, pdf_url,
+     primary_category, path, size, sha256, downloaded_at) = row
+    paper = Paper(
+        id=f"{arxiv_id}v{version}",
+        title=title,
+        authors=json.loads(authors),
+        summary=summary,
+        published=published,
+        pdf_url=pdf_url,
+        primary_category=primary_category,
+    )
+    return PaperRecord(arxiv_id, version, paper, path, size, sha256, downloaded_at)
+
+
+
+class PaperStore:
+    """Content store for downloaded papers, keyed by arXiv id and version.
+
+    Every PDF lives at a path derived from its id, so a paper listed under
+    several categories is stored once. A SQLite manifest next to the files
+    holds the `Paper` metadata, so listing and deleting never walk the disk,
+    and a trigram index over ids, titles and authors serves fuzzy lookups.
+    PDFs saved before the store existed, under `<category>/<title>.pdf`, are
+    imported once when the manifest is first opened.
+    """
+    def __init__(self, papers_dir: str = settings.PAPERS_DIR):
+        self.papers_dir = os.path.abspath(os.path.expanduser(papers_dir))
+        os.makedirs(self.papers_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            os.path.join(self.papers_dir, MANIFEST_FILE_NAME),
+            check_same_thread=False,
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS papers ("
+            "arxiv_id TEXT NOT NULL, version INTEGER NOT NULL, title TEXT NOT NULL, "
+            "authors TEXT NOT NULL, summary TEXT NOT NULL, published TEXT NOT NULL, "
+            "pdf_url TEXT NOT NULL, primary_category TEXT NOT NULL, path TEXT NOT NULL UNIQUE, "
+            "size INTEGER NOT NULL, sha256 TEXT, downloaded_at REAL NOT NULL, "
+            "PRIMARY KEY (arxiv_id, version))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS papers_downloaded_at ON papers (downloaded_at)")
+        self._conn.commit()
+        self._index: TrigramIndex | None = None
+        self._generation = 0
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] < MANIFEST_VERSION:
+            self._import_legacy_files()
+
+
+    def _import_legacy_files(self):
+        """Register the PDFs on disk that are not in the manifest yet, under `legacy-` ids.
+
+        Their arXiv ids are unknown, so the title and category are recovered
+        from the old `<category>/<title>.pdf` layout and the id is derived
+        from the path.
+        """
+        known_paths = {row[0] for row in self._conn.execute("SELECT path FROM papers")}
+        rows = []
+        for root, dirs, files in os.walk(self.papers_dir):
+            # Skip the index and other hidden directories
+            dirs[:] = [name for name in dirs if not name.startswith(".")]
+            for file in files:
+                path = os.path.join(root, file)
+                if not file.endswith(".pdf") or path in known_paths:
+                    continue
+                relative_path = os.path.relpath(path, self.papers_dir)
+                category = os.path.dirname(relative_path).replace(os.sep, ".").replace("_", ".")
+                stat = os.stat(path)
+                rows.append((
+                    LEGACY_ID_PREFIX + hashlib.sha1(relative_path.encode("utf-8")).hexdigest()[:12], 1,
+                    file[:-len(".pdf")], "[]", "", "", "", category, path, stat.st_size, None, stat.st_mtime,
+                ))
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT OR IGNORE INTO papers ({MANIFEST_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.execute(f"PRAGMA user_version = {MANIFEST_VERSION}")
+            self._conn.commit()
+        if rows:
+            global_logger.info("Imported %s previously downloaded papers into %s", len(rows), self.papers_dir)
+
+
+    def _get_index(self) -> TrigramIndex:
+        """Build the trigram index from the manifest once; keep it updated afterwards."""
+        if self._index is None:
+            index = TrigramIndex(settings.PAPER_MATCH_THRESHOLD)
+            rows = self._conn.execute("SELECT arxiv_id, version, title, authors FROM papers").fetchall()
+            for arxiv_id, version, title, authors in rows:
+                index.add((arxiv_id, version), _index_text(arxiv_id, title, json.loads(authors)))
+            self._index = index
+        return self._index
+
+
+    def revision(self) -> tuple[int, int]:
+        """A value that changes whenever the manifest changes, in this process or another."""
+        with self._lock:
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            return self._generation, data_version
+
+
+    def path_for(self, paper: Paper) -> str:
+        arxiv_id, version = split_arxiv_id(paper.id)
+        safe_id = arxiv_id.replace("/", "_")
+        # Shard by the YYMM prefix (or the archive name for old-style ids)
+        shard = safe_id.split(".")[0] if "." in safe_id else safe_id.split("_")[0]
+        return os.path.join(self.papers_dir, shard, f"{safe_id}v{version}.pdf")
+
+
+    def add(self, paper: Paper, path: str, size: int, sha256: str | None) -> PaperRecord:
+        arxiv_id, version = split_arxiv_id(paper.id)
+        record = PaperRecord(arxiv_id, version, paper, os.path.abspath(path), size, sha256, time.time())
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO papers ({MANIFEST_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    arxiv_id, version, paper.title, json.dumps(paper.authors), paper.summary,
+                    paper.published, paper.pdf_url, paper.primary_category, record.path,
+                    size, sha256, record.downloaded_at,
+                ),
+            )
+            self._conn.commit()
+            self._generation += 1
+            if self._index is not None:
+                self._index.add((arxiv_id, version), _index_text(arxiv_id, paper.title, paper.authors))
+        return record
+
+
+    def get(self, paper_id: str) -> PaperRecord | None:
+        """Look up a paper by id. Without a version, the latest one is returned."""
+        arxiv_id, version = split_arxiv_id(paper_id)
+        has_version = ARXIV_ID_PATTERN.match(paper_id.strip()).group("version") is not None
+        with self._lock:
+            if has_version:
+                row = self._conn.execute(
+                    f"SELECT {MANIFEST_COLUMNS} FROM papers WHERE arxiv_id = ? AND version = ?",
+                    (arxiv_id, version),
+                ).fetchone()
+            else:
+                row = self._conn.execute(
+                    f"SELECT {MANIFEST_COLUMNS} FROM papers WHERE arxiv_id = ? ORDER BY version DESC LIMIT 1",
+                    (arxiv_id,),
+                ).fetchone()
+        return _row_to_record(row) if row else None
+
+
+    def list(self) -> list[PaperRecord]:
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {MANIFEST_COLUMNS} FROM papers ORDER BY downloaded_at"
+            ).fetchall()
+        return [_row_to_record(row) for row in rows]
+
+
+    def search(
+        self,
+        query: str,
+        top_k: int = settings.PAPER_MATCH_TOP_K,
+        threshold: float | None = None,
+    ) -> list[PaperRecord]:
+        """Fuzzy-match `query` against paper ids, titles and authors, best first."""
+        with self._lock:
+            matches = self._get_index().search(query, top_k, threshold)
+            rows = [
+                self._conn.execute(
+                    f"SELECT {MANIFEST_COLUMNS} FROM papers WHERE arxiv_id = ? AND version = ?",
+                    key,
+                ).fetchone()
+                for key, _ in matches
+            ]
+        return [_row_to_record(row) for row in rows if row]
+
+
+    def match_one(
+        self,
+        query: str,
+        threshold: float = settings.PAPER_DELETE_MATCH_THRESHOLD,
+    ) -> list[PaperRecord]:
+        """The papers whose id or title is at least `threshold` similar to `query`.
+
+        Unlike `search`, a title merely containing the query does not match,
+        so one result means one unambiguous paper.
+        """
+        candidates = self.search(query, top_k=max(50, settings.PAPER_MATCH_TOP_K))
+        return [
+            record for record in candidates
+            if max(
+                trigram_similarity(query, record.arxiv_id),
+                trigram_similarity(query, record.paper.title),
+            ) >= threshold
+        ]
+
+
+    def remove(self, records: list[PaperRecord]) -> list[PaperRecord]:
+        """Delete the files and manifest rows of `records`; return the ones removed."""
+        removed: list[PaperRecord] = []
+        for record in records:
+            try:
+                if os.path.exists(record.path):
+                    os.remove(record.path)
+                removed.append(record)
+                global_logger.info("Deleted file: %s", record.path)
+            except OSError as e:
+                global_logger.error("Failed to delete %s: %s", record.path, e)
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM papers WHERE arxiv_id = ? AND version = ?",
+                [(record.arxiv_id, record.version) for record in removed],
+            )
+            self._conn.commit()
+            self._generation += 1
+            if self._index is not None:
+                for record in removed:
+                    self._index.remove((record.arxiv_id, record.version))
+        return removed
+
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+
+@lru_cache(maxsize=None)
+def _get_paper_store(papers_dir: str) -> PaperStore:
+    return PaperStore(papers_dir)
+
+
+
+def get_paper_store(papers_dir: str = settings.PAPERS_DIR) -> PaperStore:
+    return _get_paper_store(os.path.abspath(os.path.expanduser(papers_dir)))
@@ -0,0 +1,152 @@
+from __future__ import annotations
+import math
+from dataclasses import dataclass, replace
+from datetime import datetime, timezone
+from dateutil import parser
+
+from app.configs import settings
+from app.logger import global_logger
+from app.schemas.arxiv_tools import SearchPapersRequest
+from app.utils.arxiv_helpers import ARCHIVES_WITHOUT_SUBCATEGORIES, _optimize_query, _validate_categories
+
+
+ARXIV_MAX_PAGE_SIZE = 2000
+ARXIV_DATE_FORMAT = "%Y%m%d%H%M"
+ARXIV_EARLIEST_DATE = datetime(1991, 1, 1, tzinfo=timezone.utc)
+
+
+
+
+@dataclass(frozen=True)
+class QueryPlan:
+    """A `SearchPapersRequest` compiled into what is actually sent to arXiv.
+
+    Attributes:
+        query: The full arXiv query, including the category and date clauses.
+        optimized_query: The user query after `_optimize_query`.
+        categories: The validated categories, sorted and deduplicated.
+        sort_by: The sort mode of the request.
+        date_from: The lower bound of the date window, if any.
+        date_to: The upper bound of the date window, if any.
+        batch_size: The number of papers to return.
+        page_size: The number of entries requested per arXiv API page.
+        max_pages: The maximum number of pages fetched to fill the batch.
+    """
+    query: str
+    optimized_query: str
+    categories: tuple[str, ...]
+    sort_by: str
+    date_from: datetime | None
+    date_to: datetime | None
+    batch_size: int
+    page_size: int
+    max_pages: int
+
+
+    @property
+    def max_results(self) -> int:
+        return self.page_size * self.max_pages
+
+
+    def with_page_size(self, page_size: int) -> QueryPlan:
+        """The same plan fetched in pages of at most `page_size`, covering as many results."""
+        page_size = min(self.page_size, page_size)
+        return replace(self, page_size=page_size, max_pages=math.ceil(self.max_results / page_size))
+
+
+    def cache_key_fields(self) -> dict:
+        return {
+            "query": self.optimized_query.strip(),
+            "categories": list(self.categories),
+            "sort_by": self.sort_by,
+            "date_from": self.date_from.isoformat() if self.date_from else None,
+            "date_to": self.date_to.isoformat() if self.date_to else None,
+            "batch_size": self.batch_size,
+        }
+
+
+    def accepts(self, published: datetime) -> bool:
+        """Client-side guard for the date window pushed into the query."""
+        if not published.tzinfo:
+            published = published.replace(tzinfo=timezone.utc)
+        if self.date_from and published < self.date_from:
+            return False
+        if self.date_to and published > self.date_to:
+            return False
+        return True
+
+
+
+def category_query(category: str) -> str:
+    """The arXiv query clause of a category, or of every category of an archive."""
+    if "." in category or category in ARCHIVES_WITHOUT_SUBCATEGORIES:
+        return f"cat:{category}"
+    # Older papers of some archives (astro-ph, cond-mat, ...) are filed under the bare name
+    return f"cat:{category} OR cat:{category}.*"
+
+
+
+def _parse_date(value: str | None, field_name: str, end_of_day: bool = False) -> datetime | None:
+    if not value:
+        return None
+    try:
+        parsed = parser.parse(value).replace(tzinfo=timezone.utc)
+    except (ValueError, TypeError, OverflowError) as e:
+        # Running the search without the filter would silently return other papers
+        raise Exception(f"[ERROR] Invalid {field_name} format: {value} ({e})")
+    # A bare `YYYY-MM-DD` upper bound should include the whole day
+    if end_of_day and ":" not in value:
+        parsed = parsed.replace(hour=23, minute=59, second=59)
+    return parsed
+
+
+
+def plan_search(request: SearchPapersRequest) -> QueryPlan:
+    """Compile a search request into a `QueryPlan`.
+
+    The category filter and the date window are pushed into the arXiv query,
+    so that every returned entry is usable and the batch can be filled with
+    as few pages as possible.
+    """
+    global_logger.debug("Original query: %s", request.query)
+    if not request.query.strip():
+        raise Exception(f"[ERROR] Invalid query: {request.query}")
+    if request.batch_size <= 0:
+        raise Exception(f"[ERROR] Invalid batch size: {request.batch_size}")
+    optimized_query = _optimize_query(request.query)
+    if optimized_query != request.query:
+        global_logger.debug("Optimized query: '%s' -> '%s'", request.query, optimized_query)
+    query_parts = [f"({optimized_query})"]
+    # Process the categories
+    categories = request.categories
+    if isinstance(categories, str):
+        categories = [categories]
+    if not categories or not _validate_categories(categories):
+        raise Exception(f"[ERROR] Invalid categories")
+    categories = tuple(sorted(set(categories)))
+    category_filter = " OR ".join(category_query(cat) for cat in categories)
+    query_parts.append(f"({category_filter})")
+    global_logger.debug("Added category filter: %s", category_filter)
+    # Process the date window
+    date_from = _parse_date(request.date_from, "date_from")
+    date_to = _parse_date(request.date_to, "date_to", end_of_day=True)
+    if date_from and date_to and date_from > date_to:
+        raise Exception(f"[ERROR] Invalid date window: {request.date_from} > {request.date_to}")
+    if date_from or date_to:
+        lower = (date_from or ARXIV_EARLIEST_DATE).strftime(ARXIV_DATE_FORMAT)
+        upper = (date_to or datetime.now(timezone.utc)).strftime(ARXIV_DATE_FORMAT)
+        query_parts.append(f"submittedDate:[{lower} TO {upper}]")
+        global_logger.debug("Added date filter: [%s TO %s]", lower, upper)
+    final_query = " AND ".join(query_parts)
+    global_logger.debug("Final arXiv query: %s", final_query)
+    return QueryPlan(
+        query=final_query,
+        optimized_query=optimized_query,
+        categories=categories,
+        sort_by=request.sort_by,
+        date_from=date_from,
+        date_to=date_to,
+        batch_size=request.batch_size,
+        page_size=min(request.batch_size, ARXIV_MAX_PAGE_SIZE),
+        max_pages=settings.ARXIV_MAX_PAGES,
+    )
@@ -0,0 +1,148 @@
+from __future__ import annotations
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import asdict
+
+from app.configs import settings
+from app.logger import global_logger
+from app.schemas.paper import Paper
+
+
+
+
+def make_search_key(normalized_request: dict) -> str:
+    """Build a stable cache key from a normalized `SearchPapersRequest`."""
+    payload = json.dumps(normalized_request, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+
+class SearchCache:
+    """Two-tier cache for `search_papers` results.
+
+    An in-memory LRU sits in front of a SQLite store, so repeated queries are
+    served from memory and survive restarts. Entries expire after a TTL that
+    depends on the sort mode of the request.
+    """
+    def __init__(
+        self,
+        db_path: str = settings.SEARCH_CACHE_PATH,
+        max_entries: int = settings.SEARCH_CACHE_MAX_ENTRIES,
+        ttl_seconds: dict[str, int] = settings.SEARCH_CACHE_TTL_SECONDS,
+    ):
+        self.db_path = os.path.expanduser(db_path)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._memory: OrderedDict[str, tuple[float, list[Paper]]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS search_results ("
+                "key TEXT PRIMARY KEY, expires_at REAL NOT NULL, papers TEXT NOT NULL)"
+            )
+            self._conn.commit()
+        return self._conn
+
+
+    def _ttl(self, sort_by: str) -> int:
+        return self.ttl_seconds.get(sort_by, min(self.ttl_seconds.values(), default=0))
+
+
+    def _remember(self, key: str, expires_at: float, papers: list[Paper]):
+        self._memory[key] = (expires_at, papers)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+
+    def get(self, key: str) -> list[Paper] | None:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, papers = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return list(papers)
+                del self._memory[key]
+            try:
+                row = self._connect().execute(
+                    "SELECT expires_at, papers FROM search_results WHERE key = ?", (key,)
+                ).fetchone()
+            except sqlite3.Error as e:
+                global_logger.error("Search cache read failed: %s", e)
+                row = None
+            if row is None or row[0] <= now:
+                self.misses += 1
+                return None
+            papers = [Paper(**paper) for paper in json.loads(row[1])]
+            self._remember(key, row[0], papers)
+            self.hits += 1
+            return list(papers)
+
+
+    def set(self, key: str, sort_by: str, papers: list[Paper]):
+        ttl = self._ttl(sort_by)
+        if ttl <= 0:
+            return
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._remember(key, expires_at, list(papers))
+            try:
+                conn = self._connect()
+                conn.execute(
+                    "INSERT OR REPLACE INTO search_results (key, expires_at, papers) VALUES (?, ?, ?)",
+                    (key, expires_at, json.dumps([asdict(paper) for paper in papers])),
+                )
+                conn.execute("DELETE FROM search_results WHERE expires_at <= ?", (time.time(),))
+                conn.commit()
+            except sqlite3.Error as e:
+                global_logger.error("Search cache write failed: %s", e)
+
+
+    async def aget(self, key: str) -> list[Paper] | None:
+        return await asyncio.to_thread(self.get, key)
+
+
+    async def aset(self, key: str, sort_by: str, papers: list[Paper]):
+        await asyncio.to_thread(self.set, key, sort_by, papers)
+
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            try:
+                conn = self._connect()
+                conn.execute("DELETE FROM search_results")
+                conn.commit()
+            except sqlite3.Error as e:
+                global_logger.error("Search cache clear failed: %s", e)
+
+
+    def stats(self) -> dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "memory_entries": len(self._memory),
+        }
+
+
+
+search_cache = SearchCache()
@@ -0,0 +1,232 @@
+from __future__ import annotations
+import json
+import time
+import inspect
+import threading
+from uuid import uuid4
+from contextvars import ContextVar
+from collections import defaultdict
+from collections.abc import Callable
+from contextlib import contextmanager, nullcontext
+from typing import Any
+
+from langchain_core.runnables.config import RunnableConfig
+
+from app.configs import settings
+from app.logger import global_logger
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, float("inf"))
+_current_span: ContextVar[str | None] = ContextVar("current_span", default=None)
+_NOOP_SPAN = nullcontext()
+
+
+
+
+def _label_key(labels: dict[str, Any]) -> tuple[tuple[str, str], ...]:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+
+def _render_labels(labels: tuple[tuple[str, str], ...], extra: str = "") -> str:
+    parts = [f'{name}="{value}"' for name, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+
+class _Histogram:
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+
+    def observe(self, value: float):
+        self.sum += value
+        self.count += 1
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+
+
+
+class _TraceFileExporter:
+    """Append one JSON line per finished span to a file."""
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8", buffering=1)
+
+
+    def export(self, record: dict[str, Any]):
+        line = json.dumps(record, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+
+class Span:
+    def __init__(self, name: str, labels: dict[str, Any]):
+        self.name = name
+        self.labels = labels
+        self.attributes: dict[str, Any] = {}
+
+
+    def set(self, **attributes: Any):
+        """Attach attributes to the trace record; they are not used as metric labels."""
+        self.attributes.update(attributes)
+
+
+
+class Telemetry:
+    """Span timings, counters and histograms exported in the Prometheus text format.
+
+    Every span is recorded in a `<name>_seconds` histogram labelled with its
+    labels and, when `trace_path` is set, written to a JSON-lines trace file.
+    When disabled, `span()` returns a shared no-op context manager.
+    """
+    def __init__(
+        self,
+        enabled: bool = settings.TELEMETRY_ENABLED,
+        trace_path: str | None = settings.TRACE_FILE_PATH,
+        namespace: str = "science_assistant",
+    ):
+        self.enabled = enabled
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._histograms: dict[str, dict[tuple, _Histogram]] = defaultdict(dict)
+        self._counters: dict[str, dict[tuple, float]] = defaultdict(lambda: defaultdict(float))
+        self._gauges: dict[str, Callable[[], float]] = {}
+        self._exporter = _TraceFileExporter(trace_path) if enabled and trace_path else None
+
+
+    def observe(self, name: str, value: float, **labels: Any):
+        if not self.enabled:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            histogram = self._histograms[name].get(key)
+            if histogram is None:
+                histogram = self._histograms[name][key] = _Histogram()
+            histogram.observe(value)
+
+
+    def inc(self, name: str, value: float = 1.0, **labels: Any):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name][_label_key(labels)] += value
+
+
+    def register_gauge(self, name: str, read: Callable[[], float]):
+        """Report the value returned by `read` whenever the metrics are scraped."""
+        self._gauges[name] = read
+
+
+    @contextmanager
+    def _span(self, name: str, labels: dict[str, Any]):
+        span = Span(name, labels)
+        span_id = uuid4().hex[:16]
+        parent_id = _current_span.get()
+        token = _current_span.set(span_id)
+        started_at = time.time()
+        started = time.perf_counter()
+        status = "ok"
+        try:
+            yield span
+        except BaseException as e:
+            status = type(e).__name__
+            raise
+        finally:
+            duration = time.perf_counter() - started
+            _current_span.reset(token)
+            self.observe(f"{name}_seconds", duration, **span.labels)
+            if self._exporter is not None:
+                self._exporter.export({
+                    "name": name,
+                    "span_id": span_id,
+                    "parent_id": parent_id,
+                    "start": started_at,
+                    "duration": duration,
+                    "status": status,
+                    "labels": span.labels,
+                    **({"attributes": span.attributes} if span.attributes else {}),
+                })
+
+
+    def span(self, name: str, **labels: Any):
+        """Time a block. Labels should have a small set of values, as each combination is a series."""
+        if not self.enabled:
+            return _NOOP_SPAN
+        return self._span(name, labels)
+
+
+    def wrap_node(self, name: str, node: Callable) -> Callable:
+        """Wrap a graph node in a `graph_node` span, keeping its return annotation for the graph."""
+        signature = inspect.signature(node)
+        accepts_config = "config" in signature.parameters
+        call = getattr(node, "__call__", node)
+        is_async = inspect.iscoroutinefunction(node) or inspect.iscoroutinefunction(call)
+
+        async def _node(state, config: RunnableConfig):
+            with self.span("graph_node", node=name):
+                result = node(state, config) if accepts_config else node(state)
+                if is_async:
+                    result = await result
+                return result
+
+        _node.__annotations__ = {"config": RunnableConfig}
+        if signature.return_annotation is not inspect.Signature.empty:
+            _node.__annotations__["return"] = signature.return_annotation
+        return _node
+
+
+    def render_prometheus(self) -> str:
+        lines: list[str] = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                metric = f"{self.namespace}_{name}"
+                lines.append(f"# TYPE {metric} counter")
+                for labels, value in series.items():
+                    lines.append(f"{metric}{_render_labels(labels)} {value}")
+            for name, series in sorted(self._histograms.items()):
+                metric = f"{self.namespace}_{name}"
+                lines.append(f"# TYPE {metric} histogram")
+                for labels, histogram in series.items():
+                    cumulative = 0
+                    for bound, bucket_count in zip(histogram.buckets, histogram.counts):
+                        cumulative += bucket_count
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        bucket_label = f'le="{le}"'
+                        lines.append(f"{metric}_bucket{_render_labels(labels, bucket_label)} {cumulative}")
+                    lines.append(f"{metric}_sum{_render_labels(labels)} {histogram.sum}")
+                    lines.append(f"{metric}_count{_render_labels(labels)} {histogram.count}")
+        for name, read in sorted(self._gauges.items()):
+            metric = f"{self.namespace}_{name}"
+            try:
+                value = read()
+            except Exception as e:
+                global_logger.error("Failed to read gauge %s: %s", name, e)
+                continue
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+
+    def close(self):
+        if self._exporter is not None:
+            self._exporter.close()
+            self._exporter = None
+
+
+
+telemetry = Telemetry()
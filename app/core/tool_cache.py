@@ -0,0 +1,150 @@
+from __future__ import annotations
+import json
+import time
+from uuid import uuid4
+from collections import OrderedDict, defaultdict
+from typing import Any
+
+from langchain_core.tools import BaseTool, StructuredTool
+from langchain_core.messages import ToolMessage
+
+from app.configs import settings
+from app.logger import global_logger
+from app.utils.singleflight import SingleFlight
+
+
+
+
+def _canonical_args(args: dict) -> str:
+    return json.dumps(args, sort_keys=True, separators=(",", ":"), default=str)
+
+
+
+class _UncachedResult(Exception):
+    """Carries the result of a call that failed softly, so it is returned but not cached."""
+    def __init__(self, result: Any):
+        super().__init__()
+        self.result = result
+
+
+
+class ToolResultCache:
+    """Memoizes results of idempotent tools within a process.
+
+    Only tools listed in `ttl_seconds` are cached, keyed by their name and
+    canonicalized arguments. Running a tool listed in `invalidates` drops the
+    cached results of the tools it affects. Identical calls already in flight
+    share one execution.
+    """
+    def __init__(
+        self,
+        ttl_seconds: dict[str, float] = settings.TOOL_CACHE_TTL_SECONDS,
+        invalidates: dict[str, list[str]] = settings.TOOL_CACHE_INVALIDATES,
+        max_entries: int = settings.TOOL_CACHE_MAX_ENTRIES,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.invalidates = invalidates
+        self.max_entries = max_entries
+        self.hits: dict[str, int] = defaultdict(int)
+        self.misses: dict[str, int] = defaultdict(int)
+        self._entries: OrderedDict[tuple[str, str], tuple[float, Any]] = OrderedDict()
+        self._generations: dict[str, int] = defaultdict(int)
+        self._single_flight = SingleFlight()
+
+
+    def _get(self, key: tuple[str, str]) -> Any | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+
+    def _set(self, key: tuple[str, str], value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds[key[0]], value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+    def invalidate(self, tool_name: str):
+        self._generations[tool_name] += 1
+        for key in [key for key in self._entries if key[0] == tool_name]:
+            del self._entries[key]
+
+
+    async def call(self, tool_name: str, args: dict, run) -> Any:
+        if tool_name not in self.ttl_seconds:
+            result = await run()
+            for affected in self.invalidates.get(tool_name, []):
+                self.invalidate(affected)
+            return result
+        key = (tool_name, _canonical_args(args))
+        cached = self._get(key)
+        if cached is not None:
+            self.hits[tool_name] += 1
+            global_logger.debug("Tool cache hit for %s (%.0f%%)", tool_name, 100 * self.hit_rate(tool_name))
+            return cached
+        self.misses[tool_name] += 1
+        generation = self._generations[tool_name]
+        try:
+            result = await self._single_flight.do(key, run)
+        except _UncachedResult as e:
+            return e.result
+        # Do not store results that were computed before an invalidation
+        if generation == self._generations[tool_name]:
+            self._set(key, result)
+        return result
+
+
+    def hit_rate(self, tool_name: str) -> float:
+        return self.hits[tool_name] / max(1, self.hits[tool_name] + self.misses[tool_name])
+
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "tools": {
+                tool_name: {
+                    "hits": self.hits[tool_name],
+                    "misses": self.misses[tool_name],
+                    "hit_rate": self.hit_rate(tool_name),
+                }
+                for tool_name in self.ttl_seconds
+            },
+            "coalesced": self._single_flight.coalesced,
+        }
+
+
+    def wrap(self, tool: BaseTool) -> BaseTool:
+        """Return a tool with the same name and schema whose calls go through the cache."""
+        if tool.name not in self.ttl_seconds and tool.name not in self.invalidates:
+            return tool
+
+        async def _call(**kwargs) -> tuple[Any, Any]:
+            async def _run() -> tuple[Any, Any]:
+                tool_message: ToolMessage = await tool.ainvoke(
+                    {"type": "tool_call", "name": tool.name, "args": kwargs, "id": str(uuid4())}
+                )
+                if tool_message.status == "error":
+                    raise RuntimeError(tool_message.content)
+                # The search tools log their errors and return None, which must not stick in the cache
+                if tool_message.artifact is None and tool_message.content == "null":
+                    raise _UncachedResult((tool_message.content, tool_message.artifact))
+                return tool_message.content, tool_message.artifact
+            return await self.call(tool.name, kwargs, _run)
+
+        return StructuredTool.from_function(
+            coroutine=_call,
+            name=tool.name,
+            description=tool.description,
+            args_schema=tool.args_schema,
+            response_format="content_and_artifact",
+        )
+
+
+    def wrap_all(self, tools: list[BaseTool]) -> list[BaseTool]:
+        return [self.wrap(tool) for tool in tools]
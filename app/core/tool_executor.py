@@ -0,0 +1,124 @@
+from __future__ import annotations
+import time
+import asyncio
+
+from langchain_core.tools import BaseTool
+from langchain_core.messages import AIMessage, ToolMessage, ToolCall
+from langchain_core.runnables.config import RunnableConfig
+from langgraph.config import get_stream_writer
+
+from app.configs import settings
+from app.logger import global_logger
+from app.schemas.state import State
+from app.core.telemetry import telemetry
+
+
+
+
+def pending_tool_calls(state: State) -> list[ToolCall]:
+    """Tool calls of the latest `AIMessage` that have no `ToolMessage` result yet."""
+    for index in range(len(state.messages) - 1, -1, -1):
+        message = state.messages[index]
+        if isinstance(message, AIMessage):
+            answered = {
+                reply.tool_call_id for reply in state.messages[index + 1:]
+                if isinstance(reply, ToolMessage)
+            }
+            return [tool_call for tool_call in message.tool_calls if tool_call["id"] not in answered]
+    return []
+
+
+
+class ToolExecutor:
+    """Graph node that runs the pending tool calls of a turn concurrently.
+
+    Calls to tools in `risky_tools` only run once their id is in
+    `state.approved_tool_calls`; every other call runs straight away. Calls
+    run under a concurrency cap and a per-tool timeout, and each result is
+    pushed to the custom stream as soon as it finishes.
+    """
+    def __init__(
+        self,
+        tools: list[BaseTool],
+        risky_tools: list[str],
+        max_concurrency: int = settings.TOOL_MAX_CONCURRENCY,
+        timeouts: dict[str, float] = settings.TOOL_TIMEOUT_SECONDS,
+        default_timeout: float = settings.TOOL_DEFAULT_TIMEOUT_SECONDS,
+    ):
+        self.tools = {tool.name: tool for tool in tools}
+        self.risky_tools = set(risky_tools)
+        self.max_concurrency = max_concurrency
+        self.timeouts = timeouts
+        self.default_timeout = default_timeout
+
+
+    def runnable_calls(self, state: State) -> list[ToolCall]:
+        return [
+            tool_call for tool_call in pending_tool_calls(state)
+            if tool_call["name"] not in self.risky_tools or tool_call["id"] in state.approved_tool_calls
+        ]
+
+
+    async def _run_one(self, tool_call: ToolCall, config: RunnableConfig, limit: asyncio.Semaphore) -> ToolMessage:
+        name = tool_call["name"]
+        tool = self.tools.get(name)
+        if tool is None:
+            return ToolMessage(
+                content=f"Error: {name} is not a valid tool, try one of [{', '.join(self.tools)}].",
+                name=name,
+                tool_call_id=tool_call["id"],
+                status="error",
+            )
+        timeout = self.timeouts.get(name, self.default_timeout)
+        async with limit:
+            with telemetry.span("tool_call", tool=name):
+                try:
+                    result = await asyncio.wait_for(tool.ainvoke(tool_call, config), timeout=timeout)
+                    if isinstance(result, ToolMessage):
+                        return result
+                    return ToolMessage(content=str(result), name=name, tool_call_id=tool_call["id"])
+                except asyncio.TimeoutError:
+                    global_logger.error("Tool %s timed out after %ss", name, timeout)
+                    return ToolMessage(
+                        content=f"Error: {name} timed out after {timeout}s",
+                        name=name,
+                        tool_call_id=tool_call["id"],
+                        status="error",
+                    )
+                except Exception as e:
+                    global_logger.error("Tool %s failed: %s", name, e)
+                    return ToolMessage(
+                        content=f"Error: {repr(e)}\n Please fix your mistakes.",
+                        name=name,
+                        tool_call_id=tool_call["id"],
+                        status="error",
+                    )
+
+
+    async def __call__(self, state: State, config: RunnableConfig) -> dict:
+        tool_calls = self.runnable_calls(state)
+        if not tool_calls:
+            return {}
+        writer = get_stream_writer()
+        limit = asyncio.Semaphore(self.max_concurrency)
+        started_at = time.perf_counter()
+        tasks = [asyncio.create_task(self._run_one(tool_call, config, limit)) for tool_call in tool_calls]
+        results: list[ToolMessage] = []
+        try:
+            for task in asyncio.as_completed(tasks):
+                tool_message = await task
+                results.append(tool_message)
+                telemetry.inc("tool_calls_total", tool=tool_message.name, status=tool_message.status)
+                writer({
+                    "tool": tool_message.name,
+                    "tool_call_id": tool_message.tool_call_id,
+                    "status": tool_message.status,
+                    "elapsed": time.perf_counter() - started_at,
+                })
+        finally:
+            # Cancel the calls still running if the graph run is cancelled
+            for task in tasks:
+                task.cancel()
+        order = {tool_call["id"]: index for index, tool_call in enumerate(tool_calls)}
+        results.sort(key=lambda tool_message: order[tool_message.tool_call_id])
+        return {"messages": results}
@@ -0,0 +1,375 @@
+from __future__ import annotations
+import os
+import re
+import json
+import uuid
+import shutil
+import sqlite3
+import hashlib
+import threading
+from typing import Protocol
+
+import numpy as np
+from langchain_core.documents import Document
+
+from app.configs import settings
+from app.logger import global_logger
+from app.schemas.paper import ChunkHit
+
+
+TOKEN_PATTERN = re.compile(r"[0-9a-z]+")
+MANIFEST_FILE_NAME = "manifest.json"
+CHUNKS_FILE_NAME = "chunks.sqlite"
+
+
+
+
+class Embedder(Protocol):
+    """Turns texts into L2-normalized float32 vectors of a fixed dimension."""
+    name: str
+    dimension: int
+
+    def embed(self, texts: list[str]) -> np.ndarray: ...
+
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32)
+
+
+
+class HashingEmbedder:
+    """Deterministic, dependency-free embedder based on signed feature hashing.
+
+    It has no notion of meaning beyond shared tokens, but it is stable across
+    processes, which makes it suitable for tests and offline use.
+    """
+    def __init__(self, dimension: int = 384):
+        self.name = f"hashing-{dimension}"
+        self.dimension = dimension
+
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in TOKEN_PATTERN.findall(text.lower()):
+                digest = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+                vectors[row, digest % self.dimension] += 1.0 if (digest >> 63) & 1 else -1.0
+        return _normalize(vectors)
+
+
+
+class OllamaEmbedder:
+    """Embedder backed by an Ollama embedding model."""
+    def __init__(self, model: str):
+        from langchain_ollama import OllamaEmbeddings
+        self.name = f"ollama-{model}"
+        self._embeddings = OllamaEmbeddings(model=model)
+        self.dimension = len(self._embeddings.embed_query("dimension probe"))
+
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        return _normalize(np.asarray(self._embeddings.embed_documents(texts), dtype=np.float32))
+
+
+
+def get_default_embedder() -> Embedder:
+    if settings.EMBEDDING_MODEL_NAME:
+        return OllamaEmbedder(settings.EMBEDDING_MODEL_NAME)
+    return HashingEmbedder()
+
+
+
+class _Segment:
+    """An immutable, memory-mapped block of vectors and their chunk ids."""
+    def __init__(self, segment_dir: str):
+        self.name = os.path.basename(segment_dir)
+        self.chunk_ids = np.load(os.path.join(segment_dir, "chunk_ids.npy"), mmap_mode="r")
+        self.vectors = np.load(os.path.join(segment_dir, "vectors.npy"), mmap_mode="r")
+        scales_path = os.path.join(segment_dir, "scales.npy")
+        self.scales = np.load(scales_path, mmap_mode="r") if os.path.exists(scales_path) else None
+
+
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+
+
+    @staticmethod
+    def write(segment_dir: str, chunk_ids: np.ndarray, vectors: np.ndarray, quantize: bool):
+        _Segment.write_blocks(segment_dir, len(chunk_ids), vectors.shape[1], [(chunk_ids, vectors)], quantize)
+
+
+    @staticmethod
+    def write_blocks(segment_dir: str, rows: int, dimension: int, blocks, quantize: bool):
+        """Write `rows` vectors arriving as (chunk ids, vectors) blocks straight to memory-mapped files."""
+        os.makedirs(segment_dir, exist_ok=True)
+        open_memmap = np.lib.format.open_memmap
+        chunk_ids = open_memmap(os.path.join(segment_dir, "chunk_ids.npy"), mode="w+", dtype=np.int64, shape=(rows,))
+        vectors = open_memmap(
+            os.path.join(segment_dir, "vectors.npy"), mode="w+",
+            dtype=np.int8 if quantize else np.float32, shape=(rows, dimension),
+        )
+        scales = open_memmap(
+            os.path.join(segment_dir, "scales.npy"), mode="w+", dtype=np.float32, shape=(rows,)
+        ) if quantize else None
+        offset = 0
+        for block_ids, block in blocks:
+            end = offset + len(block_ids)
+            chunk_ids[offset:end] = block_ids
+            if quantize:
+                block_scales = np.abs(block).max(axis=1) / 127.0
+                block_scales[block_scales == 0] = 1.0
+                vectors[offset:end] = np.round(block / block_scales[:, None])
+                scales[offset:end] = block_scales
+            else:
+                vectors[offset:end] = block
+            offset = end
+        for array in (chunk_ids, vectors, scales):
+            if array is not None:
+                array.flush()
+        del chunk_ids, vectors, scales
+
+
+    def dequantized(self, start: int, end: int) -> np.ndarray:
+        block = np.asarray(self.vectors[start:end], dtype=np.float32)
+        if self.scales is not None:
+            block *= np.asarray(self.scales[start:end])[:, None]
+        return block
+
+
+
+class VectorStore:
+    """Dense vector store over paper chunks with batched top-k search.
+
+    Vectors are kept in append-only segments of float32 (or int8 with a
+    per-row scale) matrices that are memory-mapped and scanned block by
+    block, so the whole matrix never has to fit in RAM. New vectors are
+    buffered and flushed into a new segment; removed chunks are tombstoned
+    until a background compaction merges the segments, which runs once there
+    are more than `max_segments` or the tombstones pass
+    `compact_deleted_fraction` of the stored rows.
+    """
+    def __init__(
+        self,
+        store_dir: str,
+        embedder: Embedder,
+        quantize: bool = settings.VECTOR_QUANTIZE,
+        segment_rows: int = settings.VECTOR_SEGMENT_ROWS,
+        block_rows: int = settings.VECTOR_SEARCH_BLOCK_ROWS,
+        max_segments: int = settings.VECTOR_MAX_SEGMENTS,
+        compact_deleted_fraction: float = settings.VECTOR_COMPACT_DELETED_FRACTION,
+    ):
+        self.store_dir = os.path.expanduser(store_dir)
+        self.embedder = embedder
+        self.quantize = quantize
+        self.segment_rows = segment_rows
+        self.block_rows = block_rows
+        self.max_segments = max_segments
+        self.compact_deleted_fraction = compact_deleted_fraction
+        os.makedirs(self.store_dir, exist_ok=True)
+        self._lock = threading.RLock()
+        self._compaction_thread: threading.Thread | None = None
+        self._conn = sqlite3.connect(os.path.join(self.store_dir, CHUNKS_FILE_NAME), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "chunk_id INTEGER PRIMARY KEY AUTOINCREMENT, paper_id TEXT NOT NULL, path TEXT NOT NULL, "
+            "title TEXT NOT NULL, page INTEGER, text TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS chunks_paper_id ON chunks (paper_id)")
+        self._conn.commit()
+        manifest = self._read_manifest()
+        if manifest.get("embedder", embedder.name) != embedder.name:
+            raise ValueError(
+                f"Vector store {self.store_dir} was built with {manifest['embedder']}, not {embedder.name}"
+            )
+        self._segments = [
+            _Segment(os.path.join(self.store_dir, name)) for name in manifest.get("segments", [])
+        ]
+        self._deleted: set[int] = set(manifest.get("deleted", []))
+        self._buffer_ids: list[int] = []
+        self._buffer_vectors: list[np.ndarray] = []
+
+
+    def _read_manifest(self) -> dict:
+        manifest_path = os.path.join(self.store_dir, MANIFEST_FILE_NAME)
+        if not os.path.exists(manifest_path):
+            return {}
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+
+    def _write_manifest(self):
+        manifest_path = os.path.join(self.store_dir, MANIFEST_FILE_NAME)
+        with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({
+                "embedder": self.embedder.name,
+                "dimension": self.embedder.dimension,
+                "segments": [segment.name for segment in self._segments],
+                "deleted": sorted(self._deleted),
+            }, f)
+        os.replace(manifest_path + ".tmp", manifest_path)
+
+
+    def paper_ids(self) -> set[str]:
+        with self._lock:
+            return {row[0] for row in self._conn.execute("SELECT DISTINCT paper_id FROM chunks")}
+
+
+    def add(self, paper_id: str, path: str, title: str, chunks: list[Document]):
+        if not chunks:
+            return
+        vectors = self.embedder.embed([chunk.page_content for chunk in chunks])
+        with self._lock:
+            for chunk, vector in zip(chunks, vectors):
+                cursor = self._conn.execute(
+                    "INSERT INTO chunks (paper_id, path, title, page, text) VALUES (?, ?, ?, ?, ?)",
+                    (paper_id, path, title, chunk.metadata.get("page"), chunk.page_content),
+                )
+                self._buffer_ids.append(cursor.lastrowid)
+                self._buffer_vectors.append(vector)
+            if len(self._buffer_ids) >= self.segment_rows:
+                self.flush()
+
+
+    def remove(self, paper_id: str):
+        with self._lock:
+            chunk_ids = {
+                row[0] for row in self._conn.execute("SELECT chunk_id FROM chunks WHERE paper_id = ?", (paper_id,))
+            }
+            if not chunk_ids:
+                return
+            keep = [index for index, chunk_id in enumerate(self._buffer_ids) if chunk_id not in chunk_ids]
+            self._buffer_ids = [self._buffer_ids[index] for index in keep]
+            self._buffer_vectors = [self._buffer_vectors[index] for index in keep]
+            self._deleted.update(chunk_ids)
+            self._conn.execute("DELETE FROM chunks WHERE paper_id = ?", (paper_id,))
+
+
+    def flush(self):
+        """Persist buffered vectors as a new segment, plus pending removals."""
+        with self._lock:
+            if self._buffer_ids:
+                segment_dir = os.path.join(self.store_dir, f"segment-{uuid.uuid4().hex}")
+                _Segment.write(
+                    segment_dir,
+                    np.asarray(self._buffer_ids, dtype=np.int64),
+                    np.vstack(self._buffer_vectors),
+                    self.quantize,
+                )
+                self._segments.append(_Segment(segment_dir))
+                self._buffer_ids, self._buffer_vectors = [], []
+            self._write_manifest()
+            self._conn.commit()
+            rows = sum(len(segment) for segment in self._segments)
+            if (
+                len(self._segments) > self.max_segments
+                or len(self._deleted) > self.compact_deleted_fraction * rows
+            ):
+                self.start_compaction()
+
+
+    def start_compaction(self):
+        """Merge all segments in a background thread, dropping removed chunks."""
+        with self._lock:
+            if self._compaction_thread is not None and self._compaction_thread.is_alive():
+                return
+            self._compaction_thread = threading.Thread(target=self.compact, name="vector-store-compaction", daemon=True)
+            self._compaction_thread.start()
+
+
+    def compact(self):
+        with self._lock:
+            segments = list(self._segments)
+            deleted = set(self._deleted)
+        if len(segments) <= 1 and not deleted:
+            return
+        deleted_ids = np.fromiter(deleted, dtype=np.int64)
+
+        def _blocks():
+            for segment in segments:
+                for start in range(0, len(segment), self.block_rows):
+                    end = min(start + self.block_rows, len(segment))
+                    block_ids = np.asarray(segment.chunk_ids[start:end])
+                    keep = ~np.isin(block_ids, deleted_ids)
+                    yield block_ids[keep], segment.dequantized(start, end)[keep]
+
+        # Count the surviving rows from the chunk ids alone, then stream the vectors block by block
+        rows = sum(int((~np.isin(np.asarray(segment.chunk_ids), deleted_ids)).sum()) for segment in segments)
+        segment_dir = os.path.join(self.store_dir, f"segment-{uuid.uuid4().hex}")
+        if rows:
+            _Segment.write_blocks(segment_dir, rows, self.embedder.dimension, _blocks(), self.quantize)
+        with self._lock:
+            # Keep segments flushed while compacting, and removals that arrived meanwhile
+            added = [segment for segment in self._segments if segment not in segments]
+            self._segments = ([_Segment(segment_dir)] if rows else []) + added
+            self._deleted -= deleted
+            self._write_manifest()
+        for segment in segments:
+            shutil.rmtree(os.path.join(self.store_dir, segment.name), ignore_errors=True)
+        global_logger.info("Compacted %s vector segments into %s rows", len(segments), rows)
+
+
+    def _scan(self, queries: np.ndarray, top_k: int) -> tuple[np.ndarray, np.ndarray]:
+        """Return the (scores, chunk ids) of the top-k rows for every query."""
+        with self._lock:
+            segments = list(self._segments)
+            deleted_ids = np.fromiter(self._deleted, dtype=np.int64)
+            buffer_ids = np.asarray(self._buffer_ids, dtype=np.int64)
+            buffer_vectors = np.vstack(self._buffer_vectors) if self._buffer_vectors else None
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_ids = np.zeros((len(queries), 0), dtype=np.int64)
+
+        def _merge(block_ids: np.ndarray, block: np.ndarray):
+            nonlocal best_scores, best_ids
+            if len(deleted_ids):
+                keep = ~np.isin(block_ids, deleted_ids)
+                block_ids, block = block_ids[keep], block[keep]
+            if not len(block_ids):
+                return
+            scores = queries @ block.T
+            candidate_scores = np.concatenate([best_scores, scores], axis=1)
+            candidate_ids = np.concatenate([best_ids, np.broadcast_to(block_ids, scores.shape)], axis=1)
+            k = min(top_k, candidate_scores.shape[1])
+            top = np.argpartition(-candidate_scores, k - 1, axis=1)[:, :k]
+            best_scores = np.take_along_axis(candidate_scores, top, axis=1)
+            best_ids = np.take_along_axis(candidate_ids, top, axis=1)
+
+        for segment in segments:
+            for start in range(0, len(segment), self.block_rows):
+                end = min(start + self.block_rows, len(segment))
+                _merge(np.asarray(segment.chunk_ids[start:end]), segment.dequantized(start, end))
+        if buffer_vectors is not None:
+            _merge(buffer_ids, buffer_vectors)
+        order = np.argsort(-best_scores, axis=1)
+        return np.take_along_axis(best_scores, order, axis=1), np.take_along_axis(best_ids, order, axis=1)
+
+
+    def search_batch(self, queries: list[str], top_k: int = 10) -> list[list[ChunkHit]]:
+        if not queries:
+            return []
+        scores, chunk_ids = self._scan(self.embedder.embed(queries), top_k)
+        results: list[list[ChunkHit]] = []
+        with self._lock:
+            for query_scores, query_ids in zip(scores, chunk_ids):
+                hits: list[ChunkHit] = []
+                for score, chunk_id in zip(query_scores, query_ids):
+                    row = self._conn.execute(
+                        "SELECT paper_id, path, title, page, text FROM chunks WHERE chunk_id = ?",
+                        (int(chunk_id),),
+                    ).fetchone()
+                    if row is not None:
+                        hits.append(ChunkHit(*row, score=float(score)))
+                results.append(hits)
+        return results
+
+
+    def search(self, query: str, top_k: int = 10) -> list[ChunkHit]:
+        return self.search_batch([query], top_k)[0]
+
+
+    def save(self):
+        self.flush()
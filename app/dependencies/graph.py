@@ -0,0 +1,9 @@
+from fastapi import Request
+from langgraph.graph.state import CompiledStateGraph
+
+
+
+
+def get_graph(request: Request) -> CompiledStateGraph:
+    """The agent graph compiled once by the application lifespan."""
+    return request.app.state.graph
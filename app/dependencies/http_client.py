@@ -0,0 +1,36 @@
+import importlib.util
+import httpx
+
+from app.configs import settings
+
+
+_http_client: httpx.AsyncClient | None = None
+
+
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the process-wide pooled `httpx.AsyncClient`, creating it on first use.
+
+    HTTP/2 is enabled when `h2`, pulled in by the `httpx[http2]` dependency, is installed.
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            http2=importlib.util.find_spec("h2") is not None,
+            timeout=httpx.Timeout(settings.DOWNLOAD_TIMEOUT_SECONDS, connect=10),
+            limits=httpx.Limits(
+                max_connections=settings.DOWNLOAD_MAX_CONCURRENCY,
+                max_keepalive_connections=settings.DOWNLOAD_MAX_CONCURRENCY,
+            ),
+            follow_redirects=True,
+        )
+    return _http_client
+
+
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
@@ -0,0 +1,288 @@
+from __future__ import annotations
+import os
+import json
+import asyncio
+import hashlib
+from typing import Any
+
+from langchain_core.tools import BaseTool
+
+from app.configs import settings
+from app.logger import global_logger
+
+
+MCP_SERVERS = {
+    "arxiv": {
+        "command": "python",
+        "args": ["-m", "backend.mcp_servers.arxiv.server"],
+        "transport": "stdio"
+    },
+    "books": {
+        "command": "python",
+        "args": ["-m", "backend.mcp_servers.books.server"],
+        "transport": "stdio"
+    }
+}
+
+
+
+
+class _ServerConnection:
+    """One long-lived session to an MCP server, started on first use.
+
+    The session is entered and exited by a dedicated task, as the stdio
+    transport must be closed by the task that opened it.
+    """
+    def __init__(self, client, name: str, on_start=None):
+        self.client = client
+        self.name = name
+        # Called with the server name every time the server (re)starts
+        self.on_start = on_start
+        self._session = None
+        self._task: asyncio.Task | None = None
+        self._stop = asyncio.Event()
+        self._lock = asyncio.Lock()
+
+
+    async def _run(self, ready: asyncio.Future):
+        try:
+            async with self.client.session(self.name) as session:
+                ready.set_result(session)
+                await self._stop.wait()
+        except BaseException as e:
+            if not ready.done():
+                ready.set_exception(e)
+            elif not isinstance(e, asyncio.CancelledError):
+                global_logger.warning("MCP server %s exited: %s", self.name, e)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+        finally:
+            self._session = None
+
+
+    async def get(self):
+        async with self._lock:
+            if self._session is None:
+                ready = asyncio.get_running_loop().create_future()
+                self._stop = asyncio.Event()
+                self._task = asyncio.create_task(self._run(ready))
+                self._session = await ready
+                global_logger.info("Started MCP server %s", self.name)
+                if self.on_start is not None:
+                    self.on_start(self.name)
+            return self._session
+
+
+    async def check(self, timeout: float) -> bool:
+        """Ping the server; a server that does not answer is closed and restarted on its next call."""
+        session = self._session
+        if session is None:
+            return True
+        try:
+            await asyncio.wait_for(session.send_ping(), timeout)
+            return True
+        except Exception as e:
+            global_logger.warning("MCP server %s failed its health check: %r", self.name, e)
+            await self.close()
+            return False
+
+
+    async def close(self):
+        self._stop.set()
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(self._task, timeout=5)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                pass
+            except Exception as e:
+                global_logger.warning("Failed to close MCP server %s: %s", self.name, e)
+            self._task = None
+        self._session = None
+
+
+
+class _PooledSession:
+    """Stands in for a `ClientSession` in the adapter's tools, forwarding calls to the current session."""
+    def __init__(self, connection: _ServerConnection):
+        self._connection = connection
+
+
+    async def call_tool(self, *args, **kwargs):
+        session = await self._connection.get()
+        return await session.call_tool(*args, **kwargs)
+
+
+
+class MCPServerPool:
+    """Warm MCP server sessions shared by every tool call, with cached tool schemas.
+
+    Tool schemas are persisted to `schema_cache_path`, so a launch builds the
+    tools without spawning the servers; each server starts on its first tool
+    call and is pinged every `health_interval` seconds afterwards. Once a
+    server has started, its tools are listed again in the background and the
+    cache is replaced if they changed, so an edited server is picked up.
+    """
+    def __init__(
+        self,
+        servers: dict[str, dict[str, Any]] = MCP_SERVERS,
+        schema_cache_path: str = settings.MCP_SCHEMA_CACHE_PATH,
+        health_interval: float = settings.MCP_HEALTH_CHECK_INTERVAL_SECONDS,
+    ):
+        self.servers = servers
+        self.schema_cache_path = schema_cache_path
+        self.health_interval = health_interval
+        self._client = None
+        self._connections: dict[str, _ServerConnection] = {}
+        self._tools: dict[str, list[BaseTool]] = {}
+        self._health_task: asyncio.Task | None = None
+        self._refresh_tasks: set[asyncio.Task] = set()
+
+
+    def _connection(self, name: str) -> _ServerConnection:
+        if self._client is None:
+            from langchain_mcp_adapters.client import MultiServerMCPClient
+            self._client = MultiServerMCPClient(self.servers)
+        if name not in self._connections:
+            self._connections[name] = _ServerConnection(self._client, name, self._schedule_refresh)
+        return self._connections[name]
+
+
+    def _fingerprint(self, name: str) -> str:
+        return hashlib.sha256(json.dumps(self.servers[name], sort_keys=True).encode("utf-8")).hexdigest()
+
+
+    def _load_schemas(self) -> dict[str, Any]:
+        try:
+            with open(self.schema_cache_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+
+    def _save_schemas(self, name: str, schemas: list[dict[str, Any]]):
+        cached = self._load_schemas()
+        cached[name] = {"fingerprint": self._fingerprint(name), "tools": schemas}
+        os.makedirs(os.path.dirname(self.schema_cache_path) or ".", exist_ok=True)
+        temp_path = self.schema_cache_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(cached, f)
+        os.replace(temp_path, self.schema_cache_path)
+
+
+    async def _list_schemas(self, name: str) -> list[dict[str, Any]]:
+        session = await self._connection(name).get()
+        schemas, cursor = [], None
+        while True:
+            page = await session.list_tools(cursor=cursor)
+            schemas.extend(tool.model_dump(mode="json", by_alias=True, exclude_none=True) for tool in page.tools)
+            cursor = page.nextCursor
+            if not cursor:
+                return schemas
+
+
+    async def _server_tools(self, name: str) -> list[BaseTool]:
+        from mcp.types import Tool as MCPTool
+        from langchain_mcp_adapters.tools import convert_mcp_tool_to_langchain_tool
+
+        cached = self._load_schemas().get(name)
+        if cached is not None and cached.get("fingerprint") == self._fingerprint(name):
+            schemas = cached["tools"]
+        else:
+            schemas = await self._list_schemas(name)
+            self._save_schemas(name, schemas)
+        session = _PooledSession(self._connection(name))
+        return [
+            convert_mcp_tool_to_langchain_tool(session, MCPTool.model_validate(schema), server_name=name)
+            for schema in schemas
+        ]
+
+
+    async def get_tools(self, exclude: list[str] | None = None) -> list[BaseTool]:
+        tools = []
+        for name in self.servers:
+            if name in (exclude or []):
+                continue
+            if name not in self._tools:
+                self._tools[name] = await self._server_tools(name)
+            tools.extend(self._tools[name])
+        self.start_health_checks()
+        return tools
+
+
+    async def _refresh_server(self, name: str):
+        schemas = await self._list_schemas(name)
+        cached = self._load_schemas().get(name)
+        if cached is not None and cached.get("fingerprint") == self._fingerprint(name) and cached["tools"] == schemas:
+            return
+        global_logger.info("Tool schemas of MCP server %s changed; updating the cache", name)
+        self._save_schemas(name, schemas)
+        # Rebuilt from the new schemas by the next `get_tools`
+        self._tools.pop(name, None)
+
+
+    def _schedule_refresh(self, name: str):
+        async def _refresh():
+            try:
+                await self._refresh_server(name)
+            except Exception as e:
+                global_logger.warning("Failed to refresh the tool schemas of MCP server %s: %s", name, e)
+
+        task = asyncio.create_task(_refresh())
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+
+
+    async def refresh_schemas(self):
+        """Re-read the tool schemas from the running servers; changes apply to the next `get_tools`."""
+        for name in list(self._connections):
+            await self._refresh_server(name)
+
+
+    async def check_health(self) -> dict[str, bool]:
+        return {
+            name: await connection.check(settings.MCP_HEALTH_CHECK_TIMEOUT_SECONDS)
+            for name, connection in self._connections.items()
+        }
+
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            await self.check_health()
+
+
+    def start_health_checks(self):
+        if self._health_task is None and self.health_interval > 0:
+            self._health_task = asyncio.create_task(self._health_loop())
+
+
+    async def close(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+        for task in list(self._refresh_tasks):
+            task.cancel()
+        for connection in self._connections.values():
+            await connection.close()
+        self._connections.clear()
+        self._tools.clear()
+
+
+
+mcp_pool = MCPServerPool()
+
+
+
+
+async def get_mcp_tools(exclude: list[str] | None = None) -> list[BaseTool]:
+    """Load the tools of the configured MCP servers, skipping the ones in `exclude`."""
+    return await mcp_pool.get_tools(exclude)
+
+
+
+async def close_mcp_pool():
+    await mcp_pool.close()
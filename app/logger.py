@@ -1,21 +1,120 @@
 import logging
 import sys
-from logging.handlers import TimedRotatingFileHandler
+import json
+import time
+import queue
+import atexit
+import threading
+from contextvars import ContextVar
+from contextlib import contextmanager
+from logging.handlers import TimedRotatingFileHandler, QueueHandler, QueueListener
 import os
 
+from app.configs import settings
+
 
 LOG_FILE_NAME = "app.log"
-LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s (%(filename)s:%(lineno)d)"
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s %(thread_id)s] %(message)s (%(filename)s:%(lineno)d)"
+
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+thread_id_var: ContextVar[str] = ContextVar("thread_id", default="-")
+
+
+
+
+class _ContextFilter(logging.Filter):
+    """Copy the request and thread ids onto the record, in the caller's context."""
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        record.thread_id = thread_id_var.get()
+        return True
+
+
+
+class _DebugRateLimiter(logging.Filter):
+    """Let at most `max_per_second` debug records through per call site; count the rest as dropped."""
+    def __init__(self, max_per_second: float):
+        super().__init__()
+        self.max_per_second = max_per_second
+        self.dropped = 0
+        self._windows: dict[tuple[str, int], list] = {}
+        self._lock = threading.Lock()
+
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno != logging.DEBUG or self.max_per_second <= 0:
+            return True
+        now = time.monotonic()
+        site = (record.pathname, record.lineno)
+        with self._lock:
+            window = self._windows.get(site)
+            if window is None or now - window[0] >= 1.0:
+                window = self._windows[site] = [now, 0]
+            window[1] += 1
+            if window[1] > self.max_per_second:
+                self.dropped += 1
+                return False
+        return True
+
+
 
+class _JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", "-"),
+            "thread_id": getattr(record, "thread_id", "-"),
+            "location": f"{record.filename}:{record.lineno}",
+        }
+        if record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload["exception"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False)
 
-def setup_logger(name: str = "app_logger", level: int = logging.INFO):
+
+
+class _QueueHandler(QueueHandler):
+    """Hand records to the listener thread without formatting them on the caller's side."""
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge the %-style arguments here, as they may not be safe to read from another thread
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+
+@contextmanager
+def log_context(request_id: str | None = None, thread_id: str | None = None):
+    """Tag every record logged inside the block (and the tasks it starts) with these ids."""
+    tokens = []
+    if request_id is not None:
+        tokens.append((request_id_var, request_id_var.set(request_id)))
+    if thread_id is not None:
+        tokens.append((thread_id_var, thread_id_var.set(thread_id)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+
+def setup_logger(name: str = "app_logger", level: int | str = settings.LOG_LEVEL):
     """
-    Sets up a robust logger with a file handler and a console handler.
+    Sets up a logger whose records go through a queue to a background listener,
+    which writes them to the console and a rotating file, so logging never blocks the caller.
     :param name: The name of the logger to be used by all modules.
     :param level: The minimum logging level to process.
     :return: The configured logger instance.
     """
-    
+
     # 1. Create the logger
     logger = logging.getLogger(name)
     logger.setLevel(level)
@@ -23,20 +122,19 @@ def setup_logger(name: str = "app_logger", level: int = logging.INFO):
     # Prevent handlers from being added multiple times if the function is called repeatedly
     if not logger.handlers:
         # 2. Create Formatter
-        formatter = logging.Formatter(LOG_FORMAT)
+        formatter = _JsonFormatter() if settings.LOG_JSON else logging.Formatter(LOG_FORMAT)
 
         # 3. Create Handlers
 
         # Console Handler (for real-time viewing/debugging)
         console_handler = logging.StreamHandler(sys.stdout)
         console_handler.setFormatter(formatter)
-        logger.addHandler(console_handler)
 
         # File Handler (for persistence and log rotation)
         log_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'logs')
         os.makedirs(log_dir, exist_ok=True)
         log_path = os.path.join(log_dir, LOG_FILE_NAME)
-        
+
         # TimedRotatingFileHandler rotates the log file daily
         file_handler = TimedRotatingFileHandler(
             log_path,
@@ -46,10 +144,21 @@ def setup_logger(name: str = "app_logger", level: int = logging.INFO):
             encoding='utf-8'
         )
         file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+
+        # 4. Route records through an unbounded queue to a listener thread that owns the I/O handlers
+        log_queue = queue.SimpleQueue()
+        queue_handler = _QueueHandler(log_queue)
+        queue_handler.addFilter(_DebugRateLimiter(settings.LOG_DEBUG_MAX_PER_SECOND))
+        queue_handler.addFilter(_ContextFilter())
+        logger.addHandler(queue_handler)
+
+        listener = QueueListener(log_queue, console_handler, file_handler, respect_handler_level=True)
+        listener.start()
+        # Flush the pending records on exit
+        atexit.register(listener.stop)
 
     return logger
 
 
 # Create the global logger instance
-global_logger = setup_logger()
\ No newline at end of file
+global_logger = setup_logger()
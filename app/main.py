@@ -0,0 +1,74 @@
+from uuid import uuid4
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
+
+from app.configs import settings
+from app.logger import global_logger, log_context
+from app.api.arxiv_tools import arxiv_tools_router
+from app.api.agent_workflow import agent_workflow_router
+from app.core.graph_runner import create_graph
+from app.core.checkpoints import open_checkpointer
+from app.core.llm_scheduler import llm_scheduler
+from app.core.arxiv_mirror import arxiv_mirror
+from app.core.telemetry import telemetry
+from app.dependencies.http_client import get_http_client, close_http_client
+from app.dependencies.mcp_client import close_mcp_pool
+
+
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create the shared checkpointer, HTTP client, tools and graph once per process."""
+    async with open_checkpointer() as checkpointer:
+        get_http_client()
+        app.state.graph = await create_graph(checkpointer)
+        if settings.ARXIV_MIRROR_ENABLED:
+            arxiv_mirror.start_sync()
+        global_logger.info("Science assistant is ready")
+        try:
+            yield
+        finally:
+            await arxiv_mirror.stop_sync()
+            await close_mcp_pool()
+            await close_http_client()
+            telemetry.close()
+
+
+
+app = FastAPI(title="Science Assistant", lifespan=lifespan)
+app.include_router(arxiv_tools_router)
+app.include_router(agent_workflow_router)
+
+
+
+@app.middleware("http")
+async def request_id_middleware(request: Request, call_next):
+    """Tag the request's log records with its X-Request-ID (or a new one) and echo it back."""
+    request_id = request.headers.get("X-Request-ID") or uuid4().hex[:16]
+    with log_context(request_id=request_id):
+        response = await call_next(request)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+
+
+telemetry.register_gauge("llm_in_flight", lambda: llm_scheduler.stats()["in_flight"])
+telemetry.register_gauge("llm_queued_interactive", lambda: llm_scheduler.stats()["queued"].get("interactive", 0))
+telemetry.register_gauge("llm_queued_batch", lambda: llm_scheduler.stats()["queued"].get("batch", 0))
+telemetry.register_gauge("llm_shed", lambda: llm_scheduler.stats()["shed"])
+
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus scrape endpoint; empty apart from the gauges unless TELEMETRY_ENABLED is set."""
+    return PlainTextResponse(telemetry.render_prometheus(), media_type="text/plain; version=0.0.4")
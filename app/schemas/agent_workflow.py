@@ -0,0 +1,23 @@
+from typing import Literal
+from pydantic import BaseModel, Field
+
+
+
+class ChatRequest(BaseModel):
+    message: str = Field(description="The message of the user")
+    thread_id: str | None = Field(description="The conversation to continue. A new one is started when empty", default=None)
+    priority: Literal["interactive", "batch"] = Field(description="Scheduling class of the LLM calls of this run", default="interactive")
+    bypass_llm_cache: bool = Field(description="Always run inference instead of replaying a cached answer", default=False)
+
+
+
+class ResumeRequest(BaseModel):
+    thread_id: str = Field(description="The conversation waiting for a decision")
+    decision: str = Field(description="The answer to the interrupt, e.g. 'continue' or 'reject'")
+    priority: Literal["interactive", "batch"] = Field(description="Scheduling class of the LLM calls of this run", default="interactive")
+    bypass_llm_cache: bool = Field(description="Always run inference instead of replaying a cached answer", default=False)
+
+
+
+class CancelRequest(BaseModel):
+    thread_id: str = Field(description="The conversation whose running turn is cancelled")
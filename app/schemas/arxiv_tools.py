@@ -9,8 +9,8 @@ class BaseArxivToolsRequest(BaseModel):
     batch_size: int = Field(description="The numbers of papers need to be searched and/or downloaded for", default=5)
     sort_by: Literal["relevance", "lastUpdatedDate"] = Field(description="How the papers being sorted based on relevance, or the date the paper was last updated, formatted in `YYYY-MM-DD`", default="relevance")
     categories: str | list[str] = Field(description="The categories of the papers being searched and/or downloaded, formatted in `YYYY-MM-DD`", default=['cs', 'math'])
-    date_from: str = Field(description="The first date of the filter")
-    date_to: str = Field(description="The last date of the filter")
+    date_from: str | None = Field(description="The first date of the filter, formatted in `YYYY-MM-DD`", default=None)
+    date_to: str | None = Field(description="The last date of the filter, formatted in `YYYY-MM-DD`", default=None)
 
 
 
@@ -19,5 +19,25 @@ class SearchPapersRequest(BaseArxivToolsRequest):
 
 
 
+class SearchPapersBatchRequest(BaseModel):
+    requests: list[SearchPapersRequest] = Field(description="The searches to run together, e.g. different phrasings or category splits of one topic")
+    fusion: Literal["rrf", "none"] = Field(description="How the results are merged: `rrf` ranks papers found by several searches higher, `none` keeps the order they were found in", default="rrf")
+    max_results: int | None = Field(description="The maximum number of merged papers to return. All of them when empty", default=None)
+
+
+
 class DownloadPapersRequest(BaseArxivToolsRequest):
-    output_dir: str = Field(description="The path in the local machines that store the downloaded papers", default=settings.PAPERS_DIR)
\ No newline at end of file
+    output_dir: str = Field(description="The path in the local machines that store the downloaded papers", default=settings.PAPERS_DIR)
+
+
+
+class SearchFullTextRequest(BaseModel):
+    query: str = Field(description="The keywords or question being searched for inside the downloaded papers")
+    top_k: int = Field(description="The numbers of matching passages to return", default=10)
+    papers_dir: str = Field(description="The path in the local machines that store the downloaded papers", default=settings.PAPERS_DIR)
+
+
+
+
+class SearchSemanticRequest(SearchFullTextRequest):
+    pass
@@ -9,4 +9,28 @@ class Paper:
     summary: str
     published: str
     pdf_url: str
-    primary_category: str
\ No newline at end of file
+    primary_category: str
+
+
+@dataclass
+class PaperRecord:
+    """A paper stored in the local paper store, keyed by arXiv id and version."""
+    arxiv_id: str
+    version: int
+    paper: Paper
+    path: str
+    size: int
+    sha256: str | None
+    downloaded_at: float
+
+
+
+@dataclass
+class ChunkHit:
+    """A chunk of a local paper returned by a retrieval index."""
+    paper_id: str
+    path: str
+    title: str
+    page: int | None
+    text: str
+    score: float
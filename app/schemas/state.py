@@ -15,8 +15,12 @@ class State(BaseModel):
         pdf_path: The path of the paper need to be summarized.
         summary: The summary of a paper need to be summarized.
         decision: Decide which action to do next
+        conversation_summary: The rolling summary of the turns folded out of `messages`.
+        approved_tool_calls: The ids of the risky tool calls approved by the user.
     """
     messages: Annotated[list[BaseMessage], add_messages] = []
-    pdf_path: str
+    pdf_path: str | None = None
     summary: str | None = None
-    decision: Literal["continue", "reject"] | None = Field(default=None)
\ No newline at end of file
+    decision: Literal["continue", "reject"] | None = Field(default=None)
+    conversation_summary: str | None = None
+    approved_tool_calls: list[str] = []
\ No newline at end of file
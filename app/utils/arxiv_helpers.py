@@ -1,14 +1,21 @@
 from datetime import datetime
-from fuzzyfinder import fuzzyfinder
 import os
-import pymupdf
-import pymupdf4llm
+from collections.abc import Iterable, Iterator
 from langchain_core.documents import Document
-from langchain_text_splitters import MarkdownTextSplitter
 
+from app.configs import settings
 from app.logger import global_logger
+from app.utils.lazy_import import lazy_import
 
 
+# Loaded on first use, as they dominate the import time of the tools
+pymupdf = lazy_import("pymupdf")
+pymupdf4llm = lazy_import("pymupdf4llm")
+
+
+# Bump whenever the output of `_parse_pdf_pages` changes, to invalidate cached parses
+PARSER_VERSION = "1"
+
 VALID_CATEGORIES = [
     "cs",
     "econ",
@@ -32,6 +39,19 @@ VALID_CATEGORIES = [
     "quant-ph",
 ]
 
+# Archives whose papers are filed under the bare archive name, with no `archive.SUB` categories
+ARCHIVES_WITHOUT_SUBCATEGORIES = {
+    "gr-qc",
+    "hep-ex",
+    "hep-lat",
+    "hep-ph",
+    "hep-th",
+    "math-ph",
+    "nucl-ex",
+    "nucl-th",
+    "quant-ph",
+}
+
 
 
 def _validate_categories(categories: list[str]) -> bool:
@@ -42,7 +62,7 @@ def _validate_categories(categories: list[str]) -> bool:
         else:
             prefix = category
         if prefix not in VALID_CATEGORIES:
-            global_logger.warning(f"Unknown category prefix: {prefix}")
+            global_logger.warning("Unknown category prefix: %s", prefix)
             return False
     return True
 
@@ -67,7 +87,8 @@ def _optimize_query(query: str) -> str:
     terms = query.split()
     if len(terms) > 10:
         global_logger.warning(
-            f"Very long query ({len(terms)} terms) - consider using quotes for phrases or field-specific searches"
+            "Very long query (%s terms) - consider using quotes for phrases or field-specific searches",
+            len(terms),
         )
 
     # Only optimization: preserve the original query exactly as intended
@@ -75,35 +96,82 @@ def _optimize_query(query: str) -> str:
 
 
 
-def _fuzzy_find_filenames(query: str, directory: str) -> list[str]:
-    try:
-        filenames = [
-            os.path.join(root, file)
-            for root, _, files in os.walk(directory, topdown=True)
-            for file in files
+def _parse_pdf_pages(pdf_path: str, pages: list[int] | None = None) -> list[dict]:
+    """Convert `pages` of a PDF (all pages by default) to markdown and extract their tables.
+
+    The document is opened once and shared by `pymupdf4llm` and the table
+    finder. The result only holds plain data, so it can cross process
+    boundaries.
+    """
+    with pymupdf.open(pdf_path) as pdf:
+        if pages is None:
+            pages = list(range(pdf.page_count))
+        md_page_chunks = pymupdf4llm.to_markdown(pdf, pages=pages, page_chunks=True)
+        return [
+            {
+                'page': page_number,
+                'text': page_chunk['text'],
+                'toc_items': page_chunk['toc_items'],
+                'tables': [table.extract() for table in pdf[page_number].find_tables()],
+            }
+            for page_number, page_chunk in zip(pages, md_page_chunks)
         ]
-        matches = list(fuzzyfinder(query, filenames))
-        return matches
-    except Exception as e:
-        global_logger.error(f"Error during fuzzy file search: {e}")
-        return []
 
 
 
-def _create_documents_from_pdf(pdf_path: str) -> list[Document]:
-    pdf = pymupdf.open(pdf_path)
-    md_page_chunks = pymupdf4llm.to_markdown(pdf_path, page_chunks=True)
-    documents: list[Document] = []
-    for page_number, page_chunk in enumerate(md_page_chunks):
+def _documents_from_parsed_pages(pdf_path: str, parsed_pages: Iterable[dict]) -> Iterator[Document]:
+    for parsed_page in parsed_pages:
         metadata = {
             'file_path': pdf_path,
             'title': os.path.basename(pdf_path),
-            'toc_items': page_chunk['toc_items'],
-            'tables': [table.extract() for table in pdf[page_number].find_tables()]
+            'page': parsed_page['page'],
+            'toc_items': parsed_page['toc_items'],
+            'tables': parsed_page['tables'],
         }
-        text = page_chunk['text']
-        documents.append(Document(
-            page_content = text,
+        yield Document(
+            page_content = parsed_page['text'],
             metadata = metadata
-        ))
-    return documents
\ No newline at end of file
+        )
+
+
+
+def _create_documents_from_pdf(pdf_path: str, use_cache: bool = True) -> list[Document]:
+    """Parse a PDF into page documents, reading it back from the parsed document cache when possible."""
+    if not use_cache:
+        return list(_documents_from_parsed_pages(pdf_path, _parse_pdf_pages(pdf_path)))
+    # Imported here, as the cache module depends on this one for `PARSER_VERSION`
+    from app.core.document_cache import document_cache
+
+    sha256 = document_cache.file_hash(pdf_path)
+    cached_document = document_cache.get(pdf_path, sha256)
+    if cached_document is not None:
+        with cached_document:
+            return list(_documents_from_parsed_pages(pdf_path, cached_document.pages()))
+    parsed_pages = _parse_pdf_pages(pdf_path)
+    document_cache.put(pdf_path, parsed_pages, sha256)
+    return list(_documents_from_parsed_pages(pdf_path, parsed_pages))
+
+
+
+def _split_documents(
+    documents: Iterable[Document],
+    chunk_size: int = settings.CHUNK_SIZE,
+    chunk_overlap: int = settings.CHUNK_OVERLAP,
+) -> list[Document]:
+    """Split page documents into markdown-aware chunks for retrieval."""
+    from langchain_text_splitters import MarkdownTextSplitter
+
+    splitter = MarkdownTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    chunks: list[Document] = []
+    for document in documents:
+        metadata = {
+            key: document.metadata[key]
+            for key in ('file_path', 'title', 'page')
+            if key in document.metadata
+        }
+        for text in splitter.split_text(document.page_content):
+            chunks.append(Document(
+                page_content = text,
+                metadata = dict(metadata)
+            ))
+    return chunks
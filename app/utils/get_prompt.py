@@ -1,3 +1,33 @@
+import os
+
+
+# path -> (mtime, size, text), so an edited prompt is picked up without a restart
+_prompt_cache: dict[str, tuple[int, int, str]] = {}
+_rendered_cache: dict[tuple, str] = {}
+
+
+
+
 def read_from_txt_path(txt_path: str):
+    stat = os.stat(txt_path)
+    cached = _prompt_cache.get(txt_path)
+    if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2]
     with open(txt_path, "r", encoding="utf-8") as file:
-        return file.read()
\ No newline at end of file
+        text = file.read()
+    _prompt_cache[txt_path] = (stat.st_mtime_ns, stat.st_size, text)
+    return text
+
+
+
+def render_from_txt_path(txt_path: str, **kwargs) -> str:
+    """`read_from_txt_path(txt_path).format(**kwargs)`, formatted once per version of the file."""
+    text = read_from_txt_path(txt_path)
+    key = (txt_path, text, tuple(sorted(kwargs.items())))
+    rendered = _rendered_cache.get(key)
+    if rendered is None:
+        # Keep only the latest rendering of each file
+        for stale in [k for k in _rendered_cache if k[0] == txt_path]:
+            del _rendered_cache[stale]
+        rendered = _rendered_cache[key] = text.format(**kwargs)
+    return rendered
@@ -0,0 +1,25 @@
+import sys
+import importlib.util
+from types import ModuleType
+
+
+
+
+def lazy_import(name: str) -> ModuleType:
+    """Return module `name`, deferring its execution until one of its attributes is read.
+
+    A missing module still raises `ModuleNotFoundError` here, so optional
+    dependencies are detected at import time as before.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
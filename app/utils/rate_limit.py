@@ -0,0 +1,49 @@
+import time
+import asyncio
+import threading
+
+
+
+
+class TokenBucket:
+    """Token-bucket rate limiter, shared by coroutines and worker threads.
+
+    Tokens refill continuously at `rate` per second up to `capacity`. Each
+    `acquire()` (or `acquire_blocking()` in a thread) takes one token,
+    waiting until one is available. The state is guarded by a thread lock,
+    so the bucket is not tied to an event loop.
+    """
+    def __init__(self, rate: float, capacity: int | None = None):
+        if rate <= 0:
+            raise ValueError(f"Rate must be positive, got {rate}")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+
+    def _try_take(self, tokens: float) -> float:
+        """Take `tokens` and return 0 when available, otherwise return the seconds to wait."""
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+
+    async def acquire(self, tokens: float = 1.0):
+        while (wait := self._try_take(tokens)) > 0:
+            await asyncio.sleep(wait)
+
+
+    def acquire_blocking(self, tokens: float = 1.0):
+        while (wait := self._try_take(tokens)) > 0:
+            time.sleep(wait)
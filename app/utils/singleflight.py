@@ -0,0 +1,53 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Any
+
+
+_LEADER_CANCELLED = object()
+
+
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one execution.
+
+    While a call for a key is running, later callers with the same key wait
+    for its result instead of starting their own.
+    """
+    def __init__(self):
+        self._in_flight: dict[Hashable, asyncio.Future] = {}
+        self.coalesced = 0
+
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        while True:
+            future = self._in_flight.get(key)
+            if future is None:
+                return await self._lead(key, fn)
+            self.coalesced += 1
+            result = await asyncio.shield(future)
+            # The leader was cancelled: its cancellation is not ours, so try again
+            if result is not _LEADER_CANCELLED:
+                return result
+
+
+    async def _lead(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            # Wake the followers so one of them takes over, instead of cancelling them too
+            future.set_result(_LEADER_CANCELLED)
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
@@ -0,0 +1,109 @@
+import re
+import math
+from collections import defaultdict
+from collections.abc import Hashable
+
+
+NON_ALNUM_PATTERN = re.compile(r"[^0-9a-z]+")
+
+
+
+
+def _trigrams(text: str) -> set[str]:
+    """Word-padded trigrams, in the style of PostgreSQL's pg_trgm."""
+    trigrams: set[str] = set()
+    for word in NON_ALNUM_PATTERN.sub(" ", text.lower()).split():
+        padded = f"  {word} "
+        trigrams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return trigrams
+
+
+
+def trigram_similarity(a: str, b: str) -> float:
+    """Shared trigrams over all trigrams of both strings, like pg_trgm's `similarity`."""
+    a_trigrams, b_trigrams = _trigrams(a), _trigrams(b)
+    if not a_trigrams or not b_trigrams:
+        return 0.0
+    shared = len(a_trigrams & b_trigrams)
+    return shared / (len(a_trigrams) + len(b_trigrams) - shared)
+
+
+
+class TrigramIndex:
+    """Incrementally maintained trigram index for fuzzy lookups.
+
+    A key matches a query when it contains at least `threshold` of the query
+    trigrams. Candidates are only collected from the rarest query trigrams
+    (prefix filtering), so common trigrams never cost a full posting scan.
+    """
+    def __init__(self, threshold: float = 0.5):
+        self.threshold = threshold
+        self._postings: dict[str, set[Hashable]] = defaultdict(set)
+        self._documents: dict[Hashable, frozenset[str]] = {}
+
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._documents
+
+
+    def add(self, key: Hashable, text: str):
+        if key in self._documents:
+            self.remove(key)
+        trigrams = frozenset(_trigrams(text))
+        self._documents[key] = trigrams
+        for trigram in trigrams:
+            self._postings[trigram].add(key)
+
+
+    def remove(self, key: Hashable):
+        trigrams = self._documents.pop(key, None)
+        if trigrams is None:
+            return
+        for trigram in trigrams:
+            postings = self._postings.get(trigram)
+            if postings is not None:
+                postings.discard(key)
+                if not postings:
+                    del self._postings[trigram]
+
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 10,
+        threshold: float | None = None,
+    ) -> list[tuple[Hashable, float]]:
+        """Return up to `top_k` (key, score) pairs, best first.
+
+        The score is the fraction of query trigrams found in the key, with
+        the fraction of key trigrams covered by the query as a tie-breaker.
+        Every key containing the query scores 1.0, so use `trigram_similarity`
+        when a single, exact match is needed.
+        """
+        threshold = self.threshold if threshold is None else threshold
+        query_trigrams = sorted(
+            _trigrams(query),
+            key=lambda trigram: len(self._postings.get(trigram, ())),
+        )
+        if not query_trigrams:
+            return []
+        min_shared = max(1, math.ceil(threshold * len(query_trigrams)))
+        # A key sharing `min_shared` trigrams must hit one of the rarest
+        # `len - min_shared + 1` trigrams
+        prefix_size = len(query_trigrams) - min_shared + 1
+        candidates: set[Hashable] = set()
+        for trigram in query_trigrams[:prefix_size]:
+            candidates.update(self._postings.get(trigram, ()))
+        scored: list[tuple[Hashable, float, float]] = []
+        for key in candidates:
+            document = self._documents[key]
+            shared = sum(1 for trigram in query_trigrams if trigram in document)
+            if shared < min_shared:
+                continue
+            scored.append((key, shared / len(query_trigrams), shared / len(document)))
+        scored.sort(key=lambda item: (item[1], item[2]), reverse=True)
+        return [(key, score) for key, score, _ in scored[:top_k]]
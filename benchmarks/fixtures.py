@@ -0,0 +1,115 @@
+"""Synthetic or recorded arXiv Atom entries and generated PDFs for the benchmarks."""
+from __future__ import annotations
+import random
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+
+ATOM_NS = "http://www.w3.org/2005/Atom"
+ARXIV_NS = "http://arxiv.org/schemas/atom"
+OPENSEARCH_NS = "http://a9.com/-/spec/opensearch/1.1/"
+WORDS = (
+    "language model retrieval augmented generation graph neural network diffusion transformer "
+    "attention sparse quantization benchmark reasoning agent planning tool learning contrastive "
+    "representation optimization convergence stochastic gradient theorem proof manifold kernel"
+).split()
+FIRST_NAMES = ["Ada", "Alan", "Grace", "Claude", "Emmy", "John", "Sofia", "Yann", "Fei", "Geoffrey"]
+LAST_NAMES = ["Lovelace", "Turing", "Hopper", "Shannon", "Noether", "Neumann", "Kovalevskaya", "Li", "Hinton", "Ng"]
+
+
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+
+def synthetic_title(index: int, seed: int = 0) -> str:
+    return _sentence(random.Random(seed * 1_000_003 + index), 8)
+
+
+
+def synthetic_authors(index: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed * 1_000_003 + index)
+    return [f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}" for _ in range(rng.randint(1, 5))]
+
+
+
+def synthetic_entries(count: int, base_url: str, seed: int = 0) -> list[str]:
+    """Atom `<entry>` elements shaped like the ones the arXiv API returns."""
+    entries = []
+    for index in range(count):
+        rng = random.Random(seed * 1_000_003 + index)
+        arxiv_id = f"2401.{index:05d}v1"
+        day = 1 + index % 28
+        category = rng.choice(["cs.CL", "cs.LG", "cs.AI", "math.OC", "stat.ML"])
+        authors = "".join(
+            f"<author><name>{escape(name)}</name></author>" for name in synthetic_authors(index, seed)
+        )
+        entries.append(
+            f"<entry>"
+            f"<id>http://arxiv.org/abs/{arxiv_id}</id>"
+            f"<updated>2024-01-{day:02d}T12:00:00Z</updated>"
+            f"<published>2024-01-{day:02d}T12:00:00Z</published>"
+            f"<title>{escape(synthetic_title(index, seed))}</title>"
+            f"<summary>{escape(' '.join(_sentence(rng, 20) + '.' for _ in range(6)))}</summary>"
+            f"{authors}"
+            f'<link href="http://arxiv.org/abs/{arxiv_id}" rel="alternate" type="text/html"/>'
+            f'<link title="pdf" href="{base_url}/pdf/{arxiv_id}" rel="related" type="application/pdf"/>'
+            f'<arxiv:primary_category xmlns:arxiv="{ARXIV_NS}" term="{category}" scheme="http://arxiv.org/schemas/atom"/>'
+            f'<category term="{category}" scheme="http://arxiv.org/schemas/atom"/>'
+            f"</entry>"
+        )
+    return entries
+
+
+
+def recorded_entries(feed_path: str, base_url: str) -> list[str]:
+    """Entries of a recorded arXiv API response, with their PDF links pointed at `base_url`."""
+    ElementTree.register_namespace("", ATOM_NS)
+    ElementTree.register_namespace("arxiv", ARXIV_NS)
+    ElementTree.register_namespace("opensearch", OPENSEARCH_NS)
+    root = ElementTree.parse(feed_path).getroot()
+    entries = []
+    for entry in root.iter(f"{{{ATOM_NS}}}entry"):
+        for link in entry.iter(f"{{{ATOM_NS}}}link"):
+            if link.get("title") == "pdf":
+                link.set("href", f"{base_url}/pdf/{link.get('href').rstrip('/').split('/')[-1]}")
+        entries.append(ElementTree.tostring(entry, encoding="unicode"))
+    return entries
+
+
+
+def render_feed(entries: list[str], start: int, page_size: int) -> bytes:
+    page = entries[start:start + page_size]
+    return (
+        f'<?xml version="1.0" encoding="UTF-8"?>'
+        f'<feed xmlns="{ATOM_NS}" xmlns:opensearch="{OPENSEARCH_NS}" xmlns:arxiv="{ARXIV_NS}">'
+        f"<title>ArXiv Query</title><id>http://arxiv.org/api/benchmark</id>"
+        f"<updated>2024-01-31T00:00:00Z</updated>"
+        f"<opensearch:totalResults>{len(entries)}</opensearch:totalResults>"
+        f"<opensearch:startIndex>{start}</opensearch:startIndex>"
+        f"<opensearch:itemsPerPage>{len(page)}</opensearch:itemsPerPage>"
+        f"{''.join(page)}</feed>"
+    ).encode("utf-8")
+
+
+
+def make_pdf(pages: int, seed: int = 0) -> bytes:
+    """A text PDF with a heading, paragraphs and a small table-like block on every page."""
+    import pymupdf
+
+    rng = random.Random(seed)
+    document = pymupdf.open()
+    for page_number in range(pages):
+        page = document.new_page()
+        text = f"{page_number + 1}. {_sentence(rng, 6)}\n\n" + "\n\n".join(
+            " ".join(_sentence(rng, 12) + "." for _ in range(4)) for _ in range(5)
+        )
+        page.insert_textbox(pymupdf.Rect(56, 56, 540, 640), text, fontsize=10)
+        for row in range(4):
+            cells = "    ".join(f"{rng.random():.3f}" for _ in range(4))
+            page.insert_text((56, 680 + row * 14), cells, fontsize=9)
+    data = document.tobytes()
+    document.close()
+    return data
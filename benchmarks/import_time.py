@@ -0,0 +1,85 @@
+"""Import-time profile of the application entry points.
+
+Usage:
+    python -m benchmarks.import_time [--modules app.main,app.core.graph_runner] [--top 15]
+
+Every module is imported in a fresh interpreter with `-X importtime`; the
+report gives the wall time of the import and the slowest modules by
+cumulative time.
+"""
+from __future__ import annotations
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+from typing import Any
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRY_POINTS = ["app.core.graph_runner", "app.main", "app.core.arxiv_tools"]
+
+
+
+
+def _parse_importtime(stderr: str) -> list[dict[str, Any]]:
+    """Rows of `-X importtime` output: `import time: self [us] | cumulative | imported package`."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000,
+        })
+    return rows
+
+
+
+def profile_imports(module: str, top: int = 15) -> dict[str, Any]:
+    started_at = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, capture_output=True, text=True,
+    )
+    wall_seconds = time.perf_counter() - started_at
+    if completed.returncode != 0:
+        errors = [line for line in completed.stderr.splitlines() if not line.startswith("import time:")]
+        return {"error": "\n".join(errors[-5:])}
+    rows = _parse_importtime(completed.stderr)
+    heavy = {"pymupdf", "pymupdf4llm", "numpy", "arxiv", "langchain_text_splitters", "mcp"}
+    return {
+        "wall_seconds": wall_seconds,
+        "modules": len(rows),
+        "total_ms": sum(row["self_ms"] for row in rows),
+        "heavy_imported": sorted(heavy & {row["module"] for row in rows}),
+        "slowest": sorted(rows, key=lambda row: row["cumulative_ms"], reverse=True)[:top],
+    }
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", default=",".join(ENTRY_POINTS), help="Comma-separated modules to import")
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest modules to report")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+    # Importing `app` reads the settings, so point them at a scratch directory
+    from benchmarks.run import _configure_environment
+    _configure_environment(tempfile.mkdtemp(prefix="science-assistant-imports-"), "http://127.0.0.1:9", 1)
+    report = json.dumps({module: profile_imports(module, args.top) for module in args.modules.split(",")}, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""Offline benchmarks of the hot paths, against a local arXiv stand-in.
+
+Usage:
+    python -m benchmarks.run [--quick] [--only search,download,...] [--output results.json]
+
+Results are written as JSON, one object per benchmark, so runs can be
+compared against a baseline before deploying.
+"""
+from __future__ import annotations
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+import statistics
+from datetime import datetime, timezone
+from itertools import count
+from typing import Any
+
+from benchmarks.fixtures import make_pdf, recorded_entries, synthetic_authors, synthetic_entries, synthetic_title
+from benchmarks.server import FakeArxivServer
+from benchmarks.import_time import ENTRY_POINTS, profile_imports
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARKS = ["search", "download", "parse", "fuzzy", "graph", "imports"]
+
+
+
+
+def _summarize(samples: list[float]) -> dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "mean": statistics.fmean(ordered),
+        "p50": ordered[len(ordered) // 2],
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "min": ordered[0],
+        "max": ordered[-1],
+    }
+
+
+
+def _configure_environment(workdir: str, base_url: str, max_download_concurrency: int):
+    """Point the settings at the stand-in server and a scratch directory. Must run before `app` is imported."""
+    defaults = {
+        "MAX_RESULTS": "10",
+        "CHAT_MODEL_NAME": "benchmark",
+        "DEEPSEEK_OCR_MODEL_NAME": "benchmark",
+        "ARXIV_PROMPT_PATH": os.path.join(REPO_ROOT, "prompts", "arxiv.txt"),
+    }
+    for name, value in defaults.items():
+        os.environ.setdefault(name, value)
+    os.environ.update({
+        "ARXIV_API_URL": f"{base_url}/api/query",
+        "ARXIV_DELAY_SECONDS": "0",
+        "ARXIV_RATE_PER_SECOND": "1000000",
+        "ARXIV_BURST": "1000000",
+        "DOWNLOAD_RATE_PER_SECOND": "1000000",
+        "DOWNLOAD_BURST": "1000000",
+        "DOWNLOAD_MAX_CONCURRENCY": str(max_download_concurrency),
+        "CONTEXT_TOKEN_BUDGET": str(10 ** 9),
+        "LLM_CACHE_ENABLED": "false",
+        "PAPERS_DIR": os.path.join(workdir, "papers"),
+        "BOOKS_DIR": os.path.join(workdir, "books"),
+        "SQLITE_CHECKPOINTS_URI": os.path.join(workdir, "checkpoints.sqlite"),
+        "CHECKPOINT_BLOB_DIR": os.path.join(workdir, "checkpoint_blobs"),
+        "SEARCH_CACHE_PATH": os.path.join(workdir, "search_cache.sqlite"),
+        "DOCUMENT_CACHE_DIR": os.path.join(workdir, "document_cache"),
+    })
+
+
+
+async def bench_search(iterations: int, batch_size: int) -> dict[str, Any]:
+    """Latency of `search_papers`, cold (through the API) and served from the search cache."""
+    from app.core.arxiv_tools import search_papers
+    from app.schemas.arxiv_tools import SearchPapersRequest
+
+    cold, cached = [], []
+    results = 0
+    for iteration in range(iterations):
+        request = SearchPapersRequest(query=f"language model {iteration}", batch_size=batch_size, categories=["cs"])
+        started_at = time.perf_counter()
+        papers = await search_papers(request)
+        cold.append(time.perf_counter() - started_at)
+        if papers is None:
+            raise RuntimeError("search_papers failed against the stand-in server")
+        results = len(papers)
+        started_at = time.perf_counter()
+        await search_papers(request)
+        cached.append(time.perf_counter() - started_at)
+    return {"batch_size": batch_size, "results": results, "cold_seconds": _summarize(cold), "cached_seconds": _summarize(cached)}
+
+
+
+async def bench_download(files: int, concurrencies: list[int], workdir: str, base_url: str) -> dict[str, Any]:
+    """Throughput of the download scheduler at several concurrency levels."""
+    from app.core.download_scheduler import DownloadJob, DownloadScheduler
+    from app.dependencies.http_client import close_http_client
+
+    results = {}
+    for concurrency in concurrencies:
+        output_dir = tempfile.mkdtemp(prefix=f"download-{concurrency}-", dir=workdir)
+        jobs = [
+            DownloadJob(f"{base_url}/pdf/2401.{index:05d}v1", os.path.join(output_dir, f"{index}.pdf"))
+            for index in range(files)
+        ]
+        scheduler = DownloadScheduler(max_concurrency=concurrency, max_per_host=concurrency)
+        started_at = time.perf_counter()
+        downloaded = [result for result in await scheduler.run(jobs) if result is not None]
+        elapsed = time.perf_counter() - started_at
+        total_bytes = sum(result.size for result in downloaded)
+        results[str(concurrency)] = {
+            "files": len(downloaded),
+            "seconds": elapsed,
+            "files_per_second": len(downloaded) / elapsed,
+            "megabytes_per_second": total_bytes / elapsed / 1e6,
+        }
+    await close_http_client()
+    return results
+
+
+
+def bench_parse(pdf_path: str, repeats: int) -> dict[str, Any]:
+    """Pages per second of `_create_documents_from_pdf`, bypassing the parsed document cache."""
+    from app.utils.arxiv_helpers import _create_documents_from_pdf
+
+    samples, pages = [], 0
+    for _ in range(repeats):
+        started_at = time.perf_counter()
+        pages = len(_create_documents_from_pdf(pdf_path, use_cache=False))
+        samples.append(time.perf_counter() - started_at)
+    summary = _summarize(samples)
+    return {"pages": pages, "seconds": summary, "pages_per_second": pages / summary["p50"]}
+
+
+
+def bench_fuzzy(sizes: list[int], queries: int) -> dict[str, Any]:
+    """Build time and lookup latency of the paper store's trigram index."""
+    from app.core.paper_store import _index_text
+    from app.utils.trigram_index import TrigramIndex
+
+    results = {}
+    for size in sizes:
+        index = TrigramIndex(threshold=0.6)
+        started_at = time.perf_counter()
+        for position in range(size):
+            arxiv_id = f"2401.{position:05d}"
+            index.add(arxiv_id, _index_text(arxiv_id, synthetic_title(position), synthetic_authors(position)))
+        build_seconds = time.perf_counter() - started_at
+        samples = []
+        for query_index in range(queries):
+            position = (query_index * 7919) % size
+            # Alternate exact ids, title fragments and misspelled titles
+            query = [
+                f"2401.{position:05d}",
+                " ".join(synthetic_title(position).split()[:4]),
+                synthetic_title(position).replace("a", "e", 2),
+            ][query_index % 3]
+            started_at = time.perf_counter()
+            index.search(query, top_k=10)
+            samples.append(time.perf_counter() - started_at)
+        results[str(size)] = {"build_seconds": build_seconds, "lookup_seconds": _summarize(samples)}
+    return results
+
+
+
+async def bench_graph(turns: int) -> dict[str, Any]:
+    """End-to-end graph turns (model call, tool call, model answer, checkpoints) with a scripted chat model."""
+    from langchain_core.messages import AIMessage, HumanMessage
+    from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+    from app.core.checkpoints import open_checkpointer
+    from app.core.graph_builder import build_graph
+    from app.core.local_tools import get_local_tools
+
+    def _script():
+        for turn in count():
+            yield AIMessage(content="", tool_calls=[{
+                "name": "search_papers",
+                "args": {"query": f"graph turn {turn}", "batch_size": 5, "categories": ["cs"]},
+                "id": f"call_{turn}",
+            }])
+            yield AIMessage(content=f"Here are the papers found for turn {turn}.")
+
+    tools = get_local_tools()
+    samples = []
+    async with open_checkpointer(maintenance=False) as checkpointer:
+        graph = build_graph(GenericFakeChatModel(messages=_script()), tools, checkpointer, None)
+        config = {"recursion_limit": 25, "configurable": {"thread_id": "benchmark"}}
+        for turn in range(turns):
+            started_at = time.perf_counter()
+            await graph.ainvoke({"messages": [HumanMessage(content=f"Find papers for turn {turn}")]}, config)
+            samples.append(time.perf_counter() - started_at)
+    summary = _summarize(samples)
+    return {"turns": turns, "seconds": summary, "turns_per_second": 1 / summary["mean"]}
+
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    selected = args.only.split(",") if args.only else BENCHMARKS
+    workdir = tempfile.mkdtemp(prefix="science-assistant-bench-")
+    pdf = make_pdf(args.pdf_pages)
+    pdf_path = os.path.join(workdir, "fixture.pdf")
+    with open(pdf_path, "wb") as f:
+        f.write(pdf)
+    concurrencies = [1, 4, 8] if args.quick else [1, 4, 8, 16]
+    with FakeArxivServer(pdf=pdf, latency=args.latency) as server:
+        if args.feed:
+            server.entries = recorded_entries(args.feed, server.base_url)
+        else:
+            server.entries = synthetic_entries(args.entries, server.base_url)
+        _configure_environment(workdir, server.base_url, max(concurrencies))
+        results: dict[str, Any] = {}
+        if "search" in selected:
+            results["search"] = await bench_search(5 if args.quick else 20, batch_size=50)
+        if "download" in selected:
+            results["download"] = await bench_download(16 if args.quick else 64, concurrencies, workdir, server.base_url)
+        if "parse" in selected:
+            results["parse"] = await asyncio.to_thread(bench_parse, pdf_path, 1 if args.quick else 3)
+        if "fuzzy" in selected:
+            results["fuzzy"] = await asyncio.to_thread(bench_fuzzy, [1_000, 10_000] if args.quick else [10_000, 100_000], 300)
+        if "graph" in selected:
+            results["graph"] = await bench_graph(5 if args.quick else 20)
+        if "imports" in selected:
+            results["imports"] = {module: await asyncio.to_thread(profile_imports, module) for module in ENTRY_POINTS}
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": _git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "quick": args.quick,
+            "latency_seconds": args.latency,
+            "pdf_pages": args.pdf_pages,
+        },
+        "results": results,
+    }
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", help=f"Comma-separated subset of {','.join(BENCHMARKS)}")
+    parser.add_argument("--quick", action="store_true", help="Smaller sizes, for a smoke run")
+    parser.add_argument("--output", help="Write the JSON results to this file instead of stdout")
+    parser.add_argument("--feed", help="Replay the entries of a recorded arXiv API response instead of synthetic ones")
+    parser.add_argument("--entries", type=int, default=2_000, help="Number of synthetic feed entries")
+    parser.add_argument("--pdf-pages", type=int, default=20, help="Pages of the fixture PDF")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every stand-in response")
+    args = parser.parse_args()
+    report = json.dumps(asyncio.run(run(args)), indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+
+
+if __name__ == "__main__":
+    main()
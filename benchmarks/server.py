@@ -0,0 +1,102 @@
+"""Local stand-in for the arXiv API and PDF hosts, served from memory."""
+from __future__ import annotations
+import re
+import time
+import threading
+from urllib.parse import parse_qs, urlparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.fixtures import render_feed
+
+
+RANGE_PATTERN = re.compile(r"bytes=(\d+)-(\d*)")
+
+
+
+
+class FakeArxivServer:
+    """Replay Atom entries on `/api/query` and serve one fixture PDF on `/pdf/<id>`.
+
+    `latency` seconds are added to every response, to stand in for the
+    round trip to the real servers.
+    """
+    def __init__(self, entries: list[str] | None = None, pdf: bytes = b"", latency: float = 0.0):
+        self.entries = entries or []
+        self.pdf = pdf
+        self.latency = latency
+        self.requests = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, body: bytes, content_type: str, headers: dict[str, str] | None = None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                server.requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                url = urlparse(self.path)
+                if url.path == "/api/query":
+                    params = parse_qs(url.query)
+                    start = int(params.get("start", ["0"])[0])
+                    page_size = int(params.get("max_results", ["10"])[0])
+                    self._send(200, render_feed(server.entries, start, page_size), "application/atom+xml")
+                elif url.path.startswith("/pdf/"):
+                    match = RANGE_PATTERN.fullmatch(self.headers.get("Range", ""))
+                    if match is None:
+                        self._send(200, server.pdf, "application/pdf")
+                        return
+                    start = int(match.group(1))
+                    if start >= len(server.pdf):
+                        self._send(416, b"", "application/pdf")
+                        return
+                    end = int(match.group(2)) if match.group(2) else len(server.pdf) - 1
+                    self._send(206, server.pdf[start:end + 1], "application/pdf", {
+                        "Content-Range": f"bytes {start}-{end}/{len(server.pdf)}",
+                    })
+                else:
+                    self._send(404, b"not found", "text/plain")
+
+        return _Handler
+
+
+    def start(self) -> FakeArxivServer:
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+    def __enter__(self) -> FakeArxivServer:
+        return self.start()
+
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,16 @@
+import os
+import tempfile
+
+
+# The settings have required fields, so give them values before `app` is imported
+_workdir = tempfile.mkdtemp(prefix="science-assistant-tests-")
+for name, value in {
+    "MAX_RESULTS": "10",
+    "CHAT_MODEL_NAME": "test",
+    "DEEPSEEK_OCR_MODEL_NAME": "test",
+    "ARXIV_PROMPT_PATH": os.path.join(os.path.dirname(os.path.dirname(__file__)), "prompts", "arxiv.txt"),
+    "PAPERS_DIR": os.path.join(_workdir, "papers"),
+    "BOOKS_DIR": os.path.join(_workdir, "books"),
+    "SQLITE_CHECKPOINTS_URI": os.path.join(_workdir, "checkpoints.sqlite"),
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.api import agent_workflow
+from app.api.agent_workflow import _active_threads, _start_stream
+
+
+
+
+def test_thread_is_released_when_the_client_leaves_before_the_body():
+    response = _start_stream({"messages": []}, graph=None, thread_id="thread-1")
+    with pytest.raises(HTTPException) as error:
+        _start_stream({"messages": []}, graph=None, thread_id="thread-1")
+    assert error.value.status_code == 409
+
+    async def _disconnected_send(message):
+        raise OSError("client disconnected")
+
+    async def _receive():
+        return {"type": "http.disconnect"}
+
+    scope = {"type": "http", "asgi": {"spec_version": "2.4"}}
+    with pytest.raises(Exception):
+        asyncio.run(response(scope, _receive, _disconnected_send))
+    assert "thread-1" not in _active_threads
+
+
+
+def test_rejected_run_does_not_hold_the_thread(monkeypatch):
+    monkeypatch.setattr(agent_workflow.llm_scheduler, "admits", lambda priority: False)
+    with pytest.raises(HTTPException) as error:
+        _start_stream({"messages": []}, graph=None, thread_id="thread-2")
+    assert error.value.status_code == 503
+    assert "thread-2" not in _active_threads
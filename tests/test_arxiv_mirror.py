@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from app.configs import settings
+from app.core import arxiv_tools
+from app.core.arxiv_mirror import ArxivMirror
+from app.core.query_planner import ARXIV_EARLIEST_DATE, plan_search
+from app.schemas.arxiv_tools import SearchPapersRequest
+
+
+
+
+class _FakeClient:
+    """Answers every harvest window with one paper updated inside it."""
+    def results(self, search):
+        updated = datetime.now(timezone.utc) - timedelta(days=30)
+        yield SimpleNamespace(
+            entry_id="http://arxiv.org/abs/2401.00001v1",
+            title="Graph neural networks for molecules",
+            authors=[SimpleNamespace(name="Ada Lovelace")],
+            summary="We study graph neural networks.",
+            published=updated,
+            updated=updated,
+            pdf_url="http://arxiv.org/pdf/2401.00001v1",
+            primary_category="cs.LG",
+            categories=["cs.LG"],
+        )
+
+
+
+def test_undated_search_is_covered_after_a_harvest(tmp_path, monkeypatch):
+    monkeypatch.setattr(arxiv_tools, "_get_arxiv_client", lambda page_size: _FakeClient())
+    # Mirror the whole history in a single window, so undated searches are in range
+    monkeypatch.setattr(settings, "ARXIV_MIRROR_START_DATE", ARXIV_EARLIEST_DATE.isoformat())
+    monkeypatch.setattr(settings, "ARXIV_MIRROR_WINDOW_DAYS", 100 * 365)
+    mirror = ArxivMirror(str(tmp_path / "mirror.sqlite"))
+    until = datetime.now(timezone.utc)
+    mirror.harvest("cs", until)
+
+    plan = plan_search(SearchPapersRequest(query="graph neural networks", categories=["cs.LG"]))
+    assert plan.date_to is None
+    assert mirror.covers(plan)
+    assert [paper.id for paper in mirror.lookup(plan)] == ["2401.00001v1"]
+    # Dates inside the harvest overlap may still miss late announcements
+    recent = plan_search(SearchPapersRequest(
+        query="graph neural networks", categories=["cs.LG"], date_to=until.strftime("%Y-%m-%d"),
+    ))
+    assert not mirror.covers(recent)
@@ -0,0 +1,38 @@
+import asyncio
+import os
+import time
+
+import aiosqlite
+from langchain_core.messages import ToolMessage
+from langgraph.checkpoint.base import empty_checkpoint
+
+from app.core.checkpoints import BlobStore, ManagedSqliteSaver, ReferenceSerializer
+
+
+
+
+def test_collect_blobs_keeps_only_referenced_payloads(tmp_path):
+    asyncio.run(_collect_blobs(tmp_path))
+
+
+
+async def _collect_blobs(tmp_path):
+    blobs = BlobStore(str(tmp_path / "blobs"))
+    serde = ReferenceSerializer(blobs, threshold=100)
+    async with aiosqlite.connect(str(tmp_path / "checkpoints.sqlite")) as conn:
+        saver = ManagedSqliteSaver(conn, serde=serde, blobs=blobs)
+        checkpoint = empty_checkpoint()
+        checkpoint["channel_values"] = {
+            "messages": [ToolMessage(content="x" * 1000, tool_call_id="call-1", id="tool-1")],
+        }
+        config = {"configurable": {"thread_id": "thread-1", "checkpoint_ns": ""}}
+        await saver.aput(config, checkpoint, {}, {})
+        orphan = blobs.put(b"no longer referenced")
+        # Old enough to be collected
+        stale = time.time() - 2 * 60 * 60
+        for digest in blobs.older_than(time.time() + 1):
+            os.utime(blobs._path(digest), (stale, stale))
+
+        assert await saver.collect_blobs() == 1
+        assert blobs.get(orphan) is None
+        assert len(blobs.older_than(time.time() + 1)) == 1
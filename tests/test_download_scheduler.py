@@ -0,0 +1,73 @@
+import asyncio
+
+import httpx
+
+from app.core.download_scheduler import DownloadJob, DownloadResult, DownloadScheduler, download_file
+
+
+
+
+def test_scheduler_is_reusable_across_event_loops():
+    scheduler = DownloadScheduler(max_concurrency=1, max_per_host=1, rate_per_second=1000, burst=1000)
+    jobs = [DownloadJob(f"https://arxiv.org/pdf/{number}", f"/tmp/{number}.pdf") for number in range(3)]
+
+    async def _fetch(client, job):
+        # Hold the semaphores long enough for the other jobs to wait on them
+        await asyncio.sleep(0.01)
+        return DownloadResult(job.output_path, 1, None)
+
+    for _ in range(2):
+        results = asyncio.run(scheduler.run(jobs, fetch=_fetch))
+        assert [result.path for result in results] == [job.output_path for job in jobs]
+
+
+
+def _serve(content: bytes, range_start: int | None = None):
+    """A transport serving `content`, answering Range requests from `range_start` if given."""
+    def handler(request: httpx.Request) -> httpx.Response:
+        requested = request.headers.get("Range")
+        if requested is None:
+            return httpx.Response(200, content=content)
+        offset = int(requested.removeprefix("bytes=").rstrip("-"))
+        if offset >= len(content):
+            return httpx.Response(416, headers={"Content-Range": f"bytes */{len(content)}"})
+        start = offset if range_start is None else range_start
+        return httpx.Response(
+            206,
+            content=content[start:],
+            headers={"Content-Range": f"bytes {start}-{len(content) - 1}/{len(content)}"},
+        )
+    return httpx.MockTransport(handler)
+
+
+
+def _download(tmp_path, transport: httpx.MockTransport, partial: bytes) -> bytes:
+    output_path = tmp_path / "paper.pdf"
+    (tmp_path / "paper.pdf.part").write_bytes(partial)
+
+    async def _run():
+        async with httpx.AsyncClient(transport=transport) as client:
+            return await download_file(client, DownloadJob("https://arxiv.org/pdf/1", str(output_path)))
+
+    result = asyncio.run(_run())
+    assert result.size == len(output_path.read_bytes())
+    assert not (tmp_path / "paper.pdf.part").exists()
+    return output_path.read_bytes()
+
+
+
+def test_resumes_a_partial_download(tmp_path):
+    content = bytes(range(200))
+    assert _download(tmp_path, _serve(content), content[:50]) == content
+
+
+
+def test_partial_file_longer_than_the_remote_one_is_restarted(tmp_path):
+    content = bytes(range(200))
+    assert _download(tmp_path, _serve(content), b"x" * 300) == content
+
+
+
+def test_range_from_the_wrong_offset_is_restarted(tmp_path):
+    content = bytes(range(200))
+    assert _download(tmp_path, _serve(content, range_start=10), content[:50]) == content
@@ -0,0 +1,52 @@
+import os
+
+from langchain_core.documents import Document
+
+from app.core.fulltext_index import FullTextIndex
+
+
+
+
+def _chunks(*texts: str) -> list[Document]:
+    return [Document(page_content=text, metadata={"page": page}) for page, text in enumerate(texts)]
+
+
+
+def _segment_dirs(index_dir) -> set[str]:
+    return {name for name in os.listdir(index_dir) if name.startswith("segment-")}
+
+
+
+def test_save_writes_only_the_delta(tmp_path):
+    index = FullTextIndex(str(tmp_path), max_segments=8)
+    index.add("p1", "p1.pdf", "Transformers", _chunks("attention is all you need", "self attention layers"))
+    index.save()
+    first = _segment_dirs(tmp_path)
+    index.add("p2", "p2.pdf", "Diffusion", _chunks("denoising diffusion models"))
+    index.save()
+
+    assert first < _segment_dirs(tmp_path)
+    assert [segment.name for segment in index._segments][0] in first
+    # The new segment only holds the postings of the new paper
+    assert set(index._segments[1].vocab) == {"denoising", "diffusion", "models"}
+    assert [hit.paper_id for hit in index.search("diffusion attention", top_k=5)][0] in {"p1", "p2"}
+
+
+
+def test_removals_and_merges_survive_a_reopen(tmp_path):
+    index = FullTextIndex(str(tmp_path), max_segments=2)
+    for number in range(3):
+        index.add(f"p{number}", f"p{number}.pdf", f"Paper {number}", _chunks(f"graph neural network {number}"))
+        index.save()
+    index.remove("p1")
+    index.save()
+
+    assert len(index._segments) == 1
+    reopened = FullTextIndex(str(tmp_path), max_segments=2)
+    assert len(_segment_dirs(tmp_path)) == 1
+    assert {hit.paper_id for hit in reopened.search("graph", top_k=10)} == {"p0", "p2"}
+    assert reopened.paper_ids() == {"p0", "p2"}
+
+    reopened.remove("p0")
+    reopened.save()
+    assert {hit.paper_id for hit in FullTextIndex(str(tmp_path)).search("graph", top_k=10)} == {"p2"}
@@ -0,0 +1,59 @@
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from app.configs import settings
+from app.core.graph_builder import _compaction_boundary
+
+
+
+
+def _tool_round(index: int) -> list:
+    call_id = f"call-{index}"
+    return [
+        AIMessage(content="", tool_calls=[{"name": "search_papers", "args": {}, "id": call_id}]),
+        ToolMessage(content="x" * 1000, tool_call_id=call_id),
+    ]
+
+
+
+def test_single_long_turn_can_be_folded():
+    messages = [HumanMessage(content="find papers")]
+    for index in range(10):
+        messages += _tool_round(index)
+
+    boundary = _compaction_boundary(messages)
+
+    assert boundary > 0
+    assert isinstance(messages[boundary], AIMessage)
+    assert boundary <= len(messages) - settings.CONTEXT_KEEP_RECENT_MESSAGES
+
+
+
+def test_boundary_never_splits_a_tool_call_from_its_result():
+    messages = [HumanMessage(content="find papers")]
+    for index in range(10):
+        messages += _tool_round(index)
+    # A call with two results, the second of which arrives last
+    messages += [
+        AIMessage(content="", tool_calls=[
+            {"name": "search_papers", "args": {}, "id": "a"},
+            {"name": "search_papers", "args": {}, "id": "b"},
+        ]),
+        ToolMessage(content="a", tool_call_id="a"),
+        AIMessage(content="thinking"),
+        ToolMessage(content="b", tool_call_id="b"),
+    ]
+
+    boundary = _compaction_boundary(messages)
+
+    answered = {message.tool_call_id for message in messages[:boundary] if isinstance(message, ToolMessage)}
+    called = {
+        tool_call["id"]
+        for message in messages[:boundary] if isinstance(message, AIMessage)
+        for tool_call in message.tool_calls
+    }
+    assert called == answered
+
+
+
+def test_nothing_to_fold_in_a_single_message():
+    assert _compaction_boundary([HumanMessage(content="hi")]) == 0
@@ -0,0 +1,37 @@
+import asyncio
+
+from langchain_core.messages import AIMessage
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+
+from app.core import graph_runner
+from app.core.telemetry import Telemetry
+from app.core.graph_runner import _GenerationTimer
+
+
+
+
+class _SlowFakeChatModel(GenericFakeChatModel):
+    """Waits before its first token, like a model still processing the prompt."""
+    async def _astream(self, *args, **kwargs):
+        await asyncio.sleep(0.2)
+        async for chunk in super()._astream(*args, **kwargs):
+            yield chunk
+
+
+
+def test_time_to_first_token_is_timed_from_the_model_call(monkeypatch):
+    telemetry = Telemetry(enabled=True, trace_path=None)
+    monkeypatch.setattr(graph_runner, "telemetry", telemetry)
+    llm = _SlowFakeChatModel(messages=iter([AIMessage(content="hello there")]))
+
+    async def _run():
+        # Time spent before the model call must not count towards its first token
+        await asyncio.sleep(0.3)
+        return [chunk async for chunk in llm.astream("hi", config={"callbacks": [_GenerationTimer()]})]
+
+    assert asyncio.run(_run())
+    metrics = telemetry.render_prometheus()
+    assert "science_assistant_llm_time_to_first_token_seconds_count 1" in metrics
+    assert 'science_assistant_llm_time_to_first_token_seconds_bucket{le="0.1"} 0' in metrics
+    assert 'science_assistant_llm_time_to_first_token_seconds_bucket{le="0.5"} 1' in metrics
+    assert "science_assistant_llm_tokens_per_second_count 1" in metrics
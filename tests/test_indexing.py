@@ -0,0 +1,82 @@
+from types import SimpleNamespace
+
+from langchain_core.documents import Document
+
+from app.core import ingestion
+from app.core.indexing import LocalIndexSynchronizer
+
+
+
+
+class _FakeStore:
+    def __init__(self, paths: list[str]):
+        self.records = [
+            SimpleNamespace(path=path, paper=SimpleNamespace(id=path, title=path)) for path in paths
+        ]
+
+
+    def revision(self):
+        return (0, 0)
+
+
+    def list(self):
+        return self.records
+
+
+
+class _FakeIndex:
+    """Fails on the second page of `flaky.pdf` until `healthy` is set."""
+    def __init__(self):
+        self.chunks: dict[str, int] = {}
+        self.healthy = False
+
+
+    def paper_ids(self):
+        return set(self.chunks)
+
+
+    def add(self, paper_id, path, title, chunks):
+        if paper_id == "flaky.pdf" and paper_id in self.chunks and not self.healthy:
+            raise RuntimeError("embedding server unavailable")
+        self.chunks[paper_id] = self.chunks.get(paper_id, 0) + len(chunks)
+
+
+    def remove(self, paper_id):
+        self.chunks.pop(paper_id, None)
+
+
+    def save(self):
+        pass
+
+
+
+class _FakeEngine:
+    """Yields two pages per file and reports the files in `failed` as not fully ingested."""
+    failed: set[str] = set()
+
+    def ingest(self, paths):
+        for path in paths:
+            for page in range(2):
+                yield Document(page_content=f"page {page} of {path}", metadata={"file_path": path, "page": page})
+
+
+
+def test_partly_indexed_papers_are_retried(tmp_path, monkeypatch):
+    paths = [str(tmp_path / name) for name in ("good.pdf", "flaky.pdf", "broken.pdf")]
+    for path in paths:
+        open(path, "wb").close()
+    _FakeEngine.failed = {paths[2]}
+    monkeypatch.setattr(ingestion, "IngestionEngine", _FakeEngine)
+    store, index = _FakeStore(paths), _FakeIndex()
+    # Let the fake index recognize the flaky paper by name
+    store.records[1].paper.id = "flaky.pdf"
+    synchronizer = LocalIndexSynchronizer(store, index)
+
+    synchronizer.sync()
+    assert index.paper_ids() == {paths[0]}
+
+    index.healthy = True
+    _FakeEngine.failed = set()
+    synchronizer.sync()
+    assert index.paper_ids() == {paths[0], "flaky.pdf", paths[2]}
+    assert index.chunks["flaky.pdf"] == 2
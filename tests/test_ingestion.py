@@ -0,0 +1,39 @@
+import os
+import time
+
+import pymupdf
+
+from app.core import ingestion
+from app.core.ingestion import IngestionEngine
+
+
+
+
+def _fake_parse(pdf_path: str, pages: list[int]) -> list[dict]:
+    if os.path.basename(pdf_path) == "hung.pdf":
+        time.sleep(60)
+    return [{"page": page, "text": f"page {page}", "toc_items": [], "tables": []} for page in pages]
+
+
+
+def _write_pdf(path: str, pages: int = 1):
+    pdf = pymupdf.open()
+    for _ in range(pages):
+        pdf.new_page()
+    pdf.save(path)
+
+
+
+def test_hung_file_does_not_starve_the_pool(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingestion, "_parse_pdf_pages", _fake_parse)
+    paths = [str(tmp_path / name) for name in ("hung.pdf", "first.pdf", "second.pdf")]
+    for path in paths:
+        _write_pdf(path)
+    engine = IngestionEngine(max_workers=1, pages_per_task=1, file_timeout=1, cache=None)
+
+    started = time.monotonic()
+    documents = list(engine.ingest(paths))
+
+    assert engine.failed == {paths[0]}
+    assert sorted(document.metadata["file_path"] for document in documents) == sorted(paths[1:])
+    assert time.monotonic() - started < 10
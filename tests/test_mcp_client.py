@@ -0,0 +1,63 @@
+import json
+import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+from mcp.types import CallToolResult, TextContent, Tool
+
+from app.dependencies.mcp_client import MCPServerPool
+
+
+
+
+class _FakeClient:
+    """Serves `tools` from one in-process session per server."""
+    def __init__(self, tools: list[Tool]):
+        self.tools = tools
+        self.sessions = 0
+
+
+    @asynccontextmanager
+    async def session(self, name: str):
+        self.sessions += 1
+
+        async def list_tools(cursor=None):
+            return SimpleNamespace(tools=self.tools, nextCursor=None)
+
+        async def call_tool(tool_name, arguments, **kwargs):
+            return CallToolResult(content=[TextContent(type="text", text="ok")], isError=False)
+
+        yield SimpleNamespace(list_tools=list_tools, call_tool=call_tool)
+
+
+
+def _tool(name: str) -> Tool:
+    return Tool(name=name, description=name, inputSchema={"type": "object", "properties": {}})
+
+
+
+def test_changed_server_tools_replace_the_cached_schemas(tmp_path):
+    servers = {"arxiv": {"command": "python", "args": [], "transport": "stdio"}}
+    cache_path = str(tmp_path / "schemas.json")
+    stale = MCPServerPool(servers, cache_path, health_interval=0)
+    stale._client = _FakeClient([_tool("old_tool")])
+
+    async def _run():
+        await stale.get_tools()
+        await stale.close()
+        pool = MCPServerPool(servers, cache_path, health_interval=0)
+        client = pool._client = _FakeClient([_tool("old_tool"), _tool("new_tool")])
+        # Built from the cache, without starting the server
+        tools = await pool.get_tools()
+        assert [tool.name for tool in tools] == ["old_tool"]
+        assert client.sessions == 0
+        await tools[0].ainvoke({})
+        await asyncio.gather(*pool._refresh_tasks)
+        tools = await pool.get_tools()
+        await pool.close()
+        return tools
+
+    tools = asyncio.run(_run())
+    assert [tool.name for tool in tools] == ["old_tool", "new_tool"]
+    with open(cache_path, "r", encoding="utf-8") as f:
+        assert [schema["name"] for schema in json.load(f)["arxiv"]["tools"]] == ["old_tool", "new_tool"]
@@ -0,0 +1,31 @@
+import os
+
+from app.core.paper_store import PaperStore
+
+
+
+
+def _write_pdf(path: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4")
+
+
+
+def test_legacy_title_named_papers_are_imported_once(tmp_path):
+    legacy_path = str(tmp_path / "cs_CL" / "Attention Is All You Need.pdf")
+    _write_pdf(legacy_path)
+    _write_pdf(str(tmp_path / ".index" / "not-a-paper.pdf"))
+
+    store = PaperStore(str(tmp_path))
+    records = store.list()
+    assert [record.path for record in records] == [legacy_path]
+    assert records[0].paper.title == "Attention Is All You Need"
+    assert records[0].paper.primary_category == "cs.CL"
+    assert store.match_one("Attention Is All You Need") == records
+
+    store.remove(records)
+    store.close()
+    # A paper deleted after the import is not brought back by the next open
+    _write_pdf(legacy_path)
+    assert PaperStore(str(tmp_path)).list() == []
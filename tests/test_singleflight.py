@@ -0,0 +1,28 @@
+import asyncio
+
+from app.utils.singleflight import SingleFlight
+
+
+
+
+def test_leader_cancellation_does_not_cancel_followers():
+    flights = SingleFlight()
+    calls = []
+
+    async def _fetch():
+        calls.append(None)
+        await asyncio.sleep(0.05)
+        return len(calls)
+
+    async def _run():
+        leader = asyncio.create_task(flights.do("key", _fetch))
+        await asyncio.sleep(0.01)
+        followers = [asyncio.create_task(flights.do("key", _fetch)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await asyncio.gather(leader, *followers, return_exceptions=True)
+
+    leader_result, *follower_results = asyncio.run(_run())
+    assert isinstance(leader_result, asyncio.CancelledError)
+    # One follower took over as the new leader and the other shared its result
+    assert follower_results == [2, 2]
@@ -0,0 +1,35 @@
+import asyncio
+
+from pydantic import BaseModel
+
+from app.core.local_tools import _as_tool
+from app.core.tool_cache import ToolResultCache
+
+
+
+
+class _QueryRequest(BaseModel):
+    query: str
+
+
+
+def test_failed_search_is_not_cached():
+    calls = []
+
+    async def search_papers(request: _QueryRequest):
+        calls.append(request.query)
+        # Like the arXiv tools, the first call logs its error and returns None
+        return None if len(calls) == 1 else [request.query]
+
+    cache = ToolResultCache(ttl_seconds={"search_papers": 3600}, invalidates={})
+    tool = cache.wrap(_as_tool(search_papers, "search_papers", _QueryRequest, "Search."))
+
+    async def _run():
+        results = []
+        for _ in range(3):
+            message = await tool.ainvoke({"type": "tool_call", "name": "search_papers", "args": {"query": "gnn"}, "id": "1"})
+            results.append(message.content)
+        return results
+
+    assert asyncio.run(_run()) == ["null", '["gnn"]', '["gnn"]']
+    assert calls == ["gnn", "gnn"]
@@ -0,0 +1,31 @@
+import asyncio
+
+from langchain_core.tools import tool
+
+from app.core import tool_executor
+from app.core.telemetry import Telemetry
+from app.core.tool_executor import ToolExecutor
+
+
+
+
+@tool
+async def echo(text: str) -> str:
+    """Return the text unchanged."""
+    return text
+
+
+
+def test_tool_call_with_telemetry_enabled(monkeypatch):
+    telemetry = Telemetry(enabled=True, trace_path=None)
+    monkeypatch.setattr(tool_executor, "telemetry", telemetry)
+    executor = ToolExecutor([echo], risky_tools=[])
+    tool_call = {"name": "echo", "args": {"text": "hello"}, "id": "call_1", "type": "tool_call"}
+
+    async def _run():
+        return await executor._run_one(tool_call, {}, asyncio.Semaphore(1))
+
+    message = asyncio.run(_run())
+    assert message.status == "success"
+    assert message.content == "hello"
+    assert 'science_assistant_tool_call_seconds_count{tool="echo"} 1' in telemetry.render_prometheus()
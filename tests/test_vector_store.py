@@ -0,0 +1,29 @@
+from langchain_core.documents import Document
+
+from app.core.vector_store import HashingEmbedder, VectorStore
+
+
+
+
+def _chunks(count: int) -> list[Document]:
+    return [Document(page_content=f"chunk {index} about graphs", metadata={"page": 1}) for index in range(count)]
+
+
+
+def test_few_removals_do_not_trigger_a_compaction(tmp_path):
+    store = VectorStore(str(tmp_path), HashingEmbedder(), max_segments=8, compact_deleted_fraction=0.2)
+    for paper in range(10):
+        store.add(f"paper-{paper}", f"/tmp/{paper}.pdf", f"Paper {paper}", _chunks(5))
+    store.flush()
+
+    store.remove("paper-0")
+    store.flush()
+    assert store._compaction_thread is None
+
+    store.remove("paper-1")
+    store.remove("paper-2")
+    store.flush()
+    store._compaction_thread.join()
+    assert len(store._segments) == 1
+    assert len(store._segments[0]) == 35
+    assert not store._deleted